@@ -0,0 +1,17 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+serving the WSGI application from a bounded thread pool. Run it with e.g.
+
+    uvicorn app.asgi:application
+"""
+
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+from app.wsgi import application as wsgi_application  # noqa: E402
+from core.asgi import AsgiHandler  # noqa: E402
+
+application = AsgiHandler(wsgi_application)
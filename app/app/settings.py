@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -44,16 +45,48 @@ INSTALLED_APPS = [
     'recipe'
 ]
 
+# API-only workers, API_ONLY=1, leave out the apps and middleware only the
+# admin and browser pages use, so they start faster and use less memory
+API_ONLY = bool(int(os.environ.get('API_ONLY', 0)))
+
+SITE_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+)
+
+if API_ONLY:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in SITE_APPS]
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware',
+    'core.middleware.XFrameOptionsMiddleware',
 ]
 
+# Requests under these prefixes authenticate with tokens only and skip the
+# session, CSRF, message and clickjacking middleware
+API_URL_PREFIXES = ('/api/',)
+
+if API_ONLY:
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if middleware not in (
+            'core.middleware.SessionMiddleware',
+            'core.middleware.CsrfViewMiddleware',
+            'core.middleware.AuthenticationMiddleware',
+            'core.middleware.MessageMiddleware',
+            'core.middleware.XFrameOptionsMiddleware',
+        )
+    ]
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -74,6 +107,18 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Resolve URLs and build serializers when the WSGI application loads, so
+# the first request of a new worker does not pay for it
+WARM_UP_ON_BOOT = bool(int(os.environ.get('WARM_UP_ON_BOOT', 1)))
+
+# Open event streams per process. Each holds a thread for as long as it
+# is open, so gunicorn.conf.py and ASGI_THREADS add this many threads on
+# top of the ones serving requests
+EVENTS_MAX_CONNECTIONS = int(os.environ.get('EVENTS_MAX_CONNECTIONS', 32))
+
+# Threads running Django code behind the ASGI entry point in app/asgi.py
+ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 16)) + EVENTS_MAX_CONNECTIONS
+
 
 # Database
 # https://docs.djangoproject.com/en/2.1/ref/settings/#databases
@@ -81,10 +126,188 @@ WSGI_APPLICATION = 'app.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')),
+    }
+}
+
+# Read replicas. Safe requests read from one of these aliases while writes
+# and anything inside a pinning window go to 'default'. Locally each replica
+# is a separate SQLite file, refreshed with `manage.py refresh_replicas`,
+# e.g. DATABASE_REPLICAS=replica
+DATABASE_REPLICAS = [
+    alias for alias in os.environ.get('DATABASE_REPLICAS', '').split(',') if alias
+]
+
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Shards for user owned data. Each user is placed on one of these aliases,
+# recorded in core.UserShard, and `manage.py shards` migrates and rebalances
+# them, e.g. DATABASE_SHARDS=shard_0,shard_1
+DATABASE_SHARDS = [
+    alias for alias in os.environ.get('DATABASE_SHARDS', '').split(',') if alias
+]
+
+for alias in DATABASE_SHARDS:
+    DATABASES.setdefault(alias, {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+    })
+
+# Seconds a worker trusts its cached copy of the shard map
+SHARD_MAP_TTL = 30
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write
+REPLICA_PIN_SECONDS = 5
+
+# SQLite tuning applied to every new connection, opt in with
+# SQLITE_PERFORMANCE_MODE=1. WAL lets readers run alongside a writer and
+# NORMAL sync only fsyncs at checkpoints, which is safe in WAL mode.
+SQLITE_PERFORMANCE_MODE = bool(int(os.environ.get('SQLITE_PERFORMANCE_MODE', 0)))
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
+# The default cache lives in a memory-mapped file shared by every worker
+# of the host, see core/cache.py. LOCATION is a directory only the
+# service's user may access, /dev/shm keeps it in memory. 32MiB of slots
+# leave room in the 64MiB /dev/shm containers get by default. Values
+# larger than a slot, compressed bodies mostly, go to up to
+# OVERFLOW_ENTRIES files on disk instead. Tests get directories of their
+# own, see core/runner.py
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.SharedMemoryCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_PATH', os.path.join(
+            '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+            'recipe-app'
+        )),
+        'OPTIONS': {
+            'SLOTS': 8192,
+            'SLOT_SIZE': 4096,
+            'OVERFLOW_ENTRIES': 256,
+            'OVERFLOW_LOCATION': os.environ.get(
+                'SHARED_CACHE_OVERFLOW_PATH',
+                os.path.join(tempfile.gettempdir(), 'recipe-app-overflow')
+            ),
+        },
     }
 }
 
+TEST_RUNNER = 'core.runner.TestRunner'
+
+# Seconds an authenticated token's user is reused from the cache
+TOKEN_CACHE_TTL = 60
+
+# Lifetimes in seconds of the signed tokens of core/tokens.py, and how
+# long a worker trusts its copy of the revocation list
+ACCESS_TOKEN_LIFETIME = 5 * 60
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 60 * 60
+TOKEN_REVOCATION_TTL = 5
+
+# Per-user token buckets for the whole API plus one per throttle_scope of
+# the views. Buckets are kept in the default cache
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'core.authentication.CachedTokenAuthentication',
+        'core.authentication.SignedTokenAuthentication',
+    ),
+    # The browsable API pulls in templates and forms, API-only workers
+    # answer JSON alone
+    'DEFAULT_RENDERER_CLASSES': (
+        ('rest_framework.renderers.JSONRenderer',) if API_ONLY else (
+            'rest_framework.renderers.JSONRenderer',
+            'rest_framework.renderers.BrowsableAPIRenderer',
+        )
+    ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.UserThrottle',
+        'core.throttling.EndpointThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '600/min',
+        'anon': '120/min',
+        'recipes': '300/min',
+        'attributes': '300/min',
+        'sync': '120/min',
+        'uploads': '30/min',
+        'bulk': '10/min',
+    },
+}
+
+# Expensive requests running at once per process, see core/admission.py.
+# Requests waiting longer than the queue timeout for a slot get a 503
+ADMISSION_QUEUE_TIMEOUT = 0.5
+ADMISSION_POOLS = {
+    'list': {'limit': 8},
+    'upload': {'limit': 2},
+    'bulk': {'limit': 2},
+    # Open event streams, refused at once rather than queued, clients
+    # retry later
+    'events': {'limit': EVENTS_MAX_CONNECTIONS, 'max_queue': 0},
+}
+
+# Identical concurrent list requests share one computation, see
+# core/singleflight.py. SINGLE_FLIGHT_SHARED=1 coalesces across workers
+# through a lock in the default cache
+SINGLE_FLIGHT_SHARED = bool(int(os.environ.get('SINGLE_FLIGHT_SHARED', 0)))
+SINGLE_FLIGHT_TIMEOUT = 10
+SINGLE_FLIGHT_RESULT_TTL = 1
+SINGLE_FLIGHT_POLL_SECONDS = 0.02
+
+# Response compression, see core/middleware.py. Brotli is used when the
+# brotli package is installed and the client accepts it, gzip otherwise.
+# Compressed bodies up to COMPRESSION_CACHE_MAX_SIZE bytes are cached by
+# digest so repeated responses are compressed once
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+COMPRESSION_CACHE_MAX_SIZE = 1024 * 1024
+COMPRESSION_CACHE_TTL = 300
+
+# Users whose cookable recipe index each worker keeps, see core/cookable.py
+COOKABLE_INDEX_USERS = 1000
+
+# Recipes returned by the similar recipes endpoint, see core/similarity.py
+SIMILAR_RECIPES_LIMIT = 10
+
+# Recipes one shopping list may be built from and how long a list stays
+# cached, see recipe/shopping.py. Lists are keyed by the recipes' versions
+# so edits never serve a stale one
+SHOPPING_LIST_MAX_RECIPES = 100
+SHOPPING_LIST_CACHE_TTL = 3600
+
+# Rows removed per transaction by `manage.py purge_deleted` when deleting
+# users, tags and ingredients marked deleted
+PURGE_BATCH_SIZE = 1000
+
+# Admin changelists of unfiltered tables estimated to hold at least this
+# many rows show the planner's estimate instead of running COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+# Live change events, see core/events.py. LocalBackend only reaches clients
+# connected to the process making the change, ChangeLogBackend polls the
+# change log so every worker sees every change. gunicorn.conf.py picks
+# ChangeLogBackend when it starts more than one worker.
+EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND', 'core.events.LocalBackend')
+EVENTS_POLL_SECONDS = 1
+EVENTS_HEARTBEAT_SECONDS = 15
+
+# Events queued per connection before it is told to resync instead
+EVENTS_QUEUE_SIZE = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/2.1/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
-application = get_wsgi_application()
+from core.startup import phase, warm_up  # noqa: E402
+
+with phase('django setup'):
+    application = get_wsgi_application()
+
+if settings.WARM_UP_ON_BOOT:
+    with phase('warm up'):
+        warm_up()
@@ -0,0 +1,2 @@
+"""Standalone benchmarks, run from the app directory with
+``python -m benchmarks.<name>``"""
@@ -0,0 +1,139 @@
+"""Latency of fast requests while many slow clients trickle upload bodies,
+served by gunicorn's threaded WSGI workers or by the ASGI entry point
+
+    python -m benchmarks.asgi_concurrency --slow-clients 200 --threads 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HOST = '127.0.0.1'
+
+SERVERS = {
+    'wsgi': [
+        sys.executable, '-m', 'gunicorn', 'app.wsgi:application',
+        '--worker-class', 'gthread', '--workers', '1', '--threads', '{threads}',
+        '--bind', '{host}:{port}', '--log-level', 'warning',
+    ],
+    'asgi': [
+        sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+        '--host', '{host}', '--port', '{port}', '--log-level', 'warning',
+    ],
+}
+
+
+async def wait_until_up(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(HOST, port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+async def slow_upload(port, size, seconds):
+    """POST a token request a few bytes at a time, like a phone on a bad
+    network. The form has no password so it is rejected without a query"""
+    steps = 20
+    chunk = size // steps
+    try:
+        reader, writer = await asyncio.open_connection(HOST, port)
+        writer.write(
+            f'POST /api/user/token/ HTTP/1.1\r\nHost: {HOST}\r\n'
+            f'Content-Type: application/x-www-form-urlencoded\r\n'
+            f'Content-Length: {chunk * steps + 6}\r\nConnection: close\r\n\r\n'
+            f'email='.encode()
+        )
+        for _ in range(steps):
+            writer.write(b'x' * chunk)
+            await writer.drain()
+            await asyncio.sleep(seconds / steps)
+        await reader.read()
+        writer.close()
+    except OSError:
+        pass
+
+
+async def fast_get(port, timeout):
+    """Return the latency of a GET to the API root, or None on failure"""
+    start = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(HOST, port), timeout
+        )
+        writer.write(
+            f'GET /api/recipe/ HTTP/1.1\r\nHost: {HOST}\r\n'
+            f'Accept: application/json\r\nConnection: close\r\n\r\n'.encode()
+        )
+        status = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+    if b' 200 ' not in status:
+        return None
+    return time.perf_counter() - start
+
+
+async def measure(port, args):
+    await wait_until_up(port)
+    slow = [
+        asyncio.ensure_future(slow_upload(port, args.body_size, args.slow_seconds))
+        for _ in range(args.slow_clients)
+    ]
+    await asyncio.sleep(args.slow_seconds / 4)
+
+    latencies = []
+    for _ in range(args.requests):
+        latencies.append(await fast_get(port, args.timeout))
+
+    await asyncio.gather(*slow)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--slow-clients', type=int, default=200)
+    parser.add_argument('--slow-seconds', type=float, default=8)
+    parser.add_argument('--body-size', type=int, default=64 * 1024)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--port', type=int, default=8123)
+    args = parser.parse_args()
+
+    env = dict(os.environ, ASGI_THREADS=str(args.threads))
+    for name, command in SERVERS.items():
+        command = [
+            part.format(threads=args.threads, host=HOST, port=args.port)
+            for part in command
+        ]
+        server = subprocess.Popen(command, env=env)
+        try:
+            latencies = asyncio.get_event_loop().run_until_complete(
+                measure(args.port, args)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+        ok = [latency for latency in latencies if latency is not None]
+        summary = f'{len(ok)}/{len(latencies)} ok'
+        if ok:
+            summary += (
+                f', p50 {statistics.median(ok) * 1000:.1f} ms'
+                f', max {max(ok) * 1000:.1f} ms'
+            )
+        print(f'{name}: {summary} with {args.slow_clients} slow clients')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Time from launching a gunicorn worker to its first 200 response, and
+the latency of that first request against the next ones, for the default
+settings, API-only workers and without the boot warm-up
+
+    python -m benchmarks.cold_start --runs 5 --imports 15
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import python, setup_database
+
+HOST = '127.0.0.1'
+PATH = '/api/recipe/tags/'
+
+MODES = [
+    ('default', {}),
+    ('api only', {'API_ONLY': '1'}),
+    ('no warm up', {'WARM_UP_ON_BOOT': '0'}),
+]
+
+
+def get(port, token):
+    """Return (status, seconds) of one authenticated request"""
+    connection = http.client.HTTPConnection(HOST, port, timeout=10)
+    start = time.perf_counter()
+    try:
+        connection.request('GET', PATH, headers={'Authorization': f'Token {token}'})
+        response = connection.getresponse()
+        response.read()
+        return response.status, time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def cold_start(env, token, port):
+    """Return (seconds to first 200, first request, median later request)"""
+    config = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        python(
+            'gunicorn', '-c', config, 'app.wsgi:application',
+            '--bind', f'{HOST}:{port}', '--workers', '1',
+            '--access-logfile', '/dev/null', '--log-level', 'warning',
+        ),
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            try:
+                status, first = get(port, token)
+            except OSError:
+                if time.perf_counter() - start > 30:
+                    raise RuntimeError('gunicorn did not start')
+                time.sleep(0.005)
+                continue
+            if status != 200:
+                raise RuntimeError(f'{PATH} answered {status}')
+            ready = time.perf_counter() - start
+            break
+
+        later = statistics.median(get(port, token)[1] for _ in range(20))
+        return ready, first, later
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def import_profile(env, count):
+    """Print the modules whose own import code takes longest, from
+    -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app.wsgi'],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, module = line[len('import time:'):].split('|')
+        rows.append((int(own), int(cumulative), module.strip()))
+
+    mode = 'api only' if env.get('API_ONLY') else 'default'
+    print(f'\nslowest imports, {mode} (self / cumulative ms)')
+    for own, cumulative, module in sorted(rows, reverse=True)[:count]:
+        print(f'{own / 1000:8.1f} {cumulative / 1000:8.1f}  {module}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--imports', type=int, default=0,
+                        help='Also list the N slowest imports')
+    parser.add_argument('--port', type=int, default=8126)
+    args = parser.parse_args()
+
+    env, token = setup_database(20)
+
+    for name, overrides in MODES:
+        runs = [cold_start(dict(env, **overrides), token, args.port) for _ in range(args.runs)]
+        ready, first, later = (statistics.median(column) for column in zip(*runs))
+        print(
+            f'{name:12s} first 200 after {ready * 1000:7.1f} ms, '
+            f'first request {first * 1000:6.1f} ms, later {later * 1000:6.1f} ms'
+        )
+
+    if args.imports:
+        for _, overrides in MODES[:2]:
+            import_profile(dict(env, **overrides), args.imports)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Helpers shared by the benchmarks that need a populated database"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+def setup_database(recipes=200):
+    """Create a throwaway SQLite database with a user owning sample recipes
+    and return (environ, token) to run servers against it"""
+    path = os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    env = dict(
+        os.environ,
+        SQLITE_PATH=path,
+        SQLITE_PERFORMANCE_MODE='1',
+        DJANGO_SETTINGS_MODULE='app.settings',
+    )
+    os.environ.update(env)
+
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from rest_framework.authtoken.models import Token
+
+    from core.models import Ingredient, Recipe, Tag
+
+    call_command('migrate', verbosity=0)
+    user = get_user_model().objects.create_user('bench@example.com', 'password')
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(10)]
+    ingredients = [
+        Ingredient.objects.create(user=user, name=f'Ingredient {i}') for i in range(30)
+    ]
+    for i in range(recipes):
+        recipe = Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=i % 90, price=5
+        )
+        recipe.tags.add(*tags[i % 10:i % 10 + 2])
+        recipe.ingredients.add(*ingredients[i % 30:i % 30 + 5])
+
+    token = Token.objects.create(user=user)
+    return env, token.key
+
+
+def start_server(command, env, url, timeout=30):
+    """Start a server process and wait until it answers"""
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f'{command[0]} did not start')
+
+
+def python(*args):
+    """Command line running a module with the current interpreter"""
+    return [sys.executable, '-m', *args]
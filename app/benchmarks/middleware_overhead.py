@@ -0,0 +1,75 @@
+"""Per-request cost of the middleware stack on an API endpoint, with
+settings.MIDDLEWARE where API routes skip sessions, CSRF, messages and
+frame options against the same stack using the stock Django classes
+
+    python -m benchmarks.middleware_overhead --requests 2000
+"""
+import argparse
+import time
+
+from benchmarks.common import setup_database
+
+# Stock classes of the middleware in core.middleware skipping API routes
+STOCK_MIDDLEWARE = {
+    'core.middleware.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware':
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.XFrameOptionsMiddleware':
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+}
+
+PATH = '/api/recipe/tags/'
+
+
+def measure(middleware, token, requests):
+    """Return (microseconds per request, queries per request)"""
+    from django.db import connection
+    from django.test import Client, override_settings
+
+    with override_settings(
+        MIDDLEWARE=middleware,
+        ALLOWED_HOSTS=['testserver'],
+        REST_FRAMEWORK={'DEFAULT_THROTTLE_CLASSES': ()},
+    ):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+        for _ in range(50):
+            if client.get(PATH).status_code != 200:
+                raise RuntimeError(f'{PATH} did not answer 200')
+
+        queries = []
+        with connection.execute_wrapper(
+            lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)
+        ):
+            client.get(PATH)
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            client.get(PATH)
+        elapsed = time.perf_counter() - start
+
+    return elapsed / requests * 1e6, len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--recipes', type=int, default=0)
+    args = parser.parse_args()
+
+    _, token = setup_database(args.recipes)
+
+    from django.conf import settings
+
+    stock_middleware = [STOCK_MIDDLEWARE.get(path, path) for path in settings.MIDDLEWARE]
+    stock, stock_queries = measure(stock_middleware, token, args.requests)
+    lean, lean_queries = measure(settings.MIDDLEWARE, token, args.requests)
+
+    print(f'stock middleware: {stock:8.1f} us/request, {stock_queries} queries')
+    print(f'lean middleware:  {lean:8.1f} us/request, {lean_queries} queries')
+    print(f'saved:            {stock - lean:8.1f} us/request ({1 - lean / stock:.1%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Latency and accuracy of the MinHash/LSH similar recipes lookup against
+exact Jaccard similarity over every recipe of the user
+
+    python -m benchmarks.similar_recipes --recipes 20000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks.common import setup_database
+
+
+def populate(recipes, seed):
+    """Give the benchmark user recipes drawn from a few dozen cuisines, each
+    a base of tags and ingredients with some swapped out"""
+    from django.contrib.auth import get_user_model
+    from django.db import transaction
+
+    from core import similarity
+    from core.models import Ingredient, Recipe, Tag
+
+    rng = random.Random(seed)
+    user = get_user_model().objects.get()
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Extra {i}') for i in range(270)
+    )
+    tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+    ingredient_ids = list(Ingredient.objects.filter(user=user).values_list('id', flat=True))
+
+    cuisines = [
+        (rng.sample(tag_ids, 2), rng.sample(ingredient_ids, 8)) for _ in range(50)
+    ]
+
+    with transaction.atomic():
+        Recipe.objects.bulk_create(
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=30, price=5)
+            for i in range(recipes)
+        )
+        ids = list(Recipe.objects.filter(user=user).order_by('id').values_list('id', flat=True))
+        tag_links, ingredient_links = [], []
+        for recipe_id in ids:
+            tags, ingredients = rng.choice(cuisines)
+            kept = rng.sample(ingredients, rng.randint(5, 8))
+            kept += rng.sample(ingredient_ids, rng.randint(0, 3))
+            tag_links += [Recipe.tags.through(recipe_id=recipe_id, tag_id=pk) for pk in tags]
+            ingredient_links += [
+                Recipe.ingredients.through(recipe_id=recipe_id, ingredient_id=pk)
+                for pk in set(kept)
+            ]
+        Recipe.tags.through.objects.bulk_create(tag_links)
+        Recipe.ingredients.through.objects.bulk_create(ingredient_links)
+
+    start = time.perf_counter()
+    similarity.rebuild(1000, 'default')
+    print(f'signatures for {len(ids)} recipes built in {time.perf_counter() - start:.1f} s')
+    return user, ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_database(0)
+
+    from core import similarity
+    from core.models import Recipe
+
+    user, ids = populate(args.recipes, args.seed)
+    sets = similarity.recipe_elements(ids, 'default')
+    queries = random.Random(args.seed).sample(ids, args.queries)
+
+    lsh_times, exact_times, recalls, quality = [], [], [], []
+    for recipe_id in queries:
+        recipe = Recipe.objects.get(pk=recipe_id)
+
+        start = time.perf_counter()
+        found = similarity.similar(recipe, args.top)
+        lsh_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        own = sets[recipe_id]
+        exact = sorted(
+            ((other, similarity.jaccard(own, items)) for other, items in sets.items()
+             if other != recipe_id),
+            key=lambda item: (-item[1], item[0])
+        )[:args.top]
+        exact_times.append(time.perf_counter() - start)
+
+        # Ties at the cut off make ids a poor measure, compare scores
+        ideal = [score for _, score in exact]
+        got = sorted((similarity.jaccard(own, sets[other]) for other, _ in found), reverse=True)
+        recalls.append(sum(a >= b - 1e-9 for a, b in zip(got, ideal)) / len(ideal))
+        quality.append(sum(got) / sum(ideal) if sum(ideal) else 1.0)
+
+    def ms(times):
+        return f'median {statistics.median(times) * 1000:7.2f} ms, ' \
+               f'p95 {sorted(times)[int(len(times) * 0.95)] * 1000:7.2f} ms'
+
+    print(f'lsh lookup:   {ms(lsh_times)}')
+    print(f'exact scan:   {ms(exact_times)} (sets already in memory)')
+    print(f'recall@{args.top}:    {statistics.mean(recalls):.1%}')
+    print(f'jaccard kept: {statistics.mean(quality):.1%} of the exact top {args.top}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Concurrent read/write throughput of SQLite with and without the
+performance pragmas from ``settings.SQLITE_PRAGMAS``
+
+    python -m benchmarks.sqlite_pragmas --seconds 5 --readers 8 --writers 2
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from app.settings import SQLITE_PRAGMAS
+from core.db import apply_sqlite_pragmas
+
+SCHEMA = """
+CREATE TABLE recipe (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title VARCHAR(255) NOT NULL,
+    time_minutes INTEGER NOT NULL,
+    price DECIMAL NOT NULL
+);
+CREATE INDEX recipe_user_id ON recipe (user_id);
+"""
+
+
+def connect(path, pragmas):
+    """Open a connection the way Django does, optionally tuned"""
+    connection = sqlite3.connect(path, timeout=5, check_same_thread=False)
+    if pragmas:
+        apply_sqlite_pragmas(connection, pragmas)
+    return connection
+
+
+def seed(path, rows):
+    """Create the table and fill it with sample recipes"""
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    connection.executemany(
+        'INSERT INTO recipe (user_id, title, time_minutes, price) VALUES (?, ?, ?, ?)',
+        ((i % 100, f'Recipe {i}', i % 90, 5.00) for i in range(rows))
+    )
+    connection.commit()
+    connection.close()
+
+
+def run(path, pragmas, seconds, readers, writers):
+    """Return (reads, writes, errors) completed within the time window"""
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader(n):
+        connection = connect(path, pragmas)
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                connection.execute(
+                    'SELECT id, title, time_minutes, price FROM recipe WHERE user_id = ?',
+                    (n % 100,)
+                ).fetchall()
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    def writer(n):
+        connection = connect(path, pragmas)
+        done = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                with connection:
+                    connection.execute(
+                        'INSERT INTO recipe (user_id, title, time_minutes, price) '
+                        'VALUES (?, ?, ?, ?)',
+                        (n, 'New recipe', 10, 5.00)
+                    )
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return counts['reads'], counts['writes'], counts['errors']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=50000)
+    args = parser.parse_args()
+
+    for label, pragmas in (('default', None), ('tuned', SQLITE_PRAGMAS)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.sqlite3')
+            seed(path, args.rows)
+            reads, writes, errors = run(
+                path, pragmas, args.seconds, args.readers, args.writers
+            )
+        print(
+            f'{label:>8}: {reads / args.seconds:10.0f} reads/s '
+            f'{writes / args.seconds:8.0f} writes/s {errors} errors'
+        )
+
+
+if __name__ == '__main__':
+    main()
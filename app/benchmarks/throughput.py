@@ -0,0 +1,82 @@
+"""Requests per second on the recipe endpoints as gunicorn workers scale
+with cores, using the settings in gunicorn.conf.py
+
+    python -m benchmarks.throughput --seconds 10 --concurrency 32
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import threading
+import time
+
+from benchmarks.common import python, setup_database, start_server
+
+HOST = '127.0.0.1'
+
+PATHS = ['/api/recipe/recipes/', '/api/recipe/tags/', '/api/recipe/ingredients/']
+
+
+def load(port, token, seconds, concurrency):
+    """Hammer the endpoints over keep-alive connections, return requests/s"""
+    done = []
+    deadline = time.monotonic() + seconds
+
+    def client(n):
+        connection = http.client.HTTPConnection(HOST, port, timeout=10)
+        count = 0
+        while time.monotonic() < deadline:
+            connection.request('GET', PATHS[(n + count) % len(PATHS)], headers={
+                'Authorization': f'Token {token}',
+                'Accept': 'application/json',
+            })
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                count += 1
+        connection.close()
+        done.append(count)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return sum(done) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8124)
+    args = parser.parse_args()
+
+    env, token = setup_database(args.recipes)
+    cores = multiprocessing.cpu_count()
+    counts = sorted({1, 2, 4, cores, cores * 2 + 1} - {0})
+    config = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+    for workers in counts:
+        server = start_server(
+            python(
+                'gunicorn', '-c', config, 'app.wsgi:application',
+                '--bind', f'{HOST}:{args.port}', '--workers', str(workers),
+                '--access-logfile', '/dev/null', '--log-level', 'warning',
+            ),
+            env,
+            f'http://{HOST}:{args.port}/api/recipe/',
+        )
+        try:
+            rate = load(args.port, token, args.seconds, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f'{workers:3d} workers on {cores} cores: {rate:8.1f} req/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,73 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from django.utils.html import format_html
 from django.utils.translation import gettext as _
 from core import models
+from core.db import estimate_row_count
 
-class UserAdmin(BaseUserAdmin):
+# Changelist parameters that page or sort the list without filtering it
+UNFILTERED_PARAMS = {'p', 'o'}
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting unfiltered large tables from the planner's
+    statistics instead of a COUNT(*) over every row"""
+
+    def __init__(self, *args, estimate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.estimate = estimate
+
+    @cached_property
+    def count(self):
+        if self.estimate:
+            queryset = self.object_list
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables too big to count or sort freely"""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    # Newest first walks the primary key index backwards
+    ordering = ('-id',)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            estimate=set(request.GET) <= UNFILTERED_PARAMS
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Look numbers up by primary key and anything else through the
+        prefix searches of ``search_fields``"""
+        if search_term.isdigit():
+            return queryset.filter(pk=int(search_term)), False
+
+        return super().get_search_results(request, queryset, search_term)
+
+
+class UserOwnedAdmin(LargeTableAdmin):
+    """Admin for objects owned by a user"""
+
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+
+
+class UserAdmin(BaseUserAdmin, LargeTableAdmin):
 
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ('^email',)
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -24,6 +85,39 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+
+class TagAdmin(UserOwnedAdmin):
+
+    list_display = ('id', 'name', 'user')
+    search_fields = ('^name',)
+
+
+class IngredientAdmin(UserOwnedAdmin):
+
+    list_display = ('id', 'name', 'user')
+    search_fields = ('^name',)
+
+
+class RecipeAdmin(UserOwnedAdmin):
+
+    list_display = ('id', 'thumbnail', 'title', 'user', 'time_minutes', 'price')
+    list_display_links = ('id', 'title')
+    search_fields = ('^title',)
+    autocomplete_fields = ('tags', 'ingredients')
+    readonly_fields = ('thumbnail',)
+
+    def thumbnail(self, recipe):
+        if not recipe.image:
+            return ''
+
+        return format_html(
+            '<img src="{}" alt="" loading="lazy" style="max-height: 48px; max-width: 64px">',
+            recipe.image.url
+        )
+    thumbnail.short_description = _('Image')
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
\ No newline at end of file
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
+admin.site.register(models.Recipe, RecipeAdmin)
@@ -0,0 +1,89 @@
+import math
+import threading
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class Overloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The server is busy, try again shortly.')
+    default_code = 'overloaded'
+
+    def __init__(self, wait):
+        super().__init__()
+        self.wait = wait
+
+
+class Pool:
+    """Cap on the requests of one kind running at once in this process.
+
+    Requests over the cap wait for a slot, but only for ``queue_timeout``
+    seconds and only while fewer than ``max_queue`` others are waiting.
+    Beyond that they are refused straight away, which keeps queueing
+    delay inside the latency budget instead of piling up on the database"""
+
+    def __init__(self, limit, queue_timeout, max_queue):
+        self.slots = threading.BoundedSemaphore(limit)
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.waiting = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.slots.acquire(blocking=False):
+            return
+
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                raise Overloaded(math.ceil(self.queue_timeout))
+            self.waiting += 1
+
+        try:
+            if not self.slots.acquire(timeout=self.queue_timeout):
+                raise Overloaded(math.ceil(self.queue_timeout))
+        finally:
+            with self.lock:
+                self.waiting -= 1
+
+    def release(self):
+        self.slots.release()
+
+
+class HeldSlot:
+    """A pool slot released when closed. Streaming responses close their
+    closable objects once the server has sent the whole body"""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def close(self):
+        pool, self.pool = self.pool, None
+        if pool is not None:
+            pool.release()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool(name):
+    """Return the pool configured in ``ADMISSION_POOLS`` under the name"""
+    with _pools_lock:
+        if name not in _pools:
+            config = settings.ADMISSION_POOLS[name]
+            _pools[name] = Pool(
+                config['limit'],
+                config.get('queue_timeout', settings.ADMISSION_QUEUE_TIMEOUT),
+                config.get('max_queue', config['limit'])
+            )
+
+        return _pools[name]
+
+
+def reset():
+    """Forget the pools, e.g. after ``ADMISSION_POOLS`` changed"""
+    with _pools_lock:
+        _pools.clear()
@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        """Hook up connection level tuning and model signals"""
+        from core import db, signals  # noqa: F401
+
+        connection_created.connect(db.tune_sqlite_connection)
@@ -0,0 +1,75 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication, TokenAuthentication, get_authorization_header
+)
+from rest_framework.authtoken.models import Token
+
+from core import tokens
+
+
+def _cache_key(key):
+    return 'auth_token_' + hashlib.sha1(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    """Drop the cached lookup of a token"""
+    cache.delete(_cache_key(key))
+
+
+def forget_user(user_id):
+    """Drop the cached lookups of a user's tokens, after the user changed
+    in a way the cached copy would hide, e.g. being deactivated"""
+    keys = Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    cache.delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication remembering the user of each token for
+    TOKEN_CACHE_TTL seconds, so most requests skip the token and user
+    query. Signals in core.signals drop entries when tokens or users
+    change"""
+
+    def authenticate_credentials(self, key):
+        cache_key = _cache_key(key)
+        user = cache.get(cache_key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, user, settings.TOKEN_CACHE_TTL)
+            return user, token
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return user, Token(key=key, user=user)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """Authentication with the short-lived signed access tokens of
+    core.tokens, sent as ``Authorization: Bearer <token>``. Verifying
+    needs no query, request.user only carries the user's id and
+    request.auth the token's claims"""
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+
+        try:
+            claims = tokens.verify(auth[1].decode())
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        except tokens.InvalidToken as error:
+            raise exceptions.AuthenticationFailed(str(error))
+
+        return tokens.user_for(claims), claims
+
+    def authenticate_header(self, request):
+        return self.keyword
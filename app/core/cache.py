@@ -0,0 +1,427 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import stat
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RCPCACHE'
+
+# File header: magic, number of slots, slot size
+HEADER = struct.Struct('<8sII')
+
+# Slot header: key hash, expiry timestamp, flags, key length, value length
+SLOT = struct.Struct('<QdBHI')
+
+USED = 1
+REFERENCED = 2
+# The value did not fit the slot and is kept by the overflow cache
+OVERFLOW = 4
+
+# Slots a key can live in. A key hashes to one set and takes any free
+# slot of it, evicting with a CLOCK sweep when the set is full
+WAYS = 8
+
+# Thread locks guarding the sets, fcntl locks only exclude other processes
+LOCK_STRIPES = 64
+
+NEVER = float('inf')
+
+
+def _align(offset, alignment=64):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class SharedMemoryCache(BaseCache):
+    """Cache in a memory-mapped file shared by every process of the host.
+
+    The file holds a fixed number of fixed-size slots, so memory use is
+    bounded up front and no external service is needed. Values larger
+    than a slot go to a file based cache, their slot only marking them.
+    LOCATION is a directory private to the service's user, created if
+    missing, put it on a tmpfs such as /dev/shm so the pages never hit
+    the disk. Each layout gets its own file, so processes started with
+    other options never resize a file mapped by others. The file's pages
+    are reserved when it is sized, if the tmpfs has no room left the
+    process caches in memory of its own instead.
+
+    OPTIONS: SLOTS (default 16384), SLOT_SIZE in bytes (default 2048),
+    OVERFLOW_ENTRIES, the number of larger values kept (default 256, 0
+    drops them) and OVERFLOW_LOCATION, the private directory keeping them
+    (default ``overflow`` in LOCATION).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.slot_size = int(options.get('SLOT_SIZE', 2048))
+        self.sets = max(1, int(options.get('SLOTS', 16384)) // WAYS)
+        self.slots = self.sets * WAYS
+        self.hands_offset = _align(HEADER.size)
+        self.slots_offset = _align(self.hands_offset + self.sets)
+        self.size = self.slots_offset + self.slots * self.slot_size
+        self.name = f'cache-{self.slots}x{self.slot_size}'
+        self.path = os.path.join(location, self.name)
+
+        self.overflow_entries = int(options.get('OVERFLOW_ENTRIES', 256))
+        self.overflow_location = options.get(
+            'OVERFLOW_LOCATION', os.path.join(location, 'overflow')
+        )
+        self.overflow = None
+        self._pid = None
+        self._init_lock = threading.Lock()
+
+    def _check_private(self, fd, path):
+        """Refuse files other users could have written, the values read
+        back are unpickled"""
+        found = os.fstat(fd)
+        if found.st_uid != os.getuid() or found.st_mode & 0o077:
+            os.close(fd)
+            raise ImproperlyConfigured(
+                f'Cache path {path} must be owned by uid {os.getuid()} '
+                f'and not accessible to other users'
+            )
+
+    def _open_directory(self, path):
+        try:
+            os.mkdir(path, 0o700)
+        except FileExistsError:
+            pass
+
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+        self._check_private(fd, path)
+        return fd
+
+    def _open_file(self, directory):
+        """Open the file of this layout, creating it if missing. Files of
+        older layouts are unlinked, processes still mapping them keep
+        their pages until they exit"""
+        flags = os.O_RDWR | os.O_NOFOLLOW
+        try:
+            fd = os.open(self.name, flags | os.O_CREAT | os.O_EXCL, 0o600, dir_fd=directory)
+        except FileExistsError:
+            fd = os.open(self.name, flags, dir_fd=directory)
+            self._check_private(fd, self.path)
+            if not stat.S_ISREG(os.fstat(fd).st_mode):
+                os.close(fd)
+                raise ImproperlyConfigured(f'Cache file {self.path} is not a regular file')
+        else:
+            for name in os.listdir(directory):
+                if name.startswith('cache-') and name != self.name:
+                    try:
+                        os.unlink(name, dir_fd=directory)
+                    except FileNotFoundError:
+                        pass
+
+        return fd
+
+    def _initialize(self, fd):
+        """Size a file just created, or left half created by a process
+        that died. Growing it never moves pages another process maps.
+
+        Every page is reserved up front, also those of a file sized by
+        others: a page of a sparse file touched once the tmpfs is full
+        kills the process with SIGBUS, reserving raises OSError instead"""
+        expected = HEADER.pack(MAGIC, self.slots, self.slot_size)
+        found = os.pread(fd, HEADER.size, 0)
+        if found != expected and (
+            os.fstat(fd).st_size not in (0, self.size) or found.strip(b'\0')
+        ):
+            raise ImproperlyConfigured(f'Cache file {self.path} is corrupt')
+
+        if not hasattr(os, 'posix_fallocate'):
+            if found != expected:
+                os.ftruncate(fd, self.size)
+        else:
+            try:
+                os.posix_fallocate(fd, 0, self.size)
+            except OSError:
+                if found != expected:
+                    # Nobody maps a file without a header, give the pages
+                    # reserved so far back
+                    os.ftruncate(fd, 0)
+                raise
+
+        if found != expected:
+            os.pwrite(fd, expected, 0)
+
+    def _open(self):
+        """Map the file, sizing it on first use. Mappings are reopened
+        after a fork so each process has its own thread locks"""
+        if self._pid == os.getpid():
+            return
+
+        with self._init_lock:
+            if self._pid == os.getpid():
+                return
+
+            if self._pid is not None:
+                # Inherited from the parent process
+                self._mmap.close()
+                if self._fd is not None:
+                    os.close(self._fd)
+
+            directory = self._open_directory(self.location)
+            try:
+                fd = self._open_file(directory)
+            finally:
+                os.close(directory)
+
+            if self.overflow_entries and self.overflow is None:
+                # Made only once its directory is checked, it would
+                # create it and any missing parent when instantiated
+                os.close(self._open_directory(self.overflow_location))
+                self.overflow = FileBasedCache(
+                    self.overflow_location,
+                    {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': self.overflow_entries}},
+                )
+
+            fcntl.lockf(fd, fcntl.LOCK_EX, HEADER.size, 0)
+            try:
+                self._initialize(fd)
+            except OSError as error:
+                os.close(fd)
+                fd = None
+                logger.warning(
+                    'cache file %s could not be allocated (%s), '
+                    'caching in process memory only', self.path, error
+                )
+            except BaseException:
+                # Closing releases the lock
+                os.close(fd)
+                raise
+            else:
+                fcntl.lockf(fd, fcntl.LOCK_UN, HEADER.size, 0)
+
+            self._fd = fd
+            self._mmap = mmap.mmap(-1 if fd is None else fd, self.size)
+            self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _locked(self, index):
+        """Hold the set against other threads and other processes"""
+        with self._locks[index % LOCK_STRIPES]:
+            if self._fd is None:
+                # Memory of this process only
+                yield
+                return
+
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self.hands_offset + index)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self.hands_offset + index)
+
+    def _hash(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') | 1
+
+    def _slot_offset(self, index, way):
+        return self.slots_offset + (index * WAYS + way) * self.slot_size
+
+    def _header(self, offset):
+        return SLOT.unpack_from(self._mmap, offset)
+
+    def _find(self, index, hashed, key):
+        """Return the offset of the key's slot in the set, or None"""
+        for way in range(WAYS):
+            offset = self._slot_offset(index, way)
+            slot_hash, _, flags, key_length, _ = self._header(offset)
+            if flags & USED and slot_hash == hashed:
+                start = offset + SLOT.size
+                if self._mmap[start:start + key_length] == key:
+                    return offset
+        return None
+
+    def _free(self, offset):
+        """Empty a slot, dropping the overflow entry it marks"""
+        _, _, flags, key_length, _ = self._header(offset)
+        if flags & OVERFLOW:
+            start = offset + SLOT.size
+            self.overflow.delete(self._mmap[start:start + key_length].decode())
+        self._mmap[offset:offset + SLOT.size] = bytes(SLOT.size)
+
+    def _live(self, offset, now):
+        """Check a found slot has not expired, freeing it if it has"""
+        expires = self._header(offset)[1]
+        if expires > now:
+            return True
+
+        self._free(offset)
+        return False
+
+    def _victim(self, index, now):
+        """Return a free or expired slot of the set, or the first one the
+        CLOCK hand finds unreferenced since its last pass"""
+        for way in range(WAYS):
+            offset = self._slot_offset(index, way)
+            _, expires, flags, _, _ = self._header(offset)
+            if not flags & USED or expires <= now:
+                return offset
+
+        hand_offset = self.hands_offset + index
+        hand = self._mmap[hand_offset]
+        while True:
+            offset = self._slot_offset(index, hand)
+            hand = (hand + 1) % WAYS
+            flags = self._mmap[offset + 16]
+            if flags & REFERENCED:
+                self._mmap[offset + 16] = flags & ~REFERENCED
+                continue
+
+            self._mmap[hand_offset] = hand
+            return offset
+
+    def _write(self, offset, hashed, key, value, expires):
+        """Fill a slot, handing values too big for it to the overflow
+        cache. Returns whether the value was kept"""
+        flags = USED
+        if not self._fits(key, value):
+            if not self.overflow or not self._fits(key, b''):
+                return False
+            timeout = None if expires == NEVER else expires - time.time()
+            self.overflow.set(key.decode(), value, timeout)
+            flags, value = USED | OVERFLOW, b''
+
+        # New values start unreferenced so a burst of keys read once
+        # evicts itself rather than the hot ones
+        self._mmap[offset:offset + SLOT.size] = SLOT.pack(
+            hashed, expires, flags, len(key), len(value)
+        )
+        start = offset + SLOT.size
+        self._mmap[start:start + len(key) + len(value)] = key + value
+        return True
+
+    def _read(self, offset):
+        """Return the pickled value of a slot, or None if it overflowed
+        and the overflow cache no longer has it"""
+        _, _, flags, key_length, value_length = self._header(offset)
+        self._mmap[offset + 16] = flags | REFERENCED
+        start = offset + SLOT.size
+        if flags & OVERFLOW:
+            return self.overflow.get(self._mmap[start:start + key_length].decode())
+
+        start += key_length
+        return self._mmap[start:start + value_length]
+
+    def _fits(self, key, value):
+        return SLOT.size + len(key) + len(value) <= self.slot_size
+
+    def _expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return NEVER if expires is None else expires
+
+    def _prepare(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._open()
+        hashed = self._hash(key)
+        return key.encode(), hashed, hashed % self.sets
+
+    def _store(self, key, value, timeout, version, only_new):
+        key, hashed, index = self._prepare(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            if offset is not None:
+                if only_new and self._live(offset, now):
+                    return False
+                # Never leave an older value behind, even when the new
+                # one cannot be kept
+                self._free(offset)
+            else:
+                offset = self._victim(index, now)
+                self._free(offset)
+
+            return self._write(offset, hashed, key, value, self._expiry(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, only_new=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Store a value, returning whether it was kept"""
+        return self._store(key, value, timeout, version, only_new=False)
+
+    def get(self, key, default=None, version=None):
+        key, hashed, index = self._prepare(key, version)
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            if offset is None or not self._live(offset, time.time()):
+                return default
+            value = self._read(offset)
+
+        return default if value is None else pickle.loads(value)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, hashed, index = self._prepare(key, version)
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            if offset is None or not self._live(offset, time.time()):
+                return False
+            struct.pack_into('<d', self._mmap, offset + 8, self._expiry(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        """Add to a number atomically across processes"""
+        made_key = self.make_key(key, version=version)
+        key, hashed, index = self._prepare(key, version)
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            if offset is None or not self._live(offset, time.time()):
+                raise ValueError("Key '%s' not found" % made_key)
+
+            current = self._read(offset)
+            if current is None:
+                raise ValueError("Key '%s' not found" % made_key)
+
+            value = pickle.loads(current) + delta
+            pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            expires = self._header(offset)[1]
+            self._free(offset)
+            if not self._write(offset, hashed, key, pickled, expires):
+                raise ValueError("Key '%s' no longer fits a slot" % made_key)
+
+        return value
+
+    def has_key(self, key, version=None):
+        key, hashed, index = self._prepare(key, version)
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            return offset is not None and self._live(offset, time.time())
+
+    def delete(self, key, version=None):
+        key, hashed, index = self._prepare(key, version)
+
+        with self._locked(index):
+            offset = self._find(index, hashed, key)
+            if offset is not None:
+                self._free(offset)
+
+    def clear(self):
+        self._open()
+        for index in range(self.sets):
+            with self._locked(index):
+                for way in range(WAYS):
+                    offset = self._slot_offset(index, way)
+                    self._mmap[offset:offset + SLOT.size] = bytes(SLOT.size)
+        if self.overflow:
+            self.overflow.clear()
@@ -0,0 +1,152 @@
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Exists, F, Max, OuterRef
+from django.utils import timezone
+
+from core import events
+from core.models import (
+    ChangeLogEntry, ChangeLogHorizon, ChangeLogSequence, Ingredient, Recipe, Tag
+)
+
+# Models whose changes are logged, keyed by the name used in the log
+TRACKED_MODELS = {
+    'recipe': Recipe,
+    'tag': Tag,
+    'ingredient': Ingredient,
+}
+
+_state = threading.local()
+
+
+def model_name(model):
+    """Return the log name for a tracked model, or None"""
+    name = model._meta.model_name
+    return name if TRACKED_MODELS.get(name) is model else None
+
+
+@contextmanager
+def suppressed():
+    """Skip logging inside the block, for moves that change nothing"""
+    previous = getattr(_state, 'suppressed', False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def _take(user_id, count, using):
+    """Return the first of ``count`` new sequence numbers of the user. The
+    update keeps the user's row locked until the transaction ends, so a
+    concurrent writer waits and takes the numbers after these"""
+    sequences = ChangeLogSequence.objects.using(using).filter(user_id=user_id)
+    if not sequences.update(last=F('last') + count):
+        try:
+            with transaction.atomic(using=using):
+                ChangeLogSequence.objects.using(using).create(user_id=user_id, last=count)
+            return 1
+        except IntegrityError:
+            # Created by a concurrent first write
+            sequences.update(last=F('last') + count)
+
+    return sequences.values_list('last', flat=True).get() - count + 1
+
+
+def record(user_id, name, object_ids, action, using=None):
+    """Append one entry per object to the user's change log and notify
+    the user's connected clients once the change is committed"""
+    if getattr(_state, 'suppressed', False) or not object_ids:
+        return
+
+    using = using or router.db_for_write(ChangeLogEntry)
+    with transaction.atomic(using=using):
+        first = _take(user_id, len(object_ids), using)
+        ChangeLogEntry.objects.using(using).bulk_create([
+            ChangeLogEntry(
+                user_id=user_id, model=name, object_id=object_id, action=action,
+                sequence=sequence
+            )
+            for sequence, object_id in enumerate(object_ids, first)
+        ])
+
+    event = {'type': 'change', 'model': name, 'action': action, 'ids': list(object_ids)}
+    transaction.on_commit(lambda: events.publish(user_id, event), using=using)
+
+
+def horizon(user):
+    """Return the oldest cursor that can still be synced incrementally"""
+    return ChangeLogHorizon.objects.filter(user=user).values_list(
+        'cursor', flat=True
+    ).first() or 0
+
+
+def last_cursor(user):
+    """Return the newest cursor of the user, later ones were never handed
+    out on the user's current shard"""
+    return ChangeLogSequence.objects.filter(user=user).values_list(
+        'last', flat=True
+    ).first() or 0
+
+
+def changes_since(user, since, limit):
+    """Return (entries, next cursor, has_more) for a page of the user's
+    changes after the cursor, keeping the newest entry for each object"""
+    entries = list(ChangeLogEntry.objects.filter(
+        user=user, sequence__gt=since
+    ).order_by('sequence')[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.model, entry.object_id), None)
+        latest[(entry.model, entry.object_id)] = entry
+
+    return list(latest.values()), entries[-1].sequence if entries else since, has_more
+
+
+def compact(tombstone_days, batch_size=10000, using=None):
+    """Drop entries superseded by a newer entry for the same object, then
+    tombstones older than the retention window. Returns rows deleted"""
+    entries = ChangeLogEntry.objects.using(using)
+    deleted = 0
+
+    newer = entries.filter(
+        user=OuterRef('user'),
+        model=OuterRef('model'),
+        object_id=OuterRef('object_id'),
+        sequence__gt=OuterRef('sequence')
+    )
+    # Walked by id rather than by id range, ids start at each shard's
+    # range and moved users bring entries from the ranges of others
+    last = 0
+    while True:
+        batch = list(
+            entries.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not batch:
+            break
+
+        ids = list(
+            entries.filter(id__gt=last, id__lte=batch[-1]).annotate(
+                superseded=Exists(newer)
+            ).filter(superseded=True).values_list('id', flat=True)
+        )
+        deleted += entries.filter(id__in=ids).delete()[0] if ids else 0
+        last = batch[-1]
+
+    cutoff = timezone.now() - timedelta(days=tombstone_days)
+    expired = entries.filter(action=ChangeLogEntry.DELETE, created__lt=cutoff)
+    for user_id, cursor in expired.values('user').annotate(
+        cursor=Max('sequence')
+    ).values_list('user', 'cursor'):
+        horizons = ChangeLogHorizon.objects.using(using)
+        updated = horizons.filter(user_id=user_id, cursor__lt=cursor).update(cursor=cursor)
+        if not updated:
+            horizons.get_or_create(user_id=user_id, defaults={'cursor': cursor})
+
+    deleted += expired.delete()[0]
+    return deleted
@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import re
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Content types worth compressing, anything else is usually already packed
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(?!event-stream)|application/(json|x-ndjson|javascript|xml)|[^;]*\+json)'
+)
+
+_ACCEPT_ENCODING = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def accepted_encodings(header):
+    """Return the codings of an Accept-Encoding header allowed with q > 0"""
+    accepted = set()
+    for part in header.split(','):
+        match = _ACCEPT_ENCODING.match(part)
+        if not match:
+            continue
+        try:
+            quality = float(match.group(2) or 1)
+        except ValueError:
+            continue
+        if quality > 0:
+            accepted.add(match.group(1).lower())
+
+    return accepted
+
+
+def choose_encoding(header):
+    """Pick the best coding this server supports for an Accept-Encoding"""
+    accepted = accepted_encodings(header or '')
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+
+    return None
+
+
+def _level(encoding):
+    if encoding == 'br':
+        return settings.COMPRESSION_BROTLI_QUALITY
+
+    return settings.COMPRESSION_GZIP_LEVEL
+
+
+def _compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=_level(encoding))
+
+    return gzip.compress(body, compresslevel=_level(encoding), mtime=0)
+
+
+def compress(body, encoding):
+    """Compress a response body, reusing the result for identical bodies.
+    Bodies are cached by digest, hashing being far cheaper than
+    compressing, so hot responses are compressed once per cache fill"""
+    if len(body) > settings.COMPRESSION_CACHE_MAX_SIZE:
+        return _compress(body, encoding)
+
+    key = f'compressed_{encoding}{_level(encoding)}_{hashlib.sha1(body).hexdigest()}'
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = _compress(body, encoding)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TTL)
+
+    return compressed
+
+
+def compress_sequence(chunks, encoding):
+    """Compress a streamed body, yielding output as the compressor fills
+    its window rather than per input chunk, which would hurt the ratio of
+    line by line exports"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = zlib.compressobj(
+        settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
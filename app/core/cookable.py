@@ -0,0 +1,224 @@
+import collections
+import random
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import routers
+
+
+class CookableIndex:
+    """Bitmap index of one user's recipes by ingredient. Each recipe owns
+    a bit position and each ingredient a Python int whose set bits are
+    the recipes using it, so set algebra over all recipes runs as word
+    at a time big integer operations in C"""
+
+    def __init__(self, stamp=None):
+        self.stamp = stamp
+        self.recipes = 0
+        self.ingredients = {}
+        self.links = {}
+        self.positions = {}
+        self.recipe_ids = []
+        self.free = []
+
+    def add_recipe(self, recipe_id):
+        if recipe_id in self.positions:
+            return self.positions[recipe_id]
+
+        if self.free:
+            position = self.free.pop()
+            self.recipe_ids[position] = recipe_id
+        else:
+            position = len(self.recipe_ids)
+            self.recipe_ids.append(recipe_id)
+
+        self.positions[recipe_id] = position
+        self.links[recipe_id] = set()
+        self.recipes |= 1 << position
+        return position
+
+    def remove_recipe(self, recipe_id):
+        if recipe_id not in self.positions:
+            return
+
+        self.remove_links(recipe_id, list(self.links[recipe_id]))
+        position = self.positions.pop(recipe_id)
+        del self.links[recipe_id]
+        self.recipe_ids[position] = None
+        self.recipes &= ~(1 << position)
+        self.free.append(position)
+
+    def add_links(self, recipe_id, ingredient_ids):
+        bit = 1 << self.add_recipe(recipe_id)
+        for ingredient_id in ingredient_ids:
+            self.ingredients[ingredient_id] = self.ingredients.get(ingredient_id, 0) | bit
+            self.links[recipe_id].add(ingredient_id)
+
+    def remove_links(self, recipe_id, ingredient_ids):
+        if recipe_id not in self.positions:
+            return
+
+        bit = 1 << self.positions[recipe_id]
+        for ingredient_id in ingredient_ids:
+            mask = self.ingredients.get(ingredient_id, 0) & ~bit
+            if mask:
+                self.ingredients[ingredient_id] = mask
+            else:
+                self.ingredients.pop(ingredient_id, None)
+            self.links[recipe_id].discard(ingredient_id)
+
+    def remove_ingredient(self, ingredient_id):
+        mask = self.ingredients.pop(ingredient_id, 0)
+        for recipe_id in self._recipe_ids(mask):
+            self.links[recipe_id].discard(ingredient_id)
+
+    def _recipe_ids(self, mask):
+        """Yield the recipe ids of the set bits, lowest first"""
+        while mask:
+            low = mask & -mask
+            yield self.recipe_ids[low.bit_length() - 1]
+            mask ^= low
+
+    def _missing_counts(self, have):
+        """Return bit planes of a per-recipe counter of ingredients not in
+        ``have``, least significant plane first. Each mask is added to
+        every recipe's counter at once with a ripple carry"""
+        planes = []
+        for ingredient_id, mask in self.ingredients.items():
+            if ingredient_id in have:
+                continue
+
+            carry = mask
+            for index, plane in enumerate(planes):
+                planes[index], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+
+        return planes
+
+    def cookable(self, have, max_missing=0):
+        """Return [(recipe id, missing count)] for the recipes missing at
+        most ``max_missing`` of their ingredients from ``have``, fewest
+        missing first"""
+        have = set(have)
+
+        if not max_missing:
+            missing = 0
+            for ingredient_id, mask in self.ingredients.items():
+                if ingredient_id not in have:
+                    missing |= mask
+            return [(recipe_id, 0) for recipe_id in self._recipe_ids(self.recipes & ~missing)]
+
+        planes = self._missing_counts(have)
+        found = []
+        for count in range(max_missing + 1):
+            if count >> len(planes):
+                break
+
+            mask = self.recipes
+            for index, plane in enumerate(planes):
+                mask &= plane if count >> index & 1 else ~plane
+            found.extend((recipe_id, count) for recipe_id in self._recipe_ids(mask))
+
+        return found
+
+
+# user id -> CookableIndex, least recently used first
+_indexes = collections.OrderedDict()
+_lock = threading.RLock()
+
+
+def _stamp_key(user_id):
+    return f'cookable_{user_id}'
+
+
+def _current_stamp(user_id):
+    """Return the user's shared index stamp, which every committed change
+    increments so workers notice changes made by the others"""
+    key = _stamp_key(user_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, random.getrandbits(62), None)
+        stamp = cache.get(key)
+
+    return stamp
+
+
+def _next_stamp(user_id):
+    try:
+        return cache.incr(_stamp_key(user_id))
+    except ValueError:
+        _current_stamp(user_id)
+        return cache.incr(_stamp_key(user_id))
+
+
+def build(user_id):
+    """Read a user's recipes and ingredient links into a new index. They
+    are read from the primary, a lagging replica would leave changes out
+    of an index stamped as having them"""
+    from core.models import Recipe
+
+    index = CookableIndex(_current_stamp(user_id))
+    links = collections.defaultdict(list)
+    with routers.read_from_replica(False):
+        for recipe_id in Recipe.objects.filter(
+            user_id=user_id
+        ).order_by('id').values_list('id', flat=True):
+            index.add_recipe(recipe_id)
+
+        for recipe_id, ingredient_id in Recipe.ingredients.through.objects.filter(
+            recipe__user_id=user_id, ingredient__is_deleted=False
+        ).values_list('recipe_id', 'ingredient_id'):
+            links[recipe_id].append(ingredient_id)
+
+    for recipe_id, ingredient_ids in links.items():
+        index.add_links(recipe_id, ingredient_ids)
+
+    return index
+
+
+def cookable(user_id, have, max_missing=0):
+    """Return [(recipe id, missing count)] for the user, building the
+    user's index on first use or after another worker changed it"""
+    stamp = _current_stamp(user_id)
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is not None and index.stamp == stamp:
+            _indexes.move_to_end(user_id)
+            return index.cookable(have, max_missing)
+
+    index = build(user_id)
+    with _lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > settings.COOKABLE_INDEX_USERS:
+            _indexes.popitem(last=False)
+        return index.cookable(have, max_missing)
+
+
+def changed(user_id, apply=None):
+    """Record a committed change to a user's recipes or their links. The
+    worker's own index is updated in place with ``apply(index)`` when it
+    saw every change before this one, and rebuilt on next use otherwise"""
+    stamp = _next_stamp(user_id)
+    with _lock:
+        index = _indexes.get(user_id)
+        if index is None:
+            return
+
+        if apply is None or index.stamp != stamp - 1:
+            del _indexes[user_id]
+            return
+
+        apply(index)
+        index.stamp = stamp
+
+
+def forget():
+    """Drop every index of this worker"""
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Aggregate, CharField
+
+
+def apply_sqlite_pragmas(connection, pragmas):
+    """Apply the given pragmas to a raw sqlite3 connection"""
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def tune_sqlite_connection(sender, connection, **kwargs):
+    """Apply the performance pragmas to each new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+
+    if not getattr(settings, 'SQLITE_PERFORMANCE_MODE', False):
+        return
+
+    apply_sqlite_pragmas(connection.connection, settings.SQLITE_PRAGMAS)
+
+
+def estimate_row_count(model, using):
+    """Return the planner's estimate of a table's row count, or None when
+    the database has no statistics for it. Unlike COUNT(*) this does not
+    scan the table"""
+    connection = connections[using]
+    table = model._meta.db_table
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [connection.ops.quote_name(table)]
+            )
+        elif connection.vendor == 'sqlite':
+            # Filled in by ANALYZE, the first number is the table's row count
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            except DatabaseError:
+                return None
+        else:
+            return None
+
+        row = cursor.fetchone()
+
+    if row is None or row[0] is None:
+        return None
+
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate >= 0 else None
+
+
+def on_commit_batch(key, items, callback, using=None):
+    """Collect ``items`` over the current transaction and pass them all,
+    as a set, to one ``callback`` call once it commits, rather than one
+    call each. ``key`` tells batches apart. Outside a transaction the
+    callback runs at once"""
+    connection = transaction.get_connection(using)
+    batches = connection.__dict__.setdefault('on_commit_batches', {})
+    batch = batches.get(key)
+
+    # A batch whose callback went with a rolled back savepoint starts over
+    if batch is not None and any(func is batch[1] for _, func in connection.run_on_commit):
+        batch[0].update(items)
+        return
+
+    collected = set(items)
+
+    def run():
+        if batches.get(key, (None, None))[1] is run:
+            del batches[key]
+        callback(collected)
+
+    batches[key] = (collected, run)
+    transaction.on_commit(run, using=using)
+
+
+class GroupConcat(Aggregate):
+    """Join the values of a group into one comma separated string"""
+    function = 'GROUP_CONCAT'
+    name = 'GroupConcat'
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG',
+            template="%(function)s(%(expressions)s::text, ',')", **extra_context
+        )
@@ -0,0 +1,185 @@
+import json
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Sent instead of the dropped events when a subscriber falls too far behind
+RESYNC = {'type': 'resync'}
+
+
+class Subscription:
+    """Bounded queue of events for one connected client. When the client
+    reads slower than events arrive, the queued events are replaced by a
+    single resync event instead of growing without limit"""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.lock = threading.Lock()
+
+    def put(self, event):
+        with self.lock:
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                while True:
+                    try:
+                        self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                self.queue.put_nowait(RESYNC)
+
+    def get(self, timeout):
+        """Return the next event, or None when nothing arrived in time"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class Broker:
+    """In-process fan out of events to the subscriptions of each user"""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id, maxsize=None):
+        subscription = Subscription(user_id, maxsize or settings.EVENTS_QUEUE_SIZE)
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.user_id, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def user_ids(self):
+        with self.lock:
+            return list(self.subscriptions)
+
+    def deliver(self, user_id, event):
+        with self.lock:
+            subscribers = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class LocalBackend:
+    """Deliver events to clients connected to this process only"""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def publish(self, user_id, event):
+        self.broker.deliver(user_id, event)
+
+
+class ChangeLogBackend:
+    """Deliver events across processes by polling the change log for the
+    users connected to this process. Writes need no extra work since the
+    change log is written anyway"""
+
+    def __init__(self, broker, interval=None):
+        self.broker = broker
+        self.interval = interval or settings.EVENTS_POLL_SECONDS
+        self.cursors = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='events', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def publish(self, user_id, event):
+        pass
+
+    def _run(self):
+        """Poll until stopped. A failed poll, such as a locked
+        database or a dropped connection, is logged and retried on the
+        next interval, it must not stop events for every open stream"""
+        while not self.stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception('polling the change log for events failed')
+            finally:
+                close_old_connections()
+
+    def poll(self):
+        from core import sharding
+        from core.models import ChangeLogEntry
+
+        by_alias = {}
+        for user_id in self.broker.user_ids():
+            alias = sharding.shard_for_user(user_id) if sharding.is_enabled() else 'default'
+            by_alias.setdefault(alias, []).append(user_id)
+
+        for alias, user_ids in by_alias.items():
+            entries = ChangeLogEntry.objects.using(alias)
+            if alias not in self.cursors:
+                self.cursors[alias] = entries.aggregate(last=Max('id'))['last'] or 0
+                continue
+
+            for entry in entries.filter(
+                user_id__in=user_ids, id__gt=self.cursors[alias]
+            ).order_by('id'):
+                self.cursors[alias] = entry.id
+                self.broker.deliver(entry.user_id, {
+                    'type': 'change',
+                    'model': entry.model,
+                    'action': entry.action,
+                    'ids': [entry.object_id],
+                })
+
+
+broker = Broker()
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def backend():
+    """Return the configured ``EVENTS_BACKEND``, created on first use"""
+    global _backend
+
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.EVENTS_BACKEND)(broker)
+
+    return _backend
+
+
+def publish(user_id, event):
+    backend().publish(user_id, event)
+
+
+def format_event(event):
+    """Encode an event in the text/event-stream format"""
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'.encode()
+
+
+def stream(user_id, heartbeat=None):
+    """Yield a user's events as SSE messages, with a comment line as
+    heartbeat so proxies keep idle connections open"""
+    heartbeat = heartbeat or settings.EVENTS_HEARTBEAT_SECONDS
+    backend()
+    subscription = broker.subscribe(user_id)
+    try:
+        yield f'retry: {heartbeat * 1000}\n\n'.encode()
+        while True:
+            event = subscription.get(timeout=heartbeat)
+            yield b': ping\n\n' if event is None else format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
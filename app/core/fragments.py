@@ -0,0 +1,68 @@
+import random
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from core.models import new_version
+
+
+def _generation_key(user_id):
+    return f'fragments_{user_id}'
+
+
+def generation(user_id):
+    """Return the user's fragment generation, which changes when a tag or
+    ingredient shown inside the user's recipes is renamed or deleted"""
+    key = _generation_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        # Evicted or never set, a fresh value can only cause misses
+        cache.add(key, random.getrandbits(63), None)
+        value = cache.get(key)
+
+    return value
+
+
+def invalidate_user(user_id):
+    """Drop every cached fragment of the user's recipes"""
+    cache.set(_generation_key(user_id), random.getrandbits(63), None)
+
+
+def bump(queryset):
+    """Give the recipes of a queryset a new version and return it"""
+    version = new_version()
+    queryset.update(version=version)
+    return version
+
+
+def _key(serializer_class, recipe, user_generation):
+    return (
+        f'fragment_{serializer_class.__name__}_{recipe.pk}_'
+        f'{recipe.version}_{user_generation}'
+    )
+
+
+def render(serializer_class, recipes, context=None, prefetch=('tags', 'ingredients')):
+    """Return the serialized recipes in order, reusing fragments cached
+    under each recipe's version with one get_many. Only missed recipes
+    are prefetched and serialized. Serializers whose output depends on
+    the request cannot be cached this way"""
+    if not recipes:
+        return []
+
+    user_generation = generation(recipes[0].user_id)
+    keys = [_key(serializer_class, recipe, user_generation) for recipe in recipes]
+    cached = cache.get_many(keys)
+
+    missing = [
+        (key, recipe) for key, recipe in zip(keys, recipes) if key not in cached
+    ]
+    if missing:
+        objects = [recipe for _, recipe in missing]
+        prefetch_related_objects(objects, *prefetch)
+        rendered = serializer_class(objects, many=True, context=context).data
+        fresh = {key: dict(data) for (key, _), data in zip(missing, rendered)}
+        cache.set_many(fresh)
+        cached.update(fresh)
+
+    return [cached[key] for key in keys]
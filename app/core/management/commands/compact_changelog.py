@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    """Keep the change log bounded, run it periodically from cron"""
+
+    help = 'Remove superseded change log entries and expired tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tombstone-days', type=int, default=30,
+            help='Days deletes stay visible to clients syncing incrementally'
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASE_SHARDS or ['default']:
+            deleted = changelog.compact(
+                options['tombstone_days'], options['batch_size'], using=alias
+            )
+            self.stdout.write(self.style.SUCCESS(f'{alias}: removed {deleted} entries'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import purge
+
+
+class Command(BaseCommand):
+    """Background worker removing users, tags and ingredients marked
+    deleted by the API, in bounded batches"""
+
+    help = 'Delete users, tags and ingredients marked deleted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep running, checking for deleted objects every --interval seconds'
+        )
+        parser.add_argument('--interval', type=float, default=10)
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge.purge(options['batch_size'])
+            if purged:
+                self.stdout.write(self.style.SUCCESS(f'Purged {purged} objects'))
+
+            if not options['loop']:
+                return
+
+            close_old_connections()
+            time.sleep(options['interval'])
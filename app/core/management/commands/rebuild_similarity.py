@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from core import similarity
+
+
+class Command(BaseCommand):
+    """Recompute recipe similarity signatures, after changing the MinHash
+    parameters or to repair recipes changed by raw SQL"""
+
+    help = 'Rebuild the MinHash signatures and LSH buckets of every recipe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASE_SHARDS or ['default']:
+            rebuilt = similarity.rebuild(options['batch_size'], alias)
+            self.stdout.write(self.style.SUCCESS(f'{alias}: rebuilt {rebuilt} recipes'))
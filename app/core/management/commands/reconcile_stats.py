@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from core import stats
+
+
+class Command(BaseCommand):
+    """Recompute the stats counters of every user, repairing any drift
+    left by raw SQL or changes made while the signals were not running"""
+
+    help = 'Recompute the per-user stats counters and report the ones that drifted'
+
+    def handle(self, *args, **options):
+        for alias in settings.DATABASE_SHARDS or ['default']:
+            drifted = stats.reconcile_all(alias)
+            self.stdout.write(self.style.SUCCESS(f'{alias}: repaired {drifted} users'))
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    """Copy the primary SQLite database into each replica file, standing
+    in for streaming replication in local development"""
+
+    help = 'Copy the primary SQLite database into the replica databases'
+
+    def handle(self, *args, **options):
+        primary = connections['default'].settings_dict
+
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Replicas can only be refreshed for SQLite')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                connections[alias].close()
+                target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+
+                self.stdout.write(self.style.SUCCESS(f'Refreshed {alias}'))
+        finally:
+            source.close()
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Migrate the shard databases and move users between them"""
+
+    help = 'Migrate shards or rebalance users across them'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action')
+        subparsers.required = True
+
+        subparsers.add_parser(
+            'migrate',
+            help='Migrate every shard and reserve its id range'
+        )
+
+        rebalance = subparsers.add_parser(
+            'rebalance',
+            help='Move users to another shard'
+        )
+        rebalance.add_argument('--user', type=int, help='Id of the user to move')
+        rebalance.add_argument('--to', help='Target shard for --user')
+        rebalance.add_argument(
+            '--all',
+            action='store_true',
+            help='Move every user to its hashed shard, e.g. after adding a shard'
+        )
+        rebalance.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Users moved together, sharing the waits for workers and locked out meanwhile'
+        )
+        rebalance.add_argument(
+            '--settle',
+            type=float,
+            default=settings.SHARD_MAP_TTL,
+            help='Seconds to wait for workers to refresh the shard map'
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError('No DATABASE_SHARDS are configured')
+
+        if options['action'] == 'migrate':
+            self._migrate(options)
+        else:
+            self._rebalance(options)
+
+    def _migrate(self, options):
+        for alias in settings.DATABASE_SHARDS:
+            call_command('migrate', database=alias, verbosity=options['verbosity'])
+            sharding.reserve_id_range(alias)
+            self.stdout.write(self.style.SUCCESS(f'Migrated {alias}'))
+
+    def _rebalance(self, options):
+        if options['user'] is not None:
+            if options['to'] not in settings.DATABASE_SHARDS:
+                raise CommandError('--to must name one of DATABASE_SHARDS')
+            moves = [(options['user'], options['to'])]
+        elif options['all']:
+            user_ids = get_user_model().objects.using('default').values_list(
+                'id', flat=True
+            )
+            moves = [(user_id, sharding.hashed_shard(user_id)) for user_id in user_ids]
+        else:
+            raise CommandError('Pass --user and --to, or --all')
+
+        moves = [
+            (user_id, sharding.shard_for_user(user_id), target) for user_id, target in moves
+        ]
+        moves = [move for move in moves if move[1] != move[2]]
+        batch_size = max(1, options['batch_size'])
+
+        for start in range(0, len(moves), batch_size):
+            batch = moves[start:start + batch_size]
+            moved = sharding.move_users(
+                [(user_id, target) for user_id, _, target in batch], settle=options['settle']
+            )
+            for user_id, source, target in batch:
+                if user_id in moved:
+                    self.stdout.write(
+                        f'User {user_id}: {source} -> {target} ({moved[user_id]} rows)'
+                    )
@@ -0,0 +1,136 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import clickjacking, csrf
+from django.utils.cache import patch_vary_headers
+
+from core import compression, routers
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+PIN_COOKIE = 'pin_primary'
+PIN_HEADER = 'HTTP_X_PIN_PRIMARY'
+
+
+class ReplicaRoutingMiddleware:
+    """Serve safe requests from replicas, pinning clients to the primary
+    for a short window after they write so they read their own writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _is_pinned(self, request):
+        """Check the pin cookie or header still holds a future timestamp"""
+        value = request.COOKIES.get(PIN_COOKIE) or request.META.get(PIN_HEADER)
+        try:
+            return float(value) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+
+        with routers.read_from_replica(safe and not self._is_pinned(request)):
+            response = self.get_response(request)
+            if response.streaming:
+                response.streaming_content = routers.routed(
+                    response.streaming_content, routers.capture()
+                )
+
+        if not safe and response.status_code < 400:
+            seconds = settings.REPLICA_PIN_SECONDS
+            until = str(time.time() + seconds)
+            response.set_cookie(PIN_COOKIE, until, max_age=seconds, httponly=True)
+            response['X-Pin-Primary'] = until
+
+        return response
+
+
+class CompressionMiddleware:
+    """Compress API responses with brotli or gzip, as the client accepts.
+    Small bodies are sent as they are, since compression would save less
+    than it costs. Streamed responses are compressed on the fly"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.has_header('Content-Encoding'):
+            return response
+        if not compression.COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compression.compress_sequence(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+
+            compressed = compression.compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body differs byte for byte from the original
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = f'W/{etag}'
+
+        response['Content-Encoding'] = encoding
+        return response
+
+
+def is_api_request(request):
+    """Check whether the request is for the token authenticated API"""
+    return request.path_info.startswith(settings.API_URL_PREFIXES)
+
+
+class SiteOnlyMiddlewareMixin:
+    """Pass API requests straight through. Sessions, CSRF, messages and
+    the session based user only matter to the admin and browser pages"""
+
+    def __call__(self, request):
+        if is_api_request(request):
+            return self.get_response(request)
+
+        return super().__call__(request)
+
+
+class SessionMiddleware(SiteOnlyMiddlewareMixin, sessions.SessionMiddleware):
+    pass
+
+
+class CsrfViewMiddleware(SiteOnlyMiddlewareMixin, csrf.CsrfViewMiddleware):
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_api_request(request):
+            return None
+
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(SiteOnlyMiddlewareMixin, auth.AuthenticationMiddleware):
+    pass
+
+
+class MessageMiddleware(SiteOnlyMiddlewareMixin, messages.MessageMiddleware):
+    pass
+
+
+class XFrameOptionsMiddleware(SiteOnlyMiddlewareMixin, clickjacking.XFrameOptionsMiddleware):
+    pass
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold tags and ingredients whose names only differ in case into the
+    oldest one, so the unique index can be built"""
+    db = schema_editor.connection.alias
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for model_name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field).through
+        column = f'{model_name.lower()}_id'
+        keep = {}
+
+        for pk, user_id, name in model.objects.using(db).order_by('id').values_list(
+            'id', 'user_id', 'name'
+        ):
+            key = (user_id, name.lower())
+            if key not in keep:
+                keep[key] = pk
+                continue
+
+            survivor = keep[key]
+            linked = set(through.objects.using(db).filter(
+                **{column: survivor}
+            ).values_list('recipe_id', flat=True))
+            through.objects.using(db).filter(
+                **{column: pk}
+            ).exclude(recipe_id__in=linked).update(**{column: survivor})
+            through.objects.using(db).filter(**{column: pk}).delete()
+            model.objects.using(db).filter(pk=pk).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_usershard'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX core_tag_user_id_lower_name_uniq '
+             'ON core_tag (user_id, LOWER(name))'],
+            ['DROP INDEX core_tag_user_id_lower_name_uniq'],
+        ),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX core_ingredient_user_id_lower_name_uniq '
+             'ON core_ingredient (user_id, LOWER(name))'],
+            ['DROP INDEX core_ingredient_user_id_lower_name_uniq'],
+        ),
+    ]
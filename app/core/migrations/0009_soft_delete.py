@@ -0,0 +1,51 @@
+# Generated by Django 2.1.15 on 2026-10-19 09:13
+
+from django.db import migrations, models
+
+NAME_INDEXES = (
+    ('core_tag_user_id_lower_name_uniq', 'core_tag'),
+    ('core_ingredient_user_id_lower_name_uniq', 'core_ingredient'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_changelog'),
+    ]
+
+    # SQLite rebuilds the tables to add the columns, which drops the name
+    # indexes. They come back partial, so a name is free again as soon as
+    # its object is marked deleted
+    operations = [
+        migrations.RunSQL(
+            [f'DROP INDEX IF EXISTS {name}' for name, table in NAME_INDEXES],
+            [
+                f'CREATE UNIQUE INDEX {name} ON {table} (user_id, LOWER(name))'
+                for name, table in NAME_INDEXES
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='is_deleted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunSQL(
+            [
+                f'CREATE UNIQUE INDEX {name} ON {table} (user_id, LOWER(name)) '
+                'WHERE NOT is_deleted'
+                for name, table in NAME_INDEXES
+            ],
+            [f'DROP INDEX IF EXISTS {name}' for name, table in NAME_INDEXES],
+        ),
+    ]
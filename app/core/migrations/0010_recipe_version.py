@@ -0,0 +1,19 @@
+# Generated by Django 2.1.15 on 2026-10-19 09:28
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='version',
+            field=models.BigIntegerField(default=core.models.new_version, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.1.15 on 2026-10-19 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('access_before', models.FloatField(default=0)),
+                ('refresh_before', models.FloatField(default=0)),
+            ],
+        ),
+    ]
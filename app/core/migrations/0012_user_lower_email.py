@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Refuse to build the index over emails that only differ in case.
+    Those are separate accounts, and which one to keep is a decision for
+    an operator"""
+    db = schema_editor.connection.alias
+    User = apps.get_model('core', 'User')
+    seen = {}
+    duplicates = []
+
+    for pk, email in User.objects.using(db).annotate(
+        lower_email=Lower('email')
+    ).order_by('lower_email', 'id').values_list('id', 'lower_email'):
+        if email in seen:
+            duplicates.append(f'{email} (users {seen[email]} and {pk})')
+        seen[email] = pk
+
+    if duplicates:
+        raise RuntimeError(
+            'Emails differing only in case must be resolved first: ' + ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_token_revocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX core_user_lower_email_uniq ON core_user (LOWER(email))'],
+            ['DROP INDEX core_user_lower_email_uniq'],
+        ),
+    ]
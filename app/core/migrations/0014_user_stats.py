@@ -0,0 +1,32 @@
+# Generated by Django 2.1.15 on 2026-10-19 09:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipes', models.PositiveIntegerField(default=0)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('time_minutes_min', models.IntegerField(null=True)),
+                ('time_minutes_max', models.IntegerField(null=True)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=17)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('tag_links', models.PositiveIntegerField(default=0)),
+                ('tags_used', models.PositiveIntegerField(default=0)),
+                ('ingredient_links', models.PositiveIntegerField(default=0)),
+                ('ingredients_used', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
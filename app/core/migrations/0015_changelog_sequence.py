@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def number_entries(apps, schema_editor):
+    """Number each user's entries in id order and move the user's horizon
+    up to the last of them. Cursors handed out so far were ids, clients
+    holding one must start over with a full sync"""
+    db = schema_editor.connection.alias
+    ChangeLogEntry = apps.get_model('core', 'ChangeLogEntry')
+    ChangeLogHorizon = apps.get_model('core', 'ChangeLogHorizon')
+    ChangeLogSequence = apps.get_model('core', 'ChangeLogSequence')
+    entries = ChangeLogEntry.objects.using(db)
+
+    for user_id in entries.values_list('user_id', flat=True).distinct().order_by():
+        ids = entries.filter(user_id=user_id).order_by('id').values_list('id', flat=True)
+        last = 0
+        for last, pk in enumerate(list(ids), 1):
+            entries.filter(pk=pk).update(sequence=last)
+
+        ChangeLogSequence.objects.using(db).create(user_id=user_id, last=last)
+        ChangeLogHorizon.objects.using(db).update_or_create(
+            user_id=user_id, defaults={'cursor': last}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogSequence',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='changelogentry',
+            name='sequence',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_entries, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='changelogentry',
+            name='sequence',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='changelogentry',
+            unique_together={('user', 'sequence')},
+        ),
+        migrations.RemoveIndex(
+            model_name='changelogentry',
+            name='core_change_user_id_ce4e15_idx',
+        ),
+    ]
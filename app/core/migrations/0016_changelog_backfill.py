@@ -0,0 +1,62 @@
+from django.db import migrations
+
+# Log names of the tracked models, tags and ingredients first so clients
+# have them before the recipes referring to them
+MODELS = ('tag', 'ingredient', 'recipe')
+
+
+def log_existing(apps, schema_editor):
+    """Write create entries for the rows made before the change log, so a
+    full sync from cursor 0 returns them too"""
+    db = schema_editor.connection.alias
+    ChangeLogEntry = apps.get_model('core', 'ChangeLogEntry')
+    ChangeLogSequence = apps.get_model('core', 'ChangeLogSequence')
+    models = {name: apps.get_model('core', name) for name in MODELS}
+    entries = ChangeLogEntry.objects.using(db)
+
+    def live(name):
+        rows = models[name].objects.using(db)
+        if any(field.name == 'is_deleted' for field in models[name]._meta.fields):
+            rows = rows.filter(is_deleted=False)
+        return rows
+
+    user_ids = set()
+    for name in MODELS:
+        user_ids.update(live(name).values_list('user_id', flat=True).distinct().order_by())
+
+    for user_id in sorted(user_ids):
+        missing = []
+        for name in MODELS:
+            logged = set(entries.filter(user_id=user_id, model=name).values_list(
+                'object_id', flat=True
+            ))
+            missing.extend(
+                (name, pk) for pk in live(name).filter(user_id=user_id).order_by(
+                    'id'
+                ).values_list('id', flat=True)
+                if pk not in logged
+            )
+        if not missing:
+            continue
+
+        sequence, _ = ChangeLogSequence.objects.using(db).get_or_create(user_id=user_id)
+        entries.bulk_create([
+            ChangeLogEntry(
+                user_id=user_id, model=name, object_id=pk, action='create',
+                sequence=number
+            )
+            for number, (name, pk) in enumerate(missing, sequence.last + 1)
+        ], batch_size=1000)
+        sequence.last += len(missing)
+        sequence.save(using=db)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_changelog_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(log_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# Columns the admin searches by case-insensitive prefix (``^`` search fields)
+SEARCH_COLUMNS = [
+    ('core_user', 'email'),
+    ('core_tag', 'name'),
+    ('core_ingredient', 'name'),
+    ('core_recipe', 'title'),
+]
+
+
+def index_name(table, column):
+    return f'{table}_{column}_prefix'
+
+
+def create_indexes(apps, schema_editor):
+    """Index the columns in the form ``istartswith`` compares them: SQLite
+    only narrows ``LIKE`` with a NOCASE index on the bare column, PostgreSQL
+    needs ``UPPER(col::text)`` with pattern operators for ``LIKE 'X%'``"""
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+
+    for table, column in SEARCH_COLUMNS:
+        if connection.vendor == 'sqlite':
+            expression = f'{quote(column)} COLLATE NOCASE'
+        elif connection.vendor == 'postgresql':
+            expression = f'(UPPER({quote(column)}::text)) text_pattern_ops'
+        else:
+            continue
+
+        schema_editor.execute(
+            f'CREATE INDEX {quote(index_name(table, column))} '
+            f'ON {quote(table)} ({expression})'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return
+
+    for table, column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {connection.ops.quote_name(index_name(table, column))}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_recipe_image_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -1,6 +1,9 @@
 import uuid
 import os
-from django.db import models
+import random
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 
@@ -11,7 +14,34 @@ def recipe_image_file_path(instance, filename) :
 
     return os.path.join('uploads/recipe/', filename)
 
+def new_version():
+    """Return a random recipe version. Random rather than counted so a
+    recipe id reused after a delete never matches an old version"""
+    return random.getrandbits(63)
+
 class UserManager(BaseUserManager) :
+    """Emails are unique and looked up case-insensitively through the
+    LOWER(email) unique index. Filtering on Lower('email') against a
+    lowered constant lets the database seek that index"""
+
+    def with_email(self, email):
+        """Return the users whose email matches regardless of case"""
+        return self.annotate(lower_email=Lower('email')).filter(
+            lower_email=Lower(Value(email))
+        )
+
+    def email_exists(self, email, exclude=None):
+        """Check whether an email is taken in any case, optionally by
+        someone other than the ``exclude`` user"""
+        users = self.with_email(email)
+        if exclude is not None:
+            users = users.exclude(pk=exclude.pk)
+
+        return users.exists()
+
+    def get_by_natural_key(self, username):
+        """Resolve logins case-insensitively"""
+        return self.with_email(username).get()
 
     def create_user(self, email, password=None, **kwargs) :
         """ Creates and saves a new user """
@@ -45,11 +75,58 @@ class User(AbstractBaseUser, PermissionsMixin) :
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    is_deleted = models.BooleanField(default=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
 
+class UserNameManager(models.Manager):
+    """Manager for user owned objects with a per-user unique name, compared
+    case-insensitively through the (user_id, LOWER(name)) unique index.
+    Objects marked deleted are hidden until core.purge removes them"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+    def _ids_by_name(self, user, names):
+        """Return {lowercased name: id} for the user's existing names"""
+        keys = {name.lower() for name in names} | set(names)
+        rows = self.filter(user=user).annotate(
+            lower_name=Lower('name')
+        ).filter(lower_name__in=keys).values_list('name', 'id')
+
+        return {name.lower(): pk for name, pk in rows}
+
+    def exists_with_name(self, user, name):
+        """Check whether the user already has an object with this name"""
+        return bool(self._ids_by_name(user, [name]))
+
+    def ids_for_names(self, user, names):
+        """Return ids for the names in order, creating the missing ones in
+        one bulk insert"""
+        wanted = {}
+        for name in names:
+            wanted.setdefault(name.lower(), name)
+
+        if not wanted:
+            return []
+
+        ids = self._ids_by_name(user, wanted.values())
+        missing = [name for key, name in wanted.items() if key not in ids]
+
+        if missing:
+            try:
+                with transaction.atomic(using=router.db_for_write(self.model)):
+                    self.bulk_create([self.model(user=user, name=name) for name in missing])
+            except IntegrityError:
+                # Created concurrently by another request, picked up below
+                pass
+
+            ids.update(self._ids_by_name(user, missing))
+
+        return [ids[key] for key in wanted]
+
 class Tag(models.Model):
     """Tag to be used for a recipe"""
     name = models.CharField(max_length=255)
@@ -57,6 +134,10 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    is_deleted = models.BooleanField(default=False)
+
+    objects = UserNameManager()
+    all_objects = models.Manager()
 
     def __str__(self) :
         return self.name
@@ -69,6 +150,10 @@ class Ingredient(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
+    is_deleted = models.BooleanField(default=False)
+
+    objects = UserNameManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
@@ -87,7 +172,179 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
-    
+    # Indexed for the check that no other row uses a deleted recipe's file
+    image = models.ImageField(null=True, db_index=True, upload_to=recipe_image_file_path)
+    # Changes whenever the recipe or its links do, see core.fragments
+    version = models.BigIntegerField(default=new_version, editable=False)
+
+    def save(self, *args, **kwargs):
+        self.version = new_version()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        # The save's signals update the counters of core/stats.py, which
+        # must commit or roll back together with the row
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.title
+
+class RecipeSignature(models.Model):
+    """MinHash signature of a recipe's tags and ingredients, see
+    core/similarity.py"""
+
+    recipe = models.OneToOneField(
+        'Recipe',
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f'signature of {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    """LSH bucket of one band of a recipe's signature. Recipes sharing a
+    bucket are candidates for being similar"""
+
+    recipe = models.ForeignKey(
+        'Recipe',
+        on_delete=models.CASCADE
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} in {self.bucket}'
+
+class UserStats(models.Model):
+    """Counters summarizing a user's recipes, kept up to date by signals
+    as recipes and their links change, see core/stats.py. Links of tags
+    and ingredients marked deleted are not counted"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    recipes = models.PositiveIntegerField(default=0)
+    time_minutes_total = models.BigIntegerField(default=0)
+    time_minutes_min = models.IntegerField(null=True)
+    time_minutes_max = models.IntegerField(null=True)
+    price_total = models.DecimalField(max_digits=17, decimal_places=2, default=0)
+    price_min = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    price_max = models.DecimalField(max_digits=5, decimal_places=2, null=True)
+    tag_links = models.PositiveIntegerField(default=0)
+    tags_used = models.PositiveIntegerField(default=0)
+    ingredient_links = models.PositiveIntegerField(default=0)
+    ingredients_used = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipes} recipes'
+
+
+class UserShard(models.Model):
+    """Database shard holding a user's recipes, tags and ingredients"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    shard = models.CharField(max_length=63)
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.shard}'
+
+
+class ChangeLogEntry(models.Model):
+    """Append-only record of a change to a user's recipes, tags or
+    ingredients. The per-user sequence is the delta sync cursor, ids
+    come from each shard's own range and are kept when a user moves"""
+
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTIONS)
+    created = models.DateTimeField(auto_now_add=True)
+    sequence = models.BigIntegerField()
+
+    class Meta:
+        unique_together = (('user', 'sequence'),)
+        indexes = [
+            models.Index(fields=['user', 'model', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f'{self.sequence} {self.action} {self.model} {self.object_id}'
+
+
+class ChangeLogSequence(models.Model):
+    """Last change log sequence handed out for a user. Taking numbers
+    updates this row, which holds its lock until the transaction ends, so
+    a user's entries commit in sequence order"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    last = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id} @ {self.last}'
+
+
+class ChangeLogHorizon(models.Model):
+    """Newest change log cursor whose tombstones have been compacted away,
+    older cursors can no longer be synced incrementally"""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True
+    )
+    cursor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user_id} @ {self.cursor}'
+
+
+class TokenRevocation(models.Model):
+    """Signed tokens of a user issued before these times are rejected.
+    Not a foreign key so the row outlives a purged user until the user's
+    last tokens have expired"""
+
+    user_id = models.IntegerField(primary_key=True)
+    access_before = models.FloatField(default=0)
+    refresh_before = models.FloatField(default=0)
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return f'{self.user_id} before {self.access_before}'
@@ -0,0 +1,133 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+
+from core import (
+    authentication, changelog, cookable, fragments, sharding, similarity, stats, tokens
+)
+from core.models import (
+    ChangeLogEntry, ChangeLogHorizon, ChangeLogSequence, Ingredient, Recipe, Tag, UserShard,
+    UserStats
+)
+
+# Recipe M2M through table and its column for each attribute model
+LINKS = {
+    Tag: (Recipe.tags.through, 'tag_id'),
+    Ingredient: (Recipe.ingredients.through, 'ingredient_id'),
+}
+
+
+def mark_deleted(obj):
+    """Hide a user, tag or ingredient right away and leave its removal to
+    ``purge``. Large accounts and heavily used tags would otherwise be
+    deleted in one request by the cascading collector"""
+    model = type(obj)
+    update = {'is_deleted': True}
+    is_user = isinstance(obj, get_user_model())
+    if is_user:
+        update['is_active'] = False
+
+    using = router.db_for_write(model, instance=obj)
+    with transaction.atomic(using=using):
+        model._base_manager.using(using).filter(pk=obj.pk).update(**update)
+        if is_user:
+            tokens.revoke(obj.pk)
+            transaction.on_commit(lambda: authentication.forget_user(obj.pk), using=using)
+        else:
+            transaction.on_commit(lambda: fragments.invalidate_user(obj.user_id), using=using)
+        if model is Ingredient:
+            transaction.on_commit(lambda: cookable.changed(
+                obj.user_id, lambda index: index.remove_ingredient(obj.pk)
+            ), using=using)
+        if model in LINKS:
+            stats.attribute_hidden(obj, using)
+            changelog.record(obj.user_id, model._meta.model_name, [obj.pk],
+                             ChangeLogEntry.DELETE, using)
+
+
+def _batches(queryset, batch_size):
+    """Yield lists of up to ``batch_size`` ids until the queryset is empty.
+    Each batch must be deleted before the next one is read"""
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+
+
+def _delete_recipes(recipes, batch_size):
+    """Delete recipes with their links in batches, removing the image
+    files once each batch is committed. They are not counted, the caller
+    removes or reconciles the user's stats row"""
+    deleted = 0
+    using = recipes.db
+    for ids in _batches(recipes, batch_size):
+        with transaction.atomic(using=using), changelog.suppressed(), stats.suppressed():
+            for through, _ in LINKS.values():
+                through.objects.using(using).filter(recipe_id__in=ids).delete()
+            deleted += recipes.filter(id__in=ids).delete()[0]
+
+    return deleted
+
+
+def purge_attribute(obj, batch_size):
+    """Unlink a tag or ingredient from its recipes in batches, then delete
+    it. Recipes losing the link are logged as updated"""
+    through, column = LINKS[type(obj)]
+    using = obj._state.db
+    links = through.objects.using(using).filter(**{column: obj.pk}).order_by('id')
+
+    for ids in _batches(links, batch_size):
+        with transaction.atomic(using=using):
+            recipe_ids = list(links.filter(id__in=ids).values_list('recipe_id', flat=True))
+            with changelog.suppressed():
+                through.objects.using(using).filter(id__in=ids).delete()
+            changelog.record(obj.user_id, 'recipe', recipe_ids,
+                             ChangeLogEntry.UPDATE, using)
+            similarity.update_on_commit(recipe_ids, using)
+
+    with changelog.suppressed():
+        type(obj).all_objects.using(using).filter(pk=obj.pk).delete()
+
+
+def purge_user(user, batch_size):
+    """Delete a user and everything the user owns, a batch at a time"""
+    using = sharding.shard_for_user(user.pk) if sharding.is_enabled() else 'default'
+
+    _delete_recipes(
+        Recipe.objects.using(using).filter(user_id=user.pk).order_by('id'), batch_size
+    )
+    for model in (Tag, Ingredient, ChangeLogEntry):
+        manager = getattr(model, 'all_objects', model.objects)
+        rows = manager.using(using).filter(user_id=user.pk).order_by('id')
+        for ids in _batches(rows, batch_size):
+            with transaction.atomic(using=using), changelog.suppressed(), stats.suppressed():
+                manager.using(using).filter(id__in=ids).delete()
+
+    for model in (ChangeLogHorizon, ChangeLogSequence, UserStats):
+        model.objects.using(using).filter(user_id=user.pk).delete()
+    if using != 'default':
+        get_user_model()._base_manager.using(using).filter(pk=user.pk).delete()
+
+    UserShard.objects.using('default').filter(user_id=user.pk).delete()
+    user.delete(using='default')
+    sharding.forget(user.pk)
+
+
+def purge(batch_size=None):
+    """Remove everything marked deleted, returning the number of users,
+    tags and ingredients removed"""
+    batch_size = batch_size or settings.PURGE_BATCH_SIZE
+    purged = 0
+
+    for user in get_user_model()._base_manager.using('default').filter(is_deleted=True):
+        purge_user(user, batch_size)
+        purged += 1
+
+    for alias in settings.DATABASE_SHARDS or ['default']:
+        for model in LINKS:
+            for obj in model.all_objects.using(alias).filter(is_deleted=True):
+                purge_attribute(obj, batch_size)
+                purged += 1
+
+    return purged
@@ -0,0 +1,123 @@
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from core import sharding
+
+_state = threading.local()
+
+_END = object()
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Route reads made inside the block to a replica when enabled"""
+    previous = getattr(_state, 'read_from_replica', False)
+    _state.read_from_replica = enabled
+    try:
+        yield
+    finally:
+        _state.read_from_replica = previous
+
+
+def reading_from_replica():
+    """Check whether the current request may read from a replica, that is
+    it tolerates slightly stale data"""
+    return getattr(_state, 'read_from_replica', False)
+
+
+def capture():
+    """Return the calling thread's replica and shard routing, for work
+    that continues on another thread"""
+    return reading_from_replica(), sharding.current_shard()
+
+
+@contextmanager
+def restored(routing):
+    """Route queries made inside the block as returned by ``capture()``"""
+    replica, shard = routing
+    with read_from_replica(replica), sharding.use_shard(shard):
+        yield
+
+
+def routed(chunks, routing):
+    """Yield the chunks, producing each one routed as returned by
+    ``capture()``. Streamed bodies are produced after the view returned,
+    possibly on other threads, and lazy ones query as they go"""
+    chunks = iter(chunks)
+    while True:
+        with restored(routing):
+            chunk = next(chunks, _END)
+        if chunk is _END:
+            return
+        yield chunk
+
+
+class ShardRouter:
+    """Send queries on user owned tables to the owner's shard"""
+
+    def _db_for_model(self, model, **hints):
+        if not sharding.is_enabled() or not sharding.is_sharded(model):
+            return None
+
+        instance = hints.get('instance')
+        if instance is not None:
+            user_id = sharding.owner_id(instance)
+            if user_id is not None:
+                return sharding.shard_for_user(user_id)
+
+        return sharding.current_shard()
+
+    db_for_read = _db_for_model
+    db_for_write = _db_for_model
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations within a shard and to the global users"""
+        if not sharding.is_enabled():
+            return None
+
+        if obj1._state.db == obj2._state.db:
+            return True
+
+        user_model = get_user_model()
+        for owner, owned in ((obj1, obj2), (obj2, obj1)):
+            if isinstance(owner, user_model) and sharding.is_sharded(type(owned)):
+                return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRouter:
+    """Send reads to a replica inside safe requests and writes to the primary"""
+
+    def _aliases(self):
+        return ['default'] + list(settings.DATABASE_REPLICAS)
+
+    def db_for_read(self, model, **hints):
+        """Pick a random replica when the current request allows it"""
+        replicas = settings.DATABASE_REPLICAS
+        if replicas and reading_from_replica():
+            return random.choice(replicas)
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Never write to a replica, Django falls back to the primary"""
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Replicas hold the same rows as the primary"""
+        aliases = self._aliases()
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
@@ -0,0 +1,38 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Run the tests against a cache directory of their own, so clearing
+    the cache between tests never wipes the one of a server on the host"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.TemporaryDirectory()
+        caches = {
+            alias: self._cache_params(alias, params)
+            if params['BACKEND'] == 'core.cache.SharedMemoryCache' else params
+            for alias, params in settings.CACHES.items()
+        }
+        self.cache_settings = override_settings(CACHES=caches)
+        self.cache_settings.enable()
+
+    def _cache_params(self, alias, params):
+        location = os.path.join(self.cache_directory.name, alias)
+        return {
+            **params,
+            'LOCATION': location,
+            'OPTIONS': {
+                **params.get('OPTIONS', {}),
+                'OVERFLOW_LOCATION': os.path.join(location, 'overflow'),
+            },
+        }
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        self.cache_directory.cleanup()
+        super().teardown_test_environment(**kwargs)
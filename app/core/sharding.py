@@ -0,0 +1,250 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+# Tables partitioned by owner, the M2M through tables follow their recipe
+SHARDED_MODELS = {
+    'tag', 'ingredient', 'recipe', 'recipe_tags', 'recipe_ingredients',
+    'changelogentry', 'changeloghorizon', 'changelogsequence', 'recipesignature',
+    'recipebucket', 'userstats',
+}
+
+# Ids are allocated from a disjoint range on each shard so rows keep their
+# primary key when a user is moved and ids stay globally unique
+SHARD_ID_BITS = 40
+
+_state = threading.local()
+_shard_map = {}
+
+
+def is_enabled():
+    """Check whether user owned data is spread over shards"""
+    return bool(settings.DATABASE_SHARDS)
+
+
+def is_sharded(model):
+    """Check whether rows of the model live on the owner's shard"""
+    meta = model._meta
+    return meta.app_label == 'core' and meta.model_name in SHARDED_MODELS
+
+
+def owner_id(instance):
+    """Return the id of the user owning a model instance"""
+    if isinstance(instance, get_user_model()):
+        return instance.pk
+
+    user_id = getattr(instance, 'user_id', None)
+    if user_id is None and getattr(instance, 'recipe_id', None) is not None:
+        user_id = instance.recipe.user_id
+
+    return user_id
+
+
+def hashed_shard(user_id):
+    """Return the shard a user is placed on by default"""
+    shards = settings.DATABASE_SHARDS
+    return shards[user_id % len(shards)]
+
+
+def shard_for_user(user_id):
+    """Return the shard holding the user's data, using the shard map"""
+    from core.models import UserShard
+
+    cached = _shard_map.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    shard = UserShard.objects.using('default').filter(
+        user_id=user_id
+    ).values_list('shard', flat=True).first()
+
+    if shard is None:
+        shard = hashed_shard(user_id)
+
+    _shard_map[user_id] = (shard, time.monotonic() + settings.SHARD_MAP_TTL)
+    return shard
+
+
+def forget(user_id=None):
+    """Drop cached shard map entries"""
+    if user_id is None:
+        _shard_map.clear()
+    else:
+        _shard_map.pop(user_id, None)
+
+
+def current_shard():
+    """Return the shard activated for the current request, if any"""
+    return getattr(_state, 'shard', None)
+
+
+def activate(user_id):
+    """Route queries without an instance hint to the user's shard"""
+    _state.shard = shard_for_user(user_id) if is_enabled() else None
+
+
+def deactivate():
+    _state.shard = None
+
+
+@contextmanager
+def use_shard(alias):
+    """Route queries inside the block to the given shard"""
+    previous = current_shard()
+    _state.shard = alias
+    try:
+        yield
+    finally:
+        _state.shard = previous
+
+
+def copy_user(user, alias):
+    """Copy the user row into a shard so foreign keys resolve there"""
+    replica = copy.copy(user)
+    replica._state = copy.copy(user._state)
+    replica.save_base(using=alias, raw=True)
+
+
+def place_user(user):
+    """Record the user's shard and make the user row available there"""
+    from core.models import UserShard
+
+    assignment, _ = UserShard.objects.using('default').get_or_create(
+        user_id=user.pk,
+        defaults={'shard': hashed_shard(user.pk)}
+    )
+    forget(user.pk)
+    copy_user(user, assignment.shard)
+
+
+def reserve_id_range(alias):
+    """Start the id sequences of sharded tables at the shard's range"""
+    from django.apps import apps
+
+    offset = settings.DATABASE_SHARDS.index(alias) << SHARD_ID_BITS
+    connection = connections[alias]
+    tables = [
+        model._meta.db_table for model in apps.get_models(include_auto_created=True)
+        if is_sharded(model)
+    ]
+
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    'UPDATE sqlite_sequence SET seq = %s WHERE name = %s AND seq < %s',
+                    [offset, table, offset]
+                )
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, offset, table]
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+                    "GREATEST(%s, (SELECT COALESCE(MAX(id), 1) FROM " +
+                    connection.ops.quote_name(table) + ')))',
+                    [table, offset or 1]
+                )
+
+
+def move_user(user_id, target, settle=0):
+    """Move a user's recipes, tags and ingredients to another shard,
+    returning the number of rows moved. See ``move_users``"""
+    return move_users([(user_id, target)], settle).get(user_id, 0)
+
+
+def move_users(moves, settle=0):
+    """Move users' recipes, tags and ingredients to other shards given as
+    (user id, target) pairs, returning {user id: rows moved}. Copying
+    starts TOKEN_REVOCATION_TTL seconds after the users' access tokens
+    are revoked, once every worker rejects them, and the old rows are
+    removed ``settle`` seconds after the shard map changed, once workers
+    picked it up. Both waits are shared by the whole batch"""
+    from core import changelog, cookable, stats
+    from core.authentication import forget_user
+    from core.tokens import revoke
+    from core.models import (
+        ChangeLogEntry, ChangeLogHorizon, ChangeLogSequence, Ingredient, Recipe,
+        RecipeBucket, RecipeSignature, Tag, UserShard, UserStats
+    )
+
+    moves = [(user_id, shard_for_user(user_id), target) for user_id, target in moves]
+    users = get_user_model().objects.using('default').in_bulk(
+        [user_id for user_id, source, target in moves if source != target]
+    )
+    moves = [move for move in moves if move[0] in users]
+    if not moves:
+        return {}
+
+    through_models = (Recipe.tags.through, Recipe.ingredients.through)
+    moved = {}
+
+    # Lock the users out while rows are copied so no write lands on the
+    # old shard after it has been read
+    get_user_model().objects.using('default').filter(pk__in=users).update(is_active=False)
+    try:
+        for user_id in users:
+            forget_user(user_id)
+            revoke(user_id, refresh_tokens=False)
+
+        # Workers reload their revocation list every TOKEN_REVOCATION_TTL
+        # seconds, until then they accept the revoked tokens
+        time.sleep(settings.TOKEN_REVOCATION_TTL)
+
+        for user_id, source, target in moves:
+            copy_user(users[user_id], target)
+
+            with transaction.atomic(using=target):
+                moved[user_id] = 0
+                for model in (Tag, Ingredient, Recipe):
+                    rows = list(model.objects.using(source).filter(user_id=user_id))
+                    model.objects.using(target).bulk_create(rows)
+                    moved[user_id] += len(rows)
+
+                for model in (
+                    ChangeLogEntry, ChangeLogHorizon, ChangeLogSequence, RecipeSignature,
+                    RecipeBucket, UserStats
+                ):
+                    rows = list(model.objects.using(source).filter(user_id=user_id))
+                    model.objects.using(target).bulk_create(rows)
+
+                for through in through_models:
+                    rows = list(through.objects.using(source).filter(recipe__user_id=user_id))
+                    through.objects.using(target).bulk_create(rows)
+
+            UserShard.objects.using('default').update_or_create(
+                user_id=user_id,
+                defaults={'shard': target}
+            )
+            forget(user_id)
+
+        time.sleep(settle)
+
+        for user_id, source, _ in moves:
+            # The copied counters row moved with the rows, the old one is
+            # deleted below rather than counted down recipe by recipe
+            with transaction.atomic(using=source), changelog.suppressed(), stats.suppressed():
+                for through in through_models:
+                    through.objects.using(source).filter(recipe__user_id=user_id).delete()
+                for model in (
+                    Recipe, Tag, Ingredient, ChangeLogEntry, ChangeLogHorizon,
+                    ChangeLogSequence, UserStats
+                ):
+                    model.objects.using(source).filter(user_id=user_id).delete()
+
+            # The deletes above dropped the recipes from the cookable index
+            cookable.changed(user_id)
+    finally:
+        for user in users.values():
+            get_user_model().objects.using('default').filter(
+                pk=user.pk
+            ).update(is_active=user.is_active)
+
+    return moved
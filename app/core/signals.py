@@ -0,0 +1,279 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from core import (
+    authentication, changelog, cookable, fragments, sharding, similarity, stats
+)
+from core.db import on_commit_batch
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def place_user_on_shard(sender, instance, raw, using, **kwargs):
+    """Keep the shard map and the user's copy on its shard up to date"""
+    if raw or using != 'default' or not sharding.is_enabled():
+        return
+
+    sharding.place_user(instance)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def forget_user_tokens(sender, instance, raw, using, **kwargs):
+    """Drop the cached lookups of the user's tokens once a change commits"""
+    if raw or using != 'default':
+        return
+
+    transaction.on_commit(lambda: authentication.forget_user(instance.pk), using=using)
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, using, **kwargs):
+    """Drop the cached lookup of a changed or deleted token"""
+    transaction.on_commit(lambda: authentication.forget_token(instance.key), using=using)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def forget_fragments(sender, instance, created, raw, using, **kwargs):
+    """Drop the user's cached recipes once a tag or ingredient they may
+    show is changed"""
+    if raw or created:
+        return
+
+    transaction.on_commit(lambda: fragments.invalidate_user(instance.user_id), using=using)
+
+
+@receiver(post_save)
+def log_save(sender, instance, created, raw, using, **kwargs):
+    """Log creates and updates of recipes, tags and ingredients"""
+    name = changelog.model_name(sender)
+    if raw or name is None:
+        return
+
+    action = ChangeLogEntry.CREATE if created else ChangeLogEntry.UPDATE
+    changelog.record(instance.user_id, name, [instance.pk], action, using)
+
+
+@receiver(post_delete)
+def log_delete(sender, instance, using, **kwargs):
+    """Leave a tombstone for deleted recipes, tags and ingredients"""
+    name = changelog.model_name(sender)
+    if name is None:
+        return
+
+    changelog.record(instance.user_id, name, [instance.pk], ChangeLogEntry.DELETE, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def log_links(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    """Log recipes whose tags or ingredients changed, give them a new
+    version and refresh their similarity signatures"""
+    if action == 'pre_clear' and reverse:
+        # Clearing from the tag or ingredient side names no recipes later
+        instance._cleared_recipe_ids = list(
+            sender.objects.using(using).filter(
+                **{f'{instance._meta.model_name}_id': instance.pk}
+            ).values_list('recipe_id', flat=True)
+        )
+        return
+
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = sorted(pk_set)
+
+    version = fragments.bump(Recipe.objects.using(using).filter(pk__in=recipe_ids))
+    if not reverse:
+        instance.version = version
+    similarity.update_on_commit(recipe_ids, using)
+    changelog.record(instance.user_id, 'recipe', recipe_ids, ChangeLogEntry.UPDATE, using)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_cookable_links(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Apply committed ingredient link changes to the cookable index"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    pk_ids = set(pk_set or ())
+    if action == 'post_clear' and reverse:
+        def apply(index):
+            index.remove_ingredient(instance.pk)
+    elif action == 'post_clear':
+        def apply(index):
+            index.remove_links(instance.pk, list(index.links.get(instance.pk, ())))
+    elif reverse:
+        def apply(index):
+            for recipe_id in pk_ids:
+                if action == 'post_add':
+                    index.add_links(recipe_id, [instance.pk])
+                else:
+                    index.remove_links(recipe_id, [instance.pk])
+    else:
+        def apply(index):
+            if action == 'post_add':
+                index.add_links(instance.pk, pk_ids)
+            else:
+                index.remove_links(instance.pk, pk_ids)
+
+    transaction.on_commit(lambda: cookable.changed(instance.user_id, apply), using=using)
+
+
+@receiver(post_save, sender=Recipe)
+def add_cookable_recipe(sender, instance, created, raw, using, **kwargs):
+    """Add new recipes to the cookable index, needing no ingredients yet"""
+    if raw or not created:
+        return
+
+    transaction.on_commit(
+        lambda: cookable.changed(instance.user_id, lambda index: index.add_recipe(instance.pk)),
+        using=using
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_cookable_recipe(sender, instance, using, **kwargs):
+    """Drop deleted recipes from the cookable index"""
+    recipe_id = instance.pk
+    transaction.on_commit(
+        lambda: cookable.changed(instance.user_id, lambda index: index.remove_recipe(recipe_id)),
+        using=using
+    )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_values(sender, instance, raw, using, update_fields, **kwargs):
+    """Keep the stored time and price of an updated recipe for the stats
+    counters"""
+    if raw or instance._state.adding or not stats.counting():
+        return
+    if update_fields is not None and not {'time_minutes', 'price'} & set(update_fields):
+        return
+
+    instance._stats_previous = Recipe.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('time_minutes', 'price').first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe(sender, instance, created, raw, using, **kwargs):
+    """Count new recipes and time or price changes in the user's stats"""
+    previous = instance.__dict__.pop('_stats_previous', None)
+    if raw or not stats.counting():
+        return
+
+    current = (instance.time_minutes, instance.price)
+    if created:
+        stats.recipes_added(instance.user_id, [current], using)
+    elif previous is not None:
+        stats.recipe_changed(instance.user_id, previous, current, using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_recipe_links(sender, instance, using, **kwargs):
+    """Keep the visible links of a recipe about to be deleted, its through
+    rows are removed without m2m_changed"""
+    if not stats.counting():
+        return
+
+    instance._stats_links = {
+        field: list(getattr(Recipe, f'{field}s').through.objects.using(using).filter(
+            recipe_id=instance.pk, **{f'{field}__is_deleted': False}
+        ).values_list(column, flat=True))
+        for field, column in stats.LINKS.items()
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe(sender, instance, using, **kwargs):
+    """Take a deleted recipe and its links out of the user's stats"""
+    if not stats.counting():
+        return
+
+    stats.recipe_removed(instance.user_id, [(instance.time_minutes, instance.price)], using)
+    for field, attribute_ids in instance.__dict__.pop('_stats_links', {}).items():
+        stats.links_changed(instance.user_id, field, attribute_ids, -1, using)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def uncount_attribute(sender, instance, using, **kwargs):
+    """Take the links of a tag or ingredient deleted outright out of the
+    user's stats. Ones marked deleted were taken out already"""
+    if not instance.is_deleted and stats.counting():
+        stats.attribute_hidden(instance, using)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_links(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    """Count added and removed tag and ingredient links in the user's
+    stats"""
+    if not stats.counting():
+        return
+
+    field = 'tag' if sender is Recipe.tags.through else 'ingredient'
+    column = stats.LINKS[field]
+
+    if action == 'pre_clear':
+        # Cleared links are gone by post_clear, remember them now
+        links = sender.objects.using(using)
+        if reverse:
+            instance._stats_cleared = [instance.pk] * links.filter(
+                **{column: instance.pk}
+            ).count()
+        else:
+            instance._stats_cleared = list(
+                links.filter(recipe_id=instance.pk).values_list(column, flat=True)
+            )
+        return
+
+    if action == 'post_clear':
+        attribute_ids, delta = instance.__dict__.pop('_stats_cleared', []), -1
+    elif action in ('post_add', 'post_remove'):
+        attribute_ids = [instance.pk] * len(pk_set) if reverse else list(pk_set)
+        delta = 1 if action == 'post_add' else -1
+    else:
+        return
+
+    stats.links_changed(instance.user_id, field, attribute_ids, delta, using)
+
+
+def _delete_unused_images(names):
+    """Remove the image files no recipe row uses, one query per shard"""
+    names = set(names)
+    for alias in settings.DATABASE_SHARDS or ['default']:
+        names -= set(Recipe.objects.using(alias).filter(
+            image__in=names
+        ).values_list('image', flat=True))
+        if not names:
+            return
+
+    storage = Recipe._meta.get_field('image').storage
+    for name in names:
+        storage.delete(name)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, using, **kwargs):
+    """Remove the image file once the recipe deletion is committed, unless
+    a recipe row still uses it. Media storage is shared by the shards, so
+    a user moved to another shard keeps the files of the deleted copies.
+    The files of a transaction's deletes are checked together"""
+    if not instance.image:
+        return
+
+    on_commit_batch('recipe_images', [instance.image.name], _delete_unused_images, using)
@@ -0,0 +1,93 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+_MISSING = object()
+
+
+class _Call:
+    """One in-flight computation and the threads waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class Group:
+    """Run a computation once for all callers asking for the same key at
+    the same time. Later callers wait for the first one and share its
+    result, or its exception"""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn, shared=None):
+        """Return fn() for the key, joining a computation already running
+        in this process. With ``shared`` callers in other processes are
+        coalesced too, through a lock in the default cache"""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if settings.SINGLE_FLIGHT_SHARED if shared is None else shared:
+                call.result = self._do_shared(key, fn)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def _do_shared(self, key, fn):
+        """Compute under a cache lock, or wait for the worker holding it to
+        publish its result. Falls back to computing locally when the
+        result does not show up within ``SINGLE_FLIGHT_TIMEOUT``"""
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        lock_key = f'singleflight_lock_{digest}'
+        result_key = f'singleflight_result_{digest}'
+        timeout = settings.SINGLE_FLIGHT_TIMEOUT
+
+        if cache.add(lock_key, True, timeout):
+            try:
+                result = fn()
+                cache.set(result_key, result, settings.SINGLE_FLIGHT_RESULT_TTL)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL_SECONDS)
+            result = cache.get(result_key, _MISSING)
+            if result is not _MISSING:
+                return result
+            if cache.get(lock_key) is None:
+                # The other worker failed, or its result already expired
+                break
+
+        return fn()
+
+
+group = Group()
+
+
+def do(key, fn, shared=None):
+    return group.do(key, fn, shared)
@@ -0,0 +1,71 @@
+import importlib
+import inspect
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Modules whose serializers are built ahead of the first request
+SERIALIZER_MODULES = ('recipe.serializers', 'user.serializers')
+
+
+def profiling():
+    """Check whether STARTUP_PROFILE=1 asks for startup timings"""
+    return bool(int(os.environ.get('STARTUP_PROFILE', 0)))
+
+
+@contextmanager
+def phase(name):
+    """Report how long a startup phase took when profiling. Run with
+    PYTHONPROFILEIMPORTTIME=1 as well for a per-module import trace"""
+    if not profiling():
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.warning('startup %s took %.1f ms', name, (time.perf_counter() - start) * 1000)
+
+
+def warm_up():
+    """Do the lazy work the first request would otherwise pay for. With
+    preload_app this runs once in the gunicorn master and every worker
+    inherits the result. No database connection is opened, since it
+    would be shared across the fork"""
+    from django.conf import settings
+    from django.urls import get_resolver
+    from django.utils import translation
+    from rest_framework import serializers
+    from rest_framework.settings import api_settings
+
+    with phase('urls'):
+        resolver = get_resolver()
+        resolver.reverse_dict
+        for namespace in resolver.namespace_dict:
+            resolver.namespace_dict[namespace][1].reverse_dict
+
+    with phase('serializers'):
+        for module in SERIALIZER_MODULES:
+            for _, cls in inspect.getmembers(importlib.import_module(module), inspect.isclass):
+                if not issubclass(cls, serializers.Serializer) or cls.__module__ != module:
+                    continue
+                # Base classes for model serializers name no model
+                if issubclass(cls, serializers.ModelSerializer) and not hasattr(cls, 'Meta'):
+                    continue
+                cls(context={}).fields
+
+    with phase('rest framework'):
+        for name in (
+            'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES',
+            'DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_THROTTLE_CLASSES',
+        ):
+            getattr(api_settings, name)
+
+    with phase('translations'):
+        translation.activate(settings.LANGUAGE_CODE)
+        translation.gettext('This field is required.')
+        translation.deactivate()
@@ -0,0 +1,276 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, Max, Min, Sum
+
+# Recipe M2M field of each counted attribute, with the through column
+LINKS = {
+    'tag': 'tag_id',
+    'ingredient': 'ingredient_id',
+}
+
+CENT = Decimal('0.01')
+
+_state = threading.local()
+
+
+@contextmanager
+def suppressed():
+    """Skip counting inside the block, for bulk deletes that remove or
+    reconcile the user's counters row once instead"""
+    previous = getattr(_state, 'suppressed', False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def counting():
+    """Check whether changes are counted, that is outside ``suppressed``"""
+    return not getattr(_state, 'suppressed', False)
+
+
+def _values(time_minutes, price):
+    """Return the counted values of a recipe in their stored types"""
+    return int(time_minutes), Decimal(str(price)).quantize(CENT)
+
+
+def _update(user_id, using, change):
+    """Apply ``change(stats)`` to the user's locked counters row. A user
+    without a row is skipped, the row is computed from scratch by the
+    first read"""
+    from core.models import UserStats
+
+    with transaction.atomic(using=using):
+        stats = UserStats.objects.using(using).select_for_update().filter(
+            user_id=user_id
+        ).first()
+        if stats is None:
+            return
+
+        change(stats)
+        stats.save(using=using)
+
+
+def _recompute_extremes(stats, using):
+    """Set the minimums and maximums from the user's recipes, needed when
+    a recipe holding one of them goes away"""
+    from core.models import Recipe
+
+    stats.__dict__.update(Recipe.objects.using(using).filter(
+        user_id=stats.user_id
+    ).aggregate(
+        time_minutes_min=Min('time_minutes'), time_minutes_max=Max('time_minutes'),
+        price_min=Min('price'), price_max=Max('price'),
+    ))
+
+
+def _add(stats, values):
+    for time_minutes, price in values:
+        stats.recipes += 1
+        stats.time_minutes_total += time_minutes
+        stats.price_total += price
+        for field, value in (('time_minutes', time_minutes), ('price', price)):
+            low, high = f'{field}_min', f'{field}_max'
+            if getattr(stats, low) is None or value < getattr(stats, low):
+                setattr(stats, low, value)
+            if getattr(stats, high) is None or value > getattr(stats, high):
+                setattr(stats, high, value)
+
+
+def _remove(stats, values):
+    """Take recipes out of the counters, returning whether one of them
+    held a minimum or maximum"""
+    extreme = False
+    for time_minutes, price in values:
+        stats.recipes -= 1
+        stats.time_minutes_total -= time_minutes
+        stats.price_total -= price
+        extreme = extreme or time_minutes in (stats.time_minutes_min, stats.time_minutes_max) \
+            or price in (stats.price_min, stats.price_max)
+
+    return extreme
+
+
+def recipes_added(user_id, values, using):
+    """Count new recipes given as (time_minutes, price) pairs"""
+    values = [_values(*value) for value in values]
+    _update(user_id, using, lambda stats: _add(stats, values))
+
+
+def recipe_changed(user_id, previous, current, using):
+    """Count a recipe whose time or price changed"""
+    previous, current = _values(*previous), _values(*current)
+    if previous == current:
+        return
+
+    def change(stats):
+        extreme = _remove(stats, [previous])
+        _add(stats, [current])
+        if extreme:
+            _recompute_extremes(stats, using)
+
+    _update(user_id, using, change)
+
+
+def recipe_removed(user_id, values, using):
+    """Uncount deleted recipes, once their rows are gone"""
+    values = [_values(*value) for value in values]
+
+    def change(stats):
+        if _remove(stats, values):
+            _recompute_extremes(stats, using)
+
+    _update(user_id, using, change)
+
+
+def links_changed(user_id, field, attribute_ids, delta, using):
+    """Count links to tags or ingredients just added (delta 1) or removed
+    (delta -1), one id per link. Links of attributes marked deleted are
+    left out. The attributes' link counts after the change tell which of
+    them started or stopped being used. They are read without locking, so
+    links to one attribute added or removed concurrently can both or
+    neither count it and ``*_used`` drift until ``reconcile_stats`` runs"""
+    from core.models import Recipe
+
+    counts = Counter(attribute_ids)
+    if not counts:
+        return
+
+    model = getattr(Recipe, f'{field}s').field.related_model
+    now = dict(model.objects.using(using).filter(pk__in=counts).annotate(
+        links=Count('recipe')
+    ).values_list('pk', 'links'))
+
+    links = sum(counts[pk] for pk in now)
+    if delta > 0:
+        used = sum(now[pk] == counts[pk] for pk in now)
+    else:
+        used = -sum(now[pk] == 0 for pk in now)
+
+    def change(stats):
+        setattr(stats, f'{field}_links', getattr(stats, f'{field}_links') + delta * links)
+        setattr(stats, f'{field}s_used', getattr(stats, f'{field}s_used') + used)
+
+    if links:
+        _update(user_id, using, change)
+
+
+def attribute_hidden(obj, using):
+    """Uncount the links of a tag or ingredient being marked deleted or
+    deleted outright"""
+    from core.models import Recipe
+
+    field = obj._meta.model_name
+    through = getattr(Recipe, f'{field}s').through
+    links = through.objects.using(using).filter(**{LINKS[field]: obj.pk}).count()
+
+    def change(stats):
+        setattr(stats, f'{field}_links', getattr(stats, f'{field}_links') - links)
+        setattr(stats, f'{field}s_used', getattr(stats, f'{field}s_used') - 1)
+
+    if links:
+        _update(obj.user_id, using, change)
+
+
+def compute(user_id, using):
+    """Return the user's counters computed from scratch"""
+    from core.models import Recipe
+
+    found = Recipe.objects.using(using).filter(user_id=user_id).aggregate(
+        recipes=Count('id'),
+        time_minutes_total=Sum('time_minutes'),
+        time_minutes_min=Min('time_minutes'), time_minutes_max=Max('time_minutes'),
+        price_total=Sum('price'), price_min=Min('price'), price_max=Max('price'),
+    )
+    found['time_minutes_total'] = found['time_minutes_total'] or 0
+    found['price_total'] = found['price_total'] or Decimal(0)
+
+    for field, column in LINKS.items():
+        through = getattr(Recipe, f'{field}s').through
+        found.update(through.objects.using(using).filter(
+            recipe__user_id=user_id, **{f'{field}__is_deleted': False}
+        ).aggregate(**{
+            f'{field}_links': Count('id'),
+            f'{field}s_used': Count(column, distinct=True),
+        }))
+
+    return found
+
+
+def reconcile(user_id, using):
+    """Replace the user's counters with ones computed from scratch,
+    returning the row and whether it had drifted"""
+    from core.models import UserStats
+
+    with transaction.atomic(using=using):
+        found = compute(user_id, using)
+        stats = UserStats.objects.using(using).select_for_update().filter(
+            user_id=user_id
+        ).first()
+        if stats is None:
+            stats = UserStats(user_id=user_id, **found)
+            stats.save(using=using)
+            return stats, False
+
+        drifted = any(getattr(stats, name) != value for name, value in found.items())
+        if drifted:
+            stats.__dict__.update(found)
+            stats.save(using=using)
+
+    return stats, drifted
+
+
+def reconcile_all(using):
+    """Reconcile every user with recipes or counters on a database,
+    returning the number of users whose counters had drifted"""
+    from core.models import Recipe, UserStats
+
+    user_ids = set(Recipe.objects.using(using).values_list('user_id', flat=True).distinct())
+    user_ids.update(UserStats.objects.using(using).values_list('user_id', flat=True))
+
+    return sum(reconcile(user_id, using)[1] for user_id in sorted(user_ids))
+
+
+def _average(total, count):
+    return total / count if count else None
+
+
+def summary(user_id):
+    """Return the user's statistics from the counters row, computing the
+    row first for users who have none yet"""
+    from core.models import UserStats
+
+    stats = UserStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        try:
+            stats, _ = reconcile(user_id, router.db_for_write(UserStats))
+        except IntegrityError:
+            # Created by a concurrent request
+            stats = UserStats.objects.db_manager(
+                router.db_for_write(UserStats)
+            ).get(user_id=user_id)
+
+    def price(value):
+        return None if value is None else str(Decimal(value).quantize(CENT))
+
+    average_time = _average(stats.time_minutes_total, stats.recipes)
+    return {
+        'recipes': stats.recipes,
+        'time_minutes': {
+            'min': stats.time_minutes_min,
+            'max': stats.time_minutes_max,
+            'average': None if average_time is None else round(average_time, 1),
+        },
+        'price': {
+            'min': price(stats.price_min),
+            'max': price(stats.price_max),
+            'average': price(_average(stats.price_total, stats.recipes)),
+        },
+        'tags': {'used': stats.tags_used, 'links': stats.tag_links},
+        'ingredients': {'used': stats.ingredients_used, 'links': stats.ingredient_links},
+    }
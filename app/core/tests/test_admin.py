@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Ingredient, Recipe, Tag
+
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com", "password"
+        )
+        self.client.force_login(self.admin)
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+
+    def _create_recipes(self, count):
+        tag = Tag.objects.create(user=self.user, name=f"Tag {count}")
+        for i in range(count):
+            recipe = Recipe.objects.create(**{
+                "user": self.user,
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": 1.00
+            })
+            recipe.tags.add(tag)
+
+    def _changelist_queries(self, model, params=None):
+        url = reverse(f'admin:core_{model._meta.model_name}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params or {})
+        self.assertEqual(res.status_code, 200)
+        return res, len(queries)
+
+    def test_changelists(self):
+        """Test that changelists and the recipe form render"""
+        self._create_recipes(2)
+        Ingredient.objects.create(user=self.user, name="Salt")
+
+        for model in (Recipe, Tag, Ingredient, get_user_model()):
+            self._changelist_queries(model, {'q': 'a'})
+
+        recipe = Recipe.objects.first()
+        res = self.client.get(reverse('admin:core_recipe_change', args=[recipe.id]))
+        self.assertEqual(res.status_code, 200)
+
+    def test_constant_queries(self):
+        """Test that the number of queries does not grow with the rows"""
+        self._create_recipes(1)
+        _, few = self._changelist_queries(Recipe)
+
+        self._create_recipes(10)
+        _, many = self._changelist_queries(Recipe)
+
+        self.assertEqual(few, many)
+
+    def test_search_by_id(self):
+        """Test that numeric searches look up the primary key"""
+        self._create_recipes(3)
+        recipe = Recipe.objects.first()
+
+        res, _ = self._changelist_queries(Recipe, {'q': str(recipe.id)})
+
+        self.assertEqual(list(res.context['cl'].result_list), [recipe])
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=0)
+    def test_estimated_count(self):
+        """Test that unfiltered changelists use the table statistics"""
+        self._create_recipes(3)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '1000 1' WHERE tbl = 'core_recipe'"
+            )
+
+        res, _ = self._changelist_queries(Recipe)
+        self.assertEqual(res.context['cl'].result_count, 1000)
+
+        res, _ = self._changelist_queries(Recipe, {'q': 'Recipe'})
+        self.assertEqual(res.context['cl'].result_count, 3)
+
+    def test_search_uses_index(self):
+        """Test that prefix searches are narrowed by an index"""
+        self._create_recipes(1)
+
+        for model in (Recipe, Tag, Ingredient, get_user_model()):
+            res, _ = self._changelist_queries(model, {'q': 'te'})
+            plan = res.context['cl'].queryset.explain()
+            self.assertIn('_prefix', plan, model)
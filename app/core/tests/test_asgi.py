@@ -0,0 +1,156 @@
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+from unittest import mock
+
+from django.core.wsgi import get_wsgi_application
+from django.http import StreamingHttpResponse
+from django.test import SimpleTestCase, override_settings
+from django.urls import path
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+
+from core import routers
+from core.asgi import AsgiHandler
+from recipe.views import ShardedViewMixin
+
+
+def echo_app(environ, start_response):
+    """WSGI app echoing the request back in two chunks"""
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [
+        ('Content-Type', 'text/plain'),
+        ('Set-Cookie', ' pin=1'),
+    ])
+    return [
+        f'{environ["REQUEST_METHOD"]} {environ["PATH_INFO"]} '
+        f'{environ["QUERY_STRING"]} {environ["HTTP_AUTHORIZATION"]} '.encode(),
+        body,
+    ]
+
+
+class RoutingView(ShardedViewMixin, APIView):
+    """Stream the routing each chunk is produced with"""
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        return StreamingHttpResponse(
+            repr(routers.capture()).encode() for _ in range(4)
+        )
+
+
+urlpatterns = [
+    path('api/routing/', RoutingView.as_view()),
+]
+
+
+class ThreadPerCallExecutor(Executor):
+    """Run every call on a new thread, like a busy pool may"""
+
+    def submit(self, fn, *args):
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as exc:
+                future.set_exception(exc)
+
+        threading.Thread(target=run).start()
+        return future
+
+
+class AsgiHandlerTests(SimpleTestCase):
+
+    def _run(self, app, scope, messages, executor=None):
+        sent = []
+        incoming = list(messages)
+
+        async def receive():
+            if incoming:
+                return incoming.pop(0)
+            await asyncio.sleep(60)
+
+        async def send(message):
+            sent.append(message)
+
+        handler = AsgiHandler(app, max_workers=2)
+        if executor:
+            handler.executor = executor
+        asyncio.get_event_loop().run_until_complete(handler(scope, receive, send))
+        return sent
+
+    def test_http_request(self):
+        """Test a chunked request body reaches the WSGI app and the
+        response is streamed back"""
+        scope = {
+            'type': 'http',
+            'method': 'POST',
+            'path': '/api/recipe/recipes/',
+            'query_string': b'tags=1,2',
+            'headers': [(b'authorization', b'Token abc')],
+        }
+        sent = self._run(echo_app, scope, [
+            {'type': 'http.request', 'body': b'hello ', 'more_body': True},
+            {'type': 'http.request', 'body': b'world'},
+        ])
+
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'set-cookie', b'pin=1'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertEqual(
+            body, b'POST /api/recipe/recipes/ tags=1,2 Token abc hello world'
+        )
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    @override_settings(
+        ROOT_URLCONF='core.tests.test_asgi', DATABASE_SHARDS=['shard_a'],
+        DATABASE_REPLICAS=['replica']
+    )
+    def test_lazy_body_keeps_routing(self):
+        """Test chunks of a lazy body are routed like the view even when
+        pulled on other pool threads after the middleware returned"""
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': '/api/routing/',
+            'server': ('testserver', 80),
+        }
+        with mock.patch('core.sharding.shard_for_user', return_value='shard_a'):
+            sent = self._run(
+                get_wsgi_application(), scope, [{'type': 'http.request'}],
+                ThreadPerCallExecutor()
+            )
+
+        self.assertEqual(sent[0]['status'], 200)
+        chunks = [message['body'] for message in sent[1:-1]]
+        self.assertEqual(chunks, [b"(True, 'shard_a')"] * 4)
+
+    def test_disconnect_before_body(self):
+        """Test nothing runs when the client leaves mid upload"""
+        calls = []
+
+        def app(environ, start_response):
+            calls.append(environ)
+            return []
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/'}
+        sent = self._run(app, scope, [
+            {'type': 'http.request', 'body': b'partial', 'more_body': True},
+            {'type': 'http.disconnect'},
+        ])
+
+        self.assertEqual(sent, [])
+        self.assertEqual(calls, [])
+
+    def test_lifespan(self):
+        """Test the lifespan protocol is acknowledged"""
+        sent = self._run(echo_app, {'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'},
+            {'type': 'lifespan.shutdown'},
+        ])
+
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
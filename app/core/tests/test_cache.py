@@ -0,0 +1,217 @@
+import errno
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.cache import SharedMemoryCache
+
+ME_URL = reverse('user:me')
+
+
+class SharedMemoryCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache')
+
+    def _cache(self, **options):
+        options.setdefault('SLOTS', 64)
+        options.setdefault('SLOT_SIZE', 256)
+        return SharedMemoryCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Test values round trip and are gone once deleted"""
+        shared = self._cache()
+        shared.set('key', {'tags': [1, 2]})
+
+        self.assertEqual(shared.get('key'), {'tags': [1, 2]})
+        self.assertTrue(shared.has_key('key'))
+
+        shared.delete('key')
+        self.assertIsNone(shared.get('key'))
+        self.assertEqual(shared.get('key', 'default'), 'default')
+
+    def test_expired_values_are_missing(self):
+        """Test values are not returned after their timeout"""
+        shared = self._cache()
+        shared.set('key', 'value', 0.05)
+        time.sleep(0.1)
+
+        self.assertIsNone(shared.get('key'))
+        self.assertTrue(shared.add('key', 'new'))
+
+    def test_add_and_incr(self):
+        """Test add keeps live values and incr updates in place"""
+        shared = self._cache()
+
+        self.assertTrue(shared.add('count', 1))
+        self.assertFalse(shared.add('count', 10))
+        self.assertEqual(shared.incr('count', 2), 3)
+        self.assertEqual(shared.get('count'), 3)
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+
+    def test_oversized_values_overflow(self):
+        """Test values larger than a slot are kept in the overflow cache
+        and dropped from it when replaced or deleted"""
+        shared = self._cache()
+        self.assertTrue(shared.set('key', 'x' * 1000))
+        self.assertEqual(self._cache().get('key'), 'x' * 1000)
+        self.assertFalse(shared.add('key', 'small'))
+
+        shared.set('key', 'small')
+        self.assertEqual(shared.get('key'), 'small')
+        self.assertEqual(os.listdir(os.path.join(self.location, 'overflow')), [])
+
+        shared.set('key', 'y' * 1000)
+        shared.delete('key')
+        self.assertIsNone(shared.get('key'))
+        self.assertEqual(os.listdir(os.path.join(self.location, 'overflow')), [])
+
+    def test_oversized_values_dropped_without_overflow(self):
+        """Test without an overflow cache larger values replace older
+        ones with nothing and report they were not kept"""
+        shared = self._cache(OVERFLOW_ENTRIES=0)
+        shared.set('key', 'small')
+
+        self.assertFalse(shared.set('key', 'x' * 1000))
+        self.assertIsNone(shared.get('key'))
+
+    def test_full_sets_evict(self):
+        """Test memory stays bounded and recently read keys survive"""
+        shared = self._cache(SLOTS=8)
+        shared.set('hot', 'value')
+        for number in range(50):
+            shared.get('hot')
+            shared.set(f'key{number}', number)
+
+        self.assertEqual(shared.get('hot'), 'value')
+        self.assertIsNone(shared.get('key0'))
+        self.assertEqual(os.path.getsize(shared.path), shared.size)
+
+    def test_shared_between_instances_and_processes(self):
+        """Test values written by another process are read back"""
+        shared = self._cache()
+        shared.set('parent', 1)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                shared.set('child', shared.get('parent') + 1)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertEqual(self._cache().get('child'), 2)
+
+    def test_layout_change_uses_new_file(self):
+        """Test other options map a file of their own, leaving processes
+        still mapping the old one unaffected"""
+        old = self._cache()
+        old.set('key', 'value')
+        shared = self._cache(SLOT_SIZE=512)
+
+        self.assertIsNone(shared.get('key'))
+        self.assertEqual(old.get('key'), 'value')
+        self.assertEqual(sorted(os.listdir(self.location)), [shared.name, 'overflow'])
+        self.assertEqual(os.path.getsize(shared.path), shared.size)
+
+    def test_pages_reserved(self):
+        """Test the file's pages are allocated when it is sized, so a
+        full tmpfs fails then rather than when a page is touched"""
+        shared = self._cache()
+        shared.set('key', 'value')
+
+        self.assertGreaterEqual(os.stat(shared.path).st_blocks * 512, shared.size)
+
+    def test_allocation_failure_uses_process_memory(self):
+        """Test a cache whose file cannot be allocated still works,
+        keeping values in the memory of the process"""
+        full = OSError(errno.ENOSPC, 'No space left on device')
+        with patch('os.posix_fallocate', side_effect=full), \
+                self.assertLogs('core.cache', 'WARNING'):
+            shared = self._cache()
+            self.assertTrue(shared.set('key', 'value'))
+
+        self.assertEqual(shared.get('key'), 'value')
+        self.assertEqual(os.path.getsize(shared.path), 0)
+        self.assertIsNone(self._cache().get('key'))
+
+    def test_overflow_location(self):
+        """Test larger values go to the overflow directory configured"""
+        overflow = os.path.join(os.path.dirname(self.location), 'overflow')
+        shared = self._cache(OVERFLOW_LOCATION=overflow)
+        shared.set('key', 'x' * 1000)
+
+        self.assertEqual(shared.get('key'), 'x' * 1000)
+        self.assertEqual(len(os.listdir(overflow)), 1)
+        self.assertEqual(os.stat(overflow).st_mode & 0o777, 0o700)
+
+    def test_refuses_shared_paths(self):
+        """Test a directory other users can write, or a file linked into
+        it, is never mapped"""
+        os.mkdir(self.location, 0o700)
+        os.symlink(os.devnull, os.path.join(self.location, self._cache().name))
+        with self.assertRaises(OSError):
+            self._cache().get('key')
+
+        os.chmod(self.location, 0o777)
+        with self.assertRaises(ImproperlyConfigured):
+            self._cache().get('key')
+
+
+class CachedTokenAuthenticationTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com',
+            password='testpass',
+            name='Test'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        cache.clear()
+
+    def _queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+        return res.status_code, len(queries)
+
+    def test_token_lookup_is_cached(self):
+        """Test repeated requests skip the token query"""
+        status, first = self._queries()
+        self.assertEqual(status, 200)
+
+        status, second = self._queries()
+        self.assertEqual(status, 200)
+        self.assertLess(second, first)
+
+    def test_deactivated_user_is_rejected(self):
+        """Test saving an inactive user drops the cached lookup"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+
+    def test_deleted_token_is_rejected(self):
+        """Test a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
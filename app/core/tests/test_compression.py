@@ -0,0 +1,77 @@
+import gzip
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from core import compression
+from core.middleware import CompressionMiddleware
+
+BODY = json.dumps([{'title': f'Recipe {i}', 'price': '1.00'} for i in range(100)]).encode()
+
+
+class CompressionTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _process(self, response, accept='gzip, deflate'):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/', HTTP_ACCEPT_ENCODING=accept))
+
+    def test_choose_encoding(self):
+        """Test Accept-Encoding negotiation"""
+        self.assertEqual(compression.choose_encoding('gzip;q=0.5, identity'), 'gzip')
+        self.assertIsNone(compression.choose_encoding('gzip;q=0, deflate'))
+        self.assertIsNone(compression.choose_encoding(None))
+
+        with mock.patch.object(compression, 'brotli', mock.Mock()):
+            self.assertEqual(compression.choose_encoding('gzip, br'), 'br')
+
+    def test_compresses_json(self):
+        """Test that large JSON bodies are gzipped"""
+        res = self._process(HttpResponse(BODY, content_type='application/json'))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+        self.assertEqual(int(res['Content-Length']), len(res.content))
+        self.assertEqual(gzip.decompress(res.content), BODY)
+
+    def test_skips_small_and_binary(self):
+        """Test that small bodies and images are left alone"""
+        small = self._process(HttpResponse(b'{}', content_type='application/json'))
+        image = self._process(HttpResponse(BODY, content_type='image/jpeg'))
+        events = self._process(HttpResponse(BODY, content_type='text/event-stream'))
+
+        for res in (small, image, events):
+            self.assertFalse(res.has_header('Content-Encoding'))
+
+    def test_not_accepted(self):
+        """Test that clients not accepting gzip get the plain body"""
+        res = self._process(HttpResponse(BODY, content_type='application/json'), '')
+
+        self.assertEqual(res.content, BODY)
+        self.assertEqual(res['Vary'], 'Accept-Encoding')
+
+    def test_compressed_once(self):
+        """Test that identical bodies reuse the cached compressed body"""
+        with mock.patch.object(compression, '_compress', wraps=compression._compress) as spy:
+            first = self._process(HttpResponse(BODY, content_type='application/json'))
+            second = self._process(HttpResponse(BODY, content_type='application/json'))
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_streaming(self):
+        """Test that streamed exports are compressed on the fly"""
+        lines = [line + b'\n' for line in BODY.split(b',')]
+        res = self._process(StreamingHttpResponse(iter(lines), content_type='application/x-ndjson'))
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(res.streaming_content)), b''.join(lines))
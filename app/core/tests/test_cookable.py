@@ -0,0 +1,37 @@
+from django.test import SimpleTestCase
+
+from core.cookable import CookableIndex
+
+
+class CookableIndexTests(SimpleTestCase):
+
+    def setUp(self):
+        self.index = CookableIndex()
+        self.index.add_links(10, [1, 2])
+        self.index.add_links(11, [1, 2, 3])
+        self.index.add_links(12, [4])
+        self.index.add_recipe(13)
+
+    def test_subset(self):
+        """Test recipes are cookable when all their ingredients are had"""
+        self.assertEqual(self.index.cookable({1, 2}), [(10, 0), (13, 0)])
+        self.assertEqual(
+            self.index.cookable({1, 2, 3, 4}), [(10, 0), (11, 0), (12, 0), (13, 0)]
+        )
+
+    def test_ranked_by_missing(self):
+        """Test recipes missing a few ingredients follow, fewest first"""
+        self.assertEqual(
+            self.index.cookable({1}, max_missing=2), [(13, 0), (10, 1), (12, 1), (11, 2)]
+        )
+        self.assertEqual(self.index.cookable(set(), max_missing=9)[-1], (11, 3))
+
+    def test_incremental_changes(self):
+        """Test removals update the bitmaps and free positions are reused"""
+        self.index.remove_links(11, [3])
+        self.index.remove_recipe(10)
+        self.index.remove_ingredient(4)
+        self.index.add_links(14, [5])
+
+        self.assertEqual(self.index.cookable({1, 2}), [(11, 0), (12, 0), (13, 0)])
+        self.assertEqual(self.index.cookable({5}), [(14, 0), (12, 0), (13, 0)])
@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import tempfile
+from unittest.mock import MagicMock
+
+from django.test import TestCase, override_settings
+
+from core import db
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 1234,
+    'temp_store': 'MEMORY',
+}
+
+class SqliteTuningTests(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raw = sqlite3.connect(os.path.join(self.tmp.name, 'test.sqlite3'))
+
+    def tearDown(self):
+        self.raw.close()
+        self.tmp.cleanup()
+
+    def _pragma(self, name):
+        return self.raw.execute(f'PRAGMA {name}').fetchone()[0]
+
+    def test_apply_sqlite_pragmas(self):
+        """Test the pragmas are applied to the raw connection"""
+        db.apply_sqlite_pragmas(self.raw, PRAGMAS)
+
+        self.assertEqual(self._pragma('journal_mode'), 'wal')
+        self.assertEqual(self._pragma('synchronous'), 1)
+        self.assertEqual(self._pragma('busy_timeout'), 1234)
+        self.assertEqual(self._pragma('temp_store'), 2)
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=True, SQLITE_PRAGMAS=PRAGMAS)
+    def test_tune_connection_when_enabled(self):
+        """Test new sqlite connections are tuned in performance mode"""
+        connection = MagicMock(vendor='sqlite', connection=self.raw)
+        db.tune_sqlite_connection(sender=None, connection=connection)
+
+        self.assertEqual(self._pragma('journal_mode'), 'wal')
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=False, SQLITE_PRAGMAS=PRAGMAS)
+    def test_tune_connection_disabled_by_default(self):
+        """Test connections are left alone unless performance mode is on"""
+        connection = MagicMock(vendor='sqlite', connection=self.raw)
+        db.tune_sqlite_connection(sender=None, connection=connection)
+
+        self.assertEqual(self._pragma('journal_mode'), 'delete')
+
+    @override_settings(SQLITE_PERFORMANCE_MODE=True, SQLITE_PRAGMAS=PRAGMAS)
+    def test_other_vendors_ignored(self):
+        """Test non sqlite connections are never tuned"""
+        connection = MagicMock(vendor='postgresql')
+        db.tune_sqlite_connection(sender=None, connection=connection)
+
+        connection.connection.cursor.assert_not_called()
@@ -0,0 +1,140 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import admission, events
+from core.models import Tag
+
+EVENTS_URL = reverse('recipe:events')
+
+
+class BrokerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.broker = events.Broker()
+
+    def test_deliver_to_user_only(self):
+        """Test that events reach every subscription of the user only"""
+        first = self.broker.subscribe(1)
+        second = self.broker.subscribe(1)
+        other = self.broker.subscribe(2)
+
+        self.broker.deliver(1, {'type': 'change'})
+
+        self.assertEqual(first.get(0), {'type': 'change'})
+        self.assertEqual(second.get(0), {'type': 'change'})
+        self.assertIsNone(other.get(0))
+
+    def test_slow_subscriber_resyncs(self):
+        """Test that a full queue is replaced by a single resync event"""
+        subscription = self.broker.subscribe(1, maxsize=2)
+
+        for i in range(3):
+            self.broker.deliver(1, {'type': 'change', 'ids': [i]})
+
+        self.assertEqual(subscription.get(0), events.RESYNC)
+        self.assertIsNone(subscription.get(0))
+
+    def test_unsubscribe(self):
+        """Test that users without subscriptions are forgotten"""
+        subscription = self.broker.subscribe(1)
+        self.broker.unsubscribe(subscription)
+
+        self.assertEqual(self.broker.user_ids(), [])
+
+
+class EventStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_stream(self):
+        """Test that the stream sends heartbeats and published events"""
+        res = self.client.get(EVENTS_URL)
+        stream = iter(res.streaming_content)
+
+        self.assertEqual(res['Content-Type'], 'text/event-stream')
+        self.assertTrue(next(stream).startswith(b'retry: '))
+
+        events.publish(self.user.pk, {'type': 'change', 'model': 'tag', 'ids': [1]})
+        self.assertEqual(
+            next(stream),
+            b'event: change\ndata: {"type": "change", "model": "tag", "ids": [1]}\n\n'
+        )
+
+        res.close()
+        self.assertEqual(events.broker.user_ids(), [])
+
+    @override_settings(ADMISSION_POOLS={'events': {'limit': 1, 'max_queue': 0}})
+    def test_connection_cap(self):
+        """Test that streams beyond the cap are refused until one closes"""
+        admission.reset()
+        res = self.client.get(EVENTS_URL)
+
+        self.assertEqual(
+            self.client.get(EVENTS_URL).status_code, status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+        res.close()
+        again = self.client.get(EVENTS_URL)
+        self.assertEqual(again.status_code, status.HTTP_200_OK)
+        again.close()
+        admission.reset()
+
+    def test_heartbeat(self):
+        """Test that idle streams send a comment line"""
+        stream = events.stream(self.user.pk, heartbeat=0.01)
+        next(stream)
+
+        self.assertEqual(next(stream), b': ping\n\n')
+        stream.close()
+
+
+class ChangeLogBackendTests(TransactionTestCase):
+
+    def test_poll(self):
+        """Test that changes committed by any process are delivered"""
+        user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        broker = events.Broker()
+        backend = events.ChangeLogBackend(broker, interval=3600)
+        self.addCleanup(backend.stop)
+        subscription = broker.subscribe(user.pk)
+
+        backend.poll()
+        tag = Tag.objects.create(user=user, name="Vegan")
+        backend.poll()
+
+        self.assertEqual(subscription.get(0), {
+            'type': 'change', 'model': 'tag', 'action': 'create', 'ids': [tag.id]
+        })
+
+    def test_failed_poll_retried(self):
+        """Test that a failing poll is logged and polling goes on"""
+        polled = threading.Event()
+        failures = [OperationalError('database is locked')]
+
+        def poll():
+            if failures:
+                raise failures.pop()
+            polled.set()
+
+        with self.assertLogs('core.events', 'ERROR'), \
+                mock.patch.object(events.ChangeLogBackend, 'poll', side_effect=poll):
+            backend = events.ChangeLogBackend(events.Broker(), interval=0.01)
+            self.assertTrue(polled.wait(5))
+            backend.stop()
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+TAGS_URL = reverse('recipe:tag-list')
+ADMIN_LOGIN_URL = reverse('admin:login')
+
+
+class SiteOnlyMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.token = Token.objects.create(user=self.user)
+
+    def test_api_skips_site_middleware(self):
+        """Test that API requests bypass sessions, CSRF and frame options"""
+        res = self.client.get(TAGS_URL, HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(hasattr(res.wsgi_request, 'session'))
+        self.assertFalse(res.has_header('X-Frame-Options'))
+
+    def test_api_post_without_csrf(self):
+        """Test that token authenticated writes need no CSRF token"""
+        self.client = self.client_class(enforce_csrf_checks=True)
+        res = self.client.post(
+            TAGS_URL, {'name': 'Vegan'}, HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+
+        self.assertEqual(res.status_code, 201)
+
+    def test_api_ignores_session_login(self):
+        """Test that a session cookie does not authenticate API requests"""
+        self.client.force_login(self.user)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, 401)
+
+    def test_admin_keeps_site_middleware(self):
+        """Test that the admin still gets CSRF, sessions and frame options"""
+        self.client = self.client_class(enforce_csrf_checks=True)
+        res = self.client.get(ADMIN_LOGIN_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('csrftoken', res.cookies)
+        self.assertEqual(res['X-Frame-Options'], 'SAMEORIGIN')
+
+        res = self.client.post(ADMIN_LOGIN_URL, {'username': 'x', 'password': 'y'})
+        self.assertEqual(res.status_code, 403)
@@ -1,3 +1,4 @@
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from core import models
@@ -34,6 +35,19 @@ class ModelTests(TestCase) :
 
         self.assertEqual(user.email, email.lower())
 
+    def test_email_lookup_seeks_lower_index(self):
+        """Test case-insensitive email lookups use the LOWER(email) index"""
+        user = get_user_model().objects.create_user('Test@test.com', 'test124')
+        users = get_user_model().objects.with_email('TEST@test.com')
+
+        sql, params = users.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(row) for row in cursor.fetchall())
+
+        self.assertEqual(list(users), [user])
+        self.assertIn('core_user_lower_email_uniq', plan)
+
     def test_new_user_invalid_email(self):
         """Test creating user with no email raises error"""
         with self.assertRaises(ValueError):
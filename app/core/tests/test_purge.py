@@ -0,0 +1,107 @@
+import io
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import purge
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+
+ME_URL = reverse('user:me')
+
+
+def tag_detail_url(tag_id):
+    return reverse('recipe:tag-detail', args=[tag_id])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PurgeTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.tag = Tag.objects.create(user=self.user, name="Vegan")
+        self.recipes = [
+            Recipe.objects.create(**{
+                "user": self.user,
+                "title": f"Recipe {i}",
+                "time_minutes": 5,
+                "price": 1.00
+            })
+            for i in range(5)
+        ]
+        for recipe in self.recipes:
+            recipe.tags.add(self.tag)
+
+    def test_delete_tag_is_deferred(self):
+        """Test that deleting a tag hides it and keeps links until purged"""
+        res = self.client.delete(tag_detail_url(self.tag.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Tag.objects.filter(id=self.tag.id).exists())
+        self.assertEqual(list(self.recipes[0].tags.all()), [])
+        self.assertEqual(Recipe.tags.through.objects.count(), 5)
+
+        Tag.objects.create(user=self.user, name="vegan")
+
+    def test_purge_tag_in_batches(self):
+        """Test that purging unlinks the tag and logs the recipes"""
+        purge.mark_deleted(self.tag)
+        cursor = ChangeLogEntry.objects.latest('id').id
+
+        self.assertEqual(purge.purge(batch_size=2), 1)
+
+        self.assertFalse(Tag.all_objects.filter(id=self.tag.id).exists())
+        self.assertEqual(Recipe.tags.through.objects.count(), 0)
+        self.assertEqual(Recipe.objects.count(), 5)
+        self.assertEqual(
+            sorted(ChangeLogEntry.objects.filter(id__gt=cursor).values_list(
+                'object_id', flat=True
+            )),
+            sorted(recipe.id for recipe in self.recipes)
+        )
+
+    def test_delete_user(self):
+        """Test that deleting the account deactivates it and the worker
+        removes all of its data and images"""
+        Ingredient.objects.create(user=self.user, name="Salt")
+        recipe = self.recipes[0]
+        recipe.image.save('photo.jpg', ContentFile(b'image'))
+        path = recipe.image.path
+
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+
+        call_command('purge_deleted', '--batch-size', '2', stdout=io.StringIO())
+
+        self.assertFalse(get_user_model().objects.exists())
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.all_objects.exists())
+        self.assertFalse(Ingredient.all_objects.exists())
+        self.assertFalse(ChangeLogEntry.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_recipe_delete_removes_image(self):
+        """Test that deleting a recipe removes its image file"""
+        recipe = self.recipes[0]
+        recipe.image.save('photo.jpg', ContentFile(b'image'))
+        path = recipe.image.path
+
+        recipe.delete()
+
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,69 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(TestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.seen = []
+
+    def _view(self, request):
+        self.seen.append(self.router.db_for_read(Recipe))
+        return HttpResponse()
+
+    def test_reads_default_outside_requests(self):
+        """Test reads go to the primary unless a request allows replicas"""
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_writes_never_replica(self):
+        """Test writes are left to the primary inside replica blocks"""
+        with routers.read_from_replica():
+            self.assertIsNone(self.router.db_for_write(Recipe))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas_configured(self):
+        """Test reads stay on the primary when there are no replicas"""
+        with routers.read_from_replica():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_safe_request_reads_replica(self):
+        """Test GET requests read from a replica"""
+        middleware = ReplicaRoutingMiddleware(self._view)
+        middleware(self.factory.get('/api/recipe/recipes/'))
+
+        self.assertEqual(self.seen, ['replica'])
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_write_pins_client_to_primary(self):
+        """Test a write pins the following reads to the primary"""
+        middleware = ReplicaRoutingMiddleware(self._view)
+        res = middleware(self.factory.post('/api/recipe/recipes/'))
+
+        self.assertEqual(self.seen, [None])
+        self.assertIn('pin_primary', res.cookies)
+
+        request = self.factory.get('/api/recipe/recipes/')
+        request.COOKIES['pin_primary'] = res.cookies['pin_primary'].value
+        middleware(request)
+
+        header_request = self.factory.get(
+            '/api/recipe/recipes/', HTTP_X_PIN_PRIMARY=res['X-Pin-Primary']
+        )
+        middleware(header_request)
+
+        self.assertEqual(self.seen, [None, None, None])
+
+    def test_expired_pin_reads_replica(self):
+        """Test an expired pin no longer keeps reads on the primary"""
+        middleware = ReplicaRoutingMiddleware(self._view)
+        request = self.factory.get('/api/recipe/recipes/')
+        request.COOKIES['pin_primary'] = '0'
+        middleware(request)
+
+        self.assertEqual(self.seen, ['replica'])
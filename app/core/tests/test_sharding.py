@@ -0,0 +1,203 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import Recipe, Tag, UserShard
+
+SHARDS = ['shard_a', 'shard_b']
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+@override_settings(DATABASE_SHARDS=SHARDS, TOKEN_REVOCATION_TTL=0)
+class ShardingTests(TestCase):
+    """Test partitioning user owned data over local SQLite shards"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp()
+        for alias in SHARDS:
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.tmp, f'{alias}.sqlite3'),
+            }
+            call_command('migrate', database=alias, verbosity=0)
+            sharding.reserve_id_range(alias)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in SHARDS:
+            connections[alias].close()
+            del connections.databases[alias]
+            delattr(connections._connections, alias)
+        shutil.rmtree(cls.tmp)
+        super().tearDownClass()
+
+    def setUp(self):
+        sharding.forget()
+        self.user = get_user_model().objects.create_user(
+            email='test@test.com', password='password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        for alias in SHARDS:
+            for model in (Recipe.tags.through, Recipe, Tag, get_user_model()):
+                model.objects.using(alias).all().delete()
+
+    def _shard(self, user):
+        return SHARDS[user.pk % len(SHARDS)]
+
+    def test_new_user_placed_on_shard(self):
+        """Test new users are recorded in the shard map and copied there"""
+        shard = self._shard(self.user)
+
+        self.assertEqual(UserShard.objects.get(user=self.user).shard, shard)
+        self.assertTrue(
+            get_user_model().objects.using(shard).filter(pk=self.user.pk).exists()
+        )
+
+    def test_recipes_written_to_owner_shard(self):
+        """Test recipes created through the API land on the user's shard"""
+        payload = {'title': 'Curry', 'time_minutes': 20, 'price': 5.00}
+        res = self.client.post(RECIPES_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        shard = self._shard(self.user)
+        self.assertTrue(Recipe.objects.using(shard).filter(id=res.data['id']).exists())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertGreaterEqual(
+            res.data['id'], SHARDS.index(shard) << sharding.SHARD_ID_BITS
+        )
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [res.data[0]['id']])
+        self.assertEqual(res.data[0]['title'], 'Curry')
+
+    def test_users_isolated_across_shards(self):
+        """Test users on different shards only see their own data"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com', password='password'
+        )
+        self.assertNotEqual(self._shard(other), self._shard(self.user))
+
+        with sharding.use_shard(self._shard(other)):
+            Recipe.objects.create(user=other, title='Other', time_minutes=5, price=1)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_move_user(self):
+        """Test moving a user copies their rows and updates the shard map"""
+        source = self._shard(self.user)
+        target = [alias for alias in SHARDS if alias != source][0]
+
+        with sharding.use_shard(source):
+            tag = Tag.objects.create(user=self.user, name='Vegan')
+            recipe = Recipe.objects.create(
+                user=self.user, title='Salad', time_minutes=5, price=2
+            )
+            recipe.tags.add(tag)
+
+        with mock.patch('core.stats._update') as update:
+            moved = sharding.move_user(self.user.pk, target)
+
+        update.assert_not_called()
+        self.assertEqual(moved, 2)
+        self.assertEqual(UserShard.objects.get(user=self.user).shard, target)
+        self.assertFalse(Recipe.objects.using(source).exists())
+        moved_recipe = Recipe.objects.using(target).get(pk=recipe.pk)
+        self.assertEqual(list(moved_recipe.tags.all()), [tag])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_active)
+
+    @override_settings(TOKEN_REVOCATION_TTL=5)
+    def test_move_waits_for_revocation(self):
+        """Test rows are copied only once every worker has reloaded its
+        revocation list and rejects the user's access tokens"""
+        source = self._shard(self.user)
+        target = [alias for alias in SHARDS if alias != source][0]
+        with sharding.use_shard(source):
+            recipe = Recipe.objects.create(
+                user=self.user, title='Salad', time_minutes=5, price=2
+            )
+
+        copied = []
+
+        def sleep(seconds):
+            copied.append(Recipe.objects.using(target).filter(pk=recipe.pk).exists())
+
+        with mock.patch('core.sharding.time.sleep', side_effect=sleep) as sleeper:
+            sharding.move_user(self.user.pk, target)
+
+        self.assertEqual(sleeper.call_args_list[0], mock.call(5))
+        self.assertFalse(copied[0])
+
+    @override_settings(TOKEN_REVOCATION_TTL=5)
+    def test_move_users_wait_once(self):
+        """Test a batch of users shares the revocation and settle waits"""
+        other = get_user_model().objects.create_user(
+            email='other@test.com', password='password'
+        )
+        moves = [
+            (user.pk, [alias for alias in SHARDS if alias != self._shard(user)][0])
+            for user in (self.user, other)
+        ]
+
+        with mock.patch('core.sharding.time.sleep') as sleep:
+            moved = sharding.move_users(moves, settle=2)
+
+        self.assertEqual(sleep.call_args_list, [mock.call(5), mock.call(2)])
+        self.assertEqual(moved, {self.user.pk: 0, other.pk: 0})
+        for user_id, target in moves:
+            self.assertEqual(UserShard.objects.get(user_id=user_id).shard, target)
+        self.assertTrue(get_user_model().objects.get(pk=other.pk).is_active)
+
+    def test_move_keeps_images(self):
+        """Test the image files of moved recipes survive the removal of
+        the old rows"""
+        source = self._shard(self.user)
+        target = [alias for alias in SHARDS if alias != source][0]
+        with sharding.use_shard(source):
+            recipe = Recipe.objects.create(
+                user=self.user, title='Salad', time_minutes=5, price=2
+            )
+            recipe.image.save('photo.jpg', ContentFile(b'image'))
+
+        sharding.move_user(self.user.pk, target)
+
+        storage = recipe.image.storage
+        self.assertTrue(storage.exists(recipe.image.name))
+        storage.delete(recipe.image.name)
+
+    def test_move_keeps_sync_cursor(self):
+        """Test changes made after a move to a shard with lower ids are
+        still after the client's cursor"""
+        if self._shard(self.user) != 'shard_b':
+            sharding.move_user(self.user.pk, 'shard_b', settle=0)
+
+        self.client.post(reverse('recipe:tag-list'), {'name': 'Vegan'})
+        cursor = self.client.get(reverse('recipe:sync')).data['cursor']
+        sharding.move_user(self.user.pk, 'shard_a', settle=0)
+        self.client.post(reverse('recipe:tag-list'), {'name': 'Quick'})
+
+        res = self.client.get(reverse('recipe:sync'), {'since': cursor})
+
+        self.assertEqual(
+            [change['data']['name'] for change in res.data['changes']], ['Quick']
+        )
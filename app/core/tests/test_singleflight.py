@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+from rest_framework.request import Request
+
+from core import singleflight
+from recipe.views import RecipeViewSet
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.group = singleflight.Group()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _slow(self, result='result'):
+        def compute():
+            self.calls += 1
+            self.release.wait(5)
+            return result
+        return compute
+
+    def _run_concurrently(self, count, fn, shared=False, group=None):
+        results = []
+
+        def worker(group):
+            try:
+                results.append(group.do('key', fn, shared))
+            except Exception as error:
+                results.append(error)
+
+        threads = [
+            threading.Thread(target=worker, args=(group or self.group,))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalesces(self):
+        """Test that concurrent callers share one computation"""
+        results = self._run_concurrently(5, self._slow())
+
+        self.assertEqual(results, ['result'] * 5)
+        self.assertEqual(self.calls, 1)
+
+        self.assertEqual(self.group.do('key', lambda: 'again', False), 'again')
+
+    def test_error_shared(self):
+        """Test that waiting callers see the leader's exception"""
+        def fail():
+            self.release.wait(5)
+            raise ValueError('boom')
+
+        results = self._run_concurrently(3, fail)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_shared_across_workers(self):
+        """Test that the cache lock coalesces separate process groups"""
+        workers = [singleflight.Group() for _ in range(3)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda g=g: results.append(g.do('key', self._slow(), True)))
+            for g in workers
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['result'] * 3)
+        self.assertEqual(self.calls, 1)
+
+    def test_recipe_params_normalized(self):
+        """Test that id lists in any order give the same key"""
+        factory = APIRequestFactory()
+        view = RecipeViewSet()
+
+        first = Request(factory.get('/', {'tags': '3,1', 'ingredients': '2'}))
+        second = Request(factory.get('/', {'ingredients': '2', 'tags': '1,3,1'}))
+
+        self.assertEqual(view.normalized_params(first), view.normalized_params(second))
+
+    def test_invalid_recipe_params_kept(self):
+        """Test that ids mixed with invalid values do not share a key with
+        the valid ids alone"""
+        factory = APIRequestFactory()
+        view = RecipeViewSet()
+
+        valid = Request(factory.get('/', {'tags': '1'}))
+        invalid = Request(factory.get('/', {'tags': '1,abc'}))
+
+        self.assertNotEqual(view.normalized_params(valid), view.normalized_params(invalid))
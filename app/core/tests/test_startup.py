@@ -0,0 +1,26 @@
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core import startup
+
+
+class StartupTests(SimpleTestCase):
+
+    def test_warm_up(self):
+        """Test that the warm-up runs without touching the database"""
+        startup.warm_up()
+
+    def test_phase_logged_when_profiling(self):
+        """Test that phases are timed only with STARTUP_PROFILE=1"""
+        with self.assertLogs('core.startup', 'WARNING') as logs:
+            with mock.patch.dict(os.environ, {'STARTUP_PROFILE': '1'}):
+                with startup.phase('urls'):
+                    pass
+            with startup.phase('serializers'):
+                pass
+            startup.logger.warning('done')
+
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('startup urls took', logs.output[0])
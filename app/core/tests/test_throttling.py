@@ -0,0 +1,161 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core import admission
+from core.throttling import EndpointThrottle, UserThrottle
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+RATES = {
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.UserThrottle',
+        'core.throttling.EndpointThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'user': '100/min',
+        'anon': '2/min',
+        'recipes': '3/min',
+    },
+}
+
+
+class View:
+    throttle_scope = 'recipes'
+
+
+@override_settings(REST_FRAMEWORK=RATES)
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        self.request = APIRequestFactory().get('/')
+        self.request.user = None
+
+    def tearDown(self):
+        cache.clear()
+
+    def _allow(self, throttle_class, view=None):
+        throttle = throttle_class()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, view or View()), throttle
+
+    def test_burst_then_refill(self):
+        """Test that a bucket allows a burst and refills over time"""
+        self.assertTrue(self._allow(UserThrottle)[0])
+        self.assertTrue(self._allow(UserThrottle)[0])
+
+        allowed, throttle = self._allow(UserThrottle)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 30)
+
+        self.now += 30
+        self.assertTrue(self._allow(UserThrottle)[0])
+        self.assertFalse(self._allow(UserThrottle)[0])
+
+    def test_waits_for_bucket_lock(self):
+        """Test that a bucket locked by another worker is only updated once
+        the lock is released"""
+        cache.add('bucket_anon_127.0.0.1_lock', True)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self._allow(UserThrottle)))
+        thread.start()
+
+        thread.join(0.05)
+        self.assertTrue(thread.is_alive())
+
+        cache.delete('bucket_anon_127.0.0.1_lock')
+        thread.join(1)
+        self.assertTrue(results[0][0])
+        self.assertIsNone(cache.get('bucket_anon_127.0.0.1_lock'))
+
+    def test_endpoint_scope(self):
+        """Test that endpoint buckets only apply to views with a scope"""
+        for _ in range(3):
+            self.assertTrue(self._allow(EndpointThrottle)[0])
+        self.assertFalse(self._allow(EndpointThrottle)[0])
+        self.assertTrue(self._allow(EndpointThrottle, view=object())[0])
+
+
+class PoolTests(SimpleTestCase):
+
+    def test_refuses_over_queue(self):
+        """Test that requests beyond the cap and queue are refused"""
+        pool = admission.Pool(limit=1, queue_timeout=0.01, max_queue=0)
+        pool.acquire()
+
+        with self.assertRaises(admission.Overloaded):
+            pool.acquire()
+
+        pool.release()
+        pool.acquire()
+
+    def test_waits_for_slot(self):
+        """Test that queued requests get a slot freed in time"""
+        pool = admission.Pool(limit=1, queue_timeout=0.2, max_queue=1)
+        pool.acquire()
+        threading.Timer(0.05, pool.release).start()
+
+        pool.acquire()
+
+        with self.assertRaises(admission.Overloaded) as cm:
+            pool.acquire()
+        self.assertEqual(cm.exception.wait, 1)
+
+
+class ApiLimitTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admission.reset()
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        admission.reset()
+
+    @override_settings(REST_FRAMEWORK=RATES)
+    def test_throttled(self):
+        """Test that exhausted buckets answer 429 with Retry-After"""
+        for _ in range(3):
+            self.assertEqual(self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '20')
+
+    @override_settings(ADMISSION_POOLS={'list': {'limit': 1, 'queue_timeout': 0.01}})
+    def test_overloaded(self):
+        """Test that lists beyond the admission cap answer 503"""
+        admission.pool('list').acquire()
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '1')
+
+        admission.pool('list').release()
+        self.assertEqual(self.client.get(RECIPES_URL).status_code, status.HTTP_200_OK)
+
+    @override_settings(ADMISSION_POOLS={'bulk': {'limit': 1, 'max_queue': 0}})
+    def test_streaming_holds_slot(self):
+        """Test that a streamed export holds its slot until the body is sent"""
+        res = self.client.get(reverse('recipe:recipe-export'))
+        pool = admission.pool('bulk')
+
+        self.assertFalse(pool.slots.acquire(blocking=False))
+        b''.join(res.streaming_content)
+        self.assertTrue(pool.slots.acquire(blocking=False))
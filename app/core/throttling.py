@@ -0,0 +1,102 @@
+import time
+from contextlib import contextmanager
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+# Seconds a bucket stays locked when its holder dies mid update, and the
+# pause between attempts to take a busy lock
+LOCK_TIMEOUT = 1
+LOCK_POLL_SECONDS = 0.001
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket throttle. A rate of 'N/period' allows bursts of N
+    requests and refills N tokens per period, evenly over time.
+
+    Buckets live in the default cache, so they are shared by every worker
+    when the cache is, and are updated under a lock kept in the cache.
+    Each bucket is two numbers instead of the request history the DRF
+    throttles keep."""
+
+    cache_format = 'bucket_%(scope)s_%(ident)s'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        refill = self.num_requests / self.duration
+        with self._locked():
+            self.now = self.timer()
+            tokens, updated = self.cache.get(self.key, (self.num_requests, self.now))
+            self.tokens = min(self.num_requests, tokens + (self.now - updated) * refill)
+
+            if self.tokens < 1:
+                return self.throttle_failure()
+
+            self.tokens -= 1
+            self.cache.set(self.key, (self.tokens, self.now), self.duration)
+            return True
+
+    @contextmanager
+    def _locked(self):
+        """Hold the bucket against other threads and workers. ``add`` is
+        the one atomic operation every cache backend offers"""
+        lock_key = f'{self.key}_lock'
+        while not self.cache.add(lock_key, True, LOCK_TIMEOUT):
+            time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            self.cache.delete(lock_key)
+
+    def wait(self):
+        """Seconds until the next token is available"""
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+
+class UserThrottle(TokenBucketThrottle):
+    """Limit each user, or each client address for anonymous requests,
+    across the whole API with the 'user' or 'anon' rate"""
+
+    def allow_request(self, request, view):
+        if request.user and request.user.is_authenticated:
+            self.scope, ident = 'user', request.user.pk
+        else:
+            self.scope, ident = 'anon', self.get_ident(request)
+
+        self.ident = ident
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope or 'user')
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.ident}
+
+
+class EndpointThrottle(UserThrottle):
+    """Limit each user on the endpoints sharing the view's
+    ``throttle_scope``, with the rate configured for that scope"""
+
+    def allow_request(self, request, view):
+        self.endpoint = getattr(view, 'throttle_scope', None)
+        if self.endpoint is None:
+            return True
+
+        return super().allow_request(request, view)
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(getattr(self, 'endpoint', None))
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.endpoint,
+            'ident': f'{self.scope}_{self.ident}',
+        }
@@ -0,0 +1,134 @@
+import collections
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+# What a verified token says, issued_at is in seconds
+Claims = collections.namedtuple('Claims', 'user_id kind issued_at')
+
+# user id -> access_before for revocations recent enough to matter
+_revoked = {}
+_revoked_until = 0
+
+
+class InvalidToken(Exception):
+    """Raised for tokens that are malformed, forged, expired or revoked"""
+
+
+def _salt(kind):
+    return f'core.tokens.{kind}'
+
+
+def _lifetime(kind):
+    if kind == ACCESS:
+        return settings.ACCESS_TOKEN_LIFETIME
+
+    return settings.REFRESH_TOKEN_LIFETIME
+
+
+def issue(user, kind=ACCESS):
+    """Return a token signed with SECRET_KEY carrying the user's id"""
+    return signing.dumps(
+        {'u': user.pk, 'i': time.time()}, salt=_salt(kind), compress=False
+    )
+
+
+def issue_pair(user):
+    """Return the response body of a token grant"""
+    return {
+        'access': issue(user, ACCESS),
+        'refresh': issue(user, REFRESH),
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def verify(token, kind=ACCESS):
+    """Check a token's signature and age and return its claims, without
+    touching the database. Revocations are checked for access tokens
+    only, refresh tokens are checked against the database by ``refresh``"""
+    try:
+        payload = signing.loads(token, salt=_salt(kind))
+        claims = Claims(int(payload['u']), kind, float(payload['i']))
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken('Invalid token.')
+
+    if claims.issued_at + _lifetime(kind) < time.time():
+        raise InvalidToken('Token has expired.')
+
+    if kind == ACCESS and claims.issued_at <= revocations().get(claims.user_id, 0):
+        raise InvalidToken('Token has been revoked.')
+
+    return claims
+
+
+def refresh(token):
+    """Return new tokens for a refresh token whose user is still active
+    and has not revoked it"""
+    from core.models import TokenRevocation
+
+    claims = verify(token, REFRESH)
+    user = get_user_model().objects.filter(pk=claims.user_id, is_active=True).first()
+    revoked = TokenRevocation.objects.using('default').filter(
+        user_id=claims.user_id, refresh_before__gte=claims.issued_at
+    ).exists()
+
+    if user is None or revoked:
+        raise InvalidToken('Token has been revoked.')
+
+    return issue_pair(user)
+
+
+def user_for(claims):
+    """Return a user standing in for the token's user without loading it.
+    It has the id alone, enough for ownership filters and foreign keys"""
+    user = get_user_model()(pk=claims.user_id, is_active=True)
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+def revocations():
+    """Return {user id: time} of recent access token revocations. The
+    list is reloaded every TOKEN_REVOCATION_TTL seconds and only holds
+    revocations younger than the access token lifetime, so it stays small"""
+    global _revoked, _revoked_until
+    from core.models import TokenRevocation
+
+    if _revoked_until > time.monotonic():
+        return _revoked
+
+    _revoked = dict(
+        TokenRevocation.objects.using('default').filter(
+            access_before__gt=time.time() - settings.ACCESS_TOKEN_LIFETIME
+        ).values_list('user_id', 'access_before')
+    )
+    _revoked_until = time.monotonic() + settings.TOKEN_REVOCATION_TTL
+    return _revoked
+
+
+def revoke(user_id, refresh_tokens=True):
+    """Reject the user's signed tokens issued until now. Other workers
+    notice within TOKEN_REVOCATION_TTL seconds. With refresh_tokens=False only
+    access tokens are revoked and clients can refresh them"""
+    from core.models import TokenRevocation
+
+    now = time.time()
+    updates = {'access_before': now}
+    if refresh_tokens:
+        updates['refresh_before'] = now
+
+    TokenRevocation.objects.using('default').update_or_create(
+        user_id=user_id, defaults=updates
+    )
+    _revoked[user_id] = now
+
+
+def forget():
+    """Reload the revocation list on its next use"""
+    global _revoked_until
+    _revoked_until = 0
@@ -0,0 +1,56 @@
+"""
+Gunicorn configuration for production serving.
+
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+
+Set GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker and serve
+app.asgi:application instead to run the ASGI entry point.
+"""
+import multiprocessing
+import os
+
+cores = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processes scale with cores, threads cover the time spent waiting on the
+# database so each core stays busy. Open event streams each hold a thread
+# of their own on top, up to EVENTS_MAX_CONNECTIONS as in app/settings.py
+workers = int(os.environ.get('GUNICORN_WORKERS', cores * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) + \
+    int(os.environ.get('EVENTS_MAX_CONNECTIONS', 32))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+
+# Events from one worker only reach clients connected to another through
+# the change log
+if workers > 1:
+    os.environ.setdefault('EVENTS_BACKEND', 'core.events.ChangeLogBackend')
+
+# Import the project once in the master so workers share its memory
+# pages copy-on-write instead of each loading their own copy
+preload_app = True
+
+# Recycle workers gradually to bound leaks, with jitter so they don't all
+# restart at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+graceful_timeout = 30
+timeout = 30
+
+# Keep idle connections open slightly longer than the load balancer does,
+# so it never reuses a connection the worker has just closed
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the preloaded master"""
+    from django.db import connections
+
+    for connection in connections.all():
+        connection.close()
@@ -0,0 +1,93 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+
+FIELDS = ('id', 'title', 'time_minutes', 'price', 'link', 'image', 'tags', 'ingredients')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Separator for tag and ingredient names inside a CSV cell
+CSV_LIST_SEPARATOR = '|'
+
+
+def _names_by_recipe(through, field, recipe_ids, using):
+    """Return {recipe_id: [names]} for one chunk of recipes"""
+    names = defaultdict(list)
+    rows = through.objects.using(using).filter(
+        recipe_id__in=recipe_ids, **{f'{field}__is_deleted': False}
+    ).values_list('recipe_id', f'{field}__name').order_by(f'{field}__name')
+
+    for recipe_id, name in rows:
+        names[recipe_id].append(name)
+
+    return names
+
+
+def iter_recipes(queryset, chunk_size=2000):
+    """Yield one dict per recipe with its tag and ingredient names,
+    holding at most one chunk of recipes in memory"""
+    using = queryset.db
+    rows = queryset.order_by('id').values(
+        'id', 'title', 'time_minutes', 'price', 'link', 'image'
+    ).distinct().iterator(chunk_size=chunk_size)
+
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+
+        ids = [row['id'] for row in chunk]
+        tags = _names_by_recipe(Recipe.tags.through, 'tag', ids, using)
+        ingredients = _names_by_recipe(Recipe.ingredients.through, 'ingredient', ids, using)
+
+        for row in chunk:
+            row['image'] = row['image'] or ''
+            row['tags'] = tags.get(row['id'], [])
+            row['ingredients'] = ingredients.get(row['id'], [])
+            yield row
+
+
+def iter_ndjson(rows):
+    """Encode rows as newline delimited JSON"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """File-like object handing back what the csv writer writes"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Encode rows as CSV with a header line"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+
+    for row in rows:
+        row['tags'] = CSV_LIST_SEPARATOR.join(row['tags'])
+        row['ingredients'] = CSV_LIST_SEPARATOR.join(row['ingredients'])
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+ENCODERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
+
+
+def stream(queryset, output, chunk_size=2000):
+    """Stream the recipes in the queryset in the given output format.
+    The database is picked now, while the request's routing is active,
+    as the stream is only consumed after the view has returned"""
+    queryset = queryset.using(queryset.db)
+    return ENCODERS[output](iter_recipes(queryset, chunk_size))
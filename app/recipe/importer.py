@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import os
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+
+from core import changelog, cookable, similarity, stats
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+from recipe.export import CSV_LIST_SEPARATOR
+
+# SQLite limits the number of variables in a single statement
+LOOKUP_CHUNK_SIZE = 500
+
+
+def read_ndjson(lines):
+    """Yield one record per non-blank line of NDJSON"""
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(lines):
+    """Yield one record per CSV row, splitting the name lists"""
+    for row in csv.DictReader(lines):
+        for field in ('tags', 'ingredients'):
+            value = row.get(field) or ''
+            row[field] = [name for name in value.split(CSV_LIST_SEPARATOR) if name]
+        yield row
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+class Checkpoint:
+    """Number of input records already committed, kept in a small file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+
+        with open(self.path) as checkpoint:
+            return json.load(checkpoint)['records']
+
+    def save(self, records):
+        if not self.path:
+            return
+
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as checkpoint:
+            json.dump({'records': records}, checkpoint)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RecipeImporter:
+    """Insert recipes for one user in large batches, creating any tags and
+    ingredients they name on the way"""
+
+    def __init__(self, user):
+        self.user = user
+        self.using = router.db_for_write(Recipe)
+        self.connection = connections[self.using]
+        self.names = {Tag: None, Ingredient: None}
+
+    def _name_map(self, model):
+        """Return the user's lowercased name to id map, loading it on first
+        use. Names are unique per user regardless of case"""
+        if self.names[model] is None:
+            rows = model.objects.using(self.using).filter(
+                user=self.user
+            ).values_list('name', 'id')
+            self.names[model] = {name.lower(): pk for name, pk in rows}
+
+        return self.names[model]
+
+    def _resolve(self, model, records, field):
+        """Create missing names in bulk and return the full name map"""
+        names = self._name_map(model)
+        missing = {}
+        for record in records:
+            for name in record[field]:
+                if name.lower() not in names:
+                    missing.setdefault(name.lower(), name)
+
+        if missing:
+            created = sorted(missing.values())
+            model.objects.using(self.using).bulk_create(
+                [model(user=self.user, name=name) for name in created]
+            )
+            created_ids = []
+            for start in range(0, len(created), LOOKUP_CHUNK_SIZE):
+                rows = model.objects.using(self.using).filter(
+                    user=self.user,
+                    name__in=created[start:start + LOOKUP_CHUNK_SIZE]
+                ).values_list('name', 'id')
+                for name, pk in rows:
+                    names[name.lower()] = pk
+                    created_ids.append(pk)
+
+            # Bulk inserts send no signals, so log the new rows here
+            changelog.record(
+                self.user.pk, model._meta.model_name, created_ids,
+                ChangeLogEntry.CREATE, self.using
+            )
+
+        return names
+
+    def _insert_recipes(self, recipes):
+        """Bulk insert the recipes and return their ids in order"""
+        Recipe.objects.using(self.using).bulk_create(recipes)
+
+        if self.connection.features.can_return_ids_from_bulk_insert:
+            return [recipe.pk for recipe in recipes]
+
+        # Inside the transaction the batch holds the write lock, so the
+        # newest rows of the user are the ones just inserted
+        ids = Recipe.objects.using(self.using).filter(
+            user=self.user
+        ).order_by('-id').values_list('id', flat=True)[:len(recipes)]
+        return list(reversed(ids))
+
+    def _insert_links(self, through, column, rows):
+        """Insert through table rows, with COPY on PostgreSQL. Link rows
+        outnumber recipes several times over, so they skip the ORM"""
+        if not rows:
+            return
+
+        quote = self.connection.ops.quote_name
+        table = quote(through._meta.db_table)
+        columns = f'({quote("recipe_id")}, {quote(column)})'
+
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == 'postgresql':
+                buffer = io.StringIO(''.join(f'{a}\t{b}\n' for a, b in rows))
+                cursor.cursor.copy_expert(f'COPY {table} {columns} FROM STDIN', buffer)
+            else:
+                cursor.executemany(
+                    f'INSERT INTO {table} {columns} VALUES (%s, %s)', rows
+                )
+
+    def import_batch(self, records):
+        """Import a batch of records in one transaction"""
+        try:
+            self._import_batch(records)
+        except Exception:
+            # Names created by the rolled back batch are gone again
+            self.names = {Tag: None, Ingredient: None}
+            raise
+
+    def _import_batch(self, records):
+        with transaction.atomic(using=self.using):
+            tags = self._resolve(Tag, records, 'tags')
+            ingredients = self._resolve(Ingredient, records, 'ingredients')
+
+            recipes = [
+                Recipe(
+                    user=self.user,
+                    title=record['title'],
+                    time_minutes=int(record['time_minutes']),
+                    price=Decimal(str(record['price'])),
+                    link=record.get('link') or '',
+                )
+                for record in records
+            ]
+            ids = self._insert_recipes(recipes)
+            changelog.record(
+                self.user.pk, 'recipe', ids, ChangeLogEntry.CREATE, self.using
+            )
+
+            tag_links = [
+                (recipe_id, tag_id)
+                for recipe_id, record in zip(ids, records)
+                for tag_id in {tags[name.lower()] for name in record['tags']}
+            ]
+            self._insert_links(Recipe.tags.through, 'tag_id', tag_links)
+            ingredient_links = [
+                (recipe_id, ingredient_id)
+                for recipe_id, record in zip(ids, records)
+                for ingredient_id in {
+                    ingredients[name.lower()] for name in record['ingredients']
+                }
+            ]
+            self._insert_links(Recipe.ingredients.through, 'ingredient_id', ingredient_links)
+
+            # Bulk inserts send no signals, so count the batch here
+            stats.recipes_added(
+                self.user.pk, [(r.time_minutes, r.price) for r in recipes], self.using
+            )
+            stats.links_changed(self.user.pk, 'tag', [pk for _, pk in tag_links], 1, self.using)
+            stats.links_changed(
+                self.user.pk, 'ingredient', [pk for _, pk in ingredient_links], 1, self.using
+            )
+
+            def index_batch(index):
+                for recipe_id in ids:
+                    index.add_recipe(recipe_id)
+                for recipe_id, ingredient_id in ingredient_links:
+                    index.add_links(recipe_id, [ingredient_id])
+
+            transaction.on_commit(
+                lambda: cookable.changed(self.user.pk, index_batch), using=self.using
+            )
+            similarity.update_on_commit(ids, self.using)
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from core.models import Recipe
+from recipe import export
+
+
+class Command(BaseCommand):
+    """Stream a user's full recipe library to a file"""
+
+    help = "Export a user's recipes as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to export')
+        parser.add_argument('--output', choices=export.ENCODERS, default='ndjson')
+        parser.add_argument('--file', help='Path to write to, defaults to stdout')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.with_email(options['email']).get()
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        sharding.activate(user.pk)
+        try:
+            lines = export.stream(
+                Recipe.objects.filter(user=user),
+                options['output'],
+                chunk_size=options['chunk_size']
+            )
+            if options['file']:
+                with open(options['file'], 'w', newline='') as out:
+                    out.writelines(lines)
+            else:
+                for line in lines:
+                    self.stdout.write(line, ending='')
+        finally:
+            sharding.deactivate()
@@ -0,0 +1,80 @@
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from recipe import importer
+
+
+class Command(BaseCommand):
+    """Bulk load recipes with their tags and ingredients for one user"""
+
+    help = 'Import recipes for a user from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user owning the recipes')
+        parser.add_argument('path', help='NDJSON or CSV file, as written by export_recipes')
+        parser.add_argument(
+            '--format',
+            choices=importer.READERS,
+            help='Input format, guessed from the file extension by default'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress, an interrupted import resumes from it'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.with_email(options['email']).get()
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["email"]}')
+
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in importer.READERS:
+            raise CommandError('Pass --format ndjson or --format csv')
+
+        checkpoint = importer.Checkpoint(options['checkpoint'])
+        done = checkpoint.load()
+        if done:
+            self.stdout.write(f'Resuming after {done} records')
+
+        sharding.activate(user.pk)
+        try:
+            imported = self._import(user, path, fmt, checkpoint, done, options['batch_size'])
+        finally:
+            sharding.deactivate()
+
+        checkpoint.clear()
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} recipes'))
+
+    def _import(self, user, path, fmt, checkpoint, done, batch_size):
+        recipe_importer = importer.RecipeImporter(user)
+        start = time.monotonic()
+        imported = 0
+
+        with open(path, newline='') as source:
+            records = islice(importer.READERS[fmt](source), done, None)
+            while True:
+                batch = list(islice(records, batch_size))
+                if not batch:
+                    return imported
+
+                try:
+                    recipe_importer.import_batch(batch)
+                except (KeyError, ValueError, ArithmeticError) as exc:
+                    raise CommandError(
+                        f'Invalid record in batch after record {done}: {exc!r}'
+                    )
+
+                done += len(batch)
+                imported += len(batch)
+                checkpoint.save(done)
+
+                rate = imported / (time.monotonic() - start)
+                self.stdout.write(f'{done} records, {rate:.0f} rows/s')
@@ -1,7 +1,20 @@
+from django.db import router, transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import fields, serializers
 from core.models import Recipe, Tag, Ingredient
 
-class TagSerializer(serializers.ModelSerializer):
+class UserNameSerializer(serializers.ModelSerializer):
+    """Serializer for user owned objects with a case-insensitive unique name"""
+
+    def validate_name(self, value):
+        """Reject names the user already has in another case"""
+        user = self.context['request'].user
+        if self.Meta.model.objects.exists_with_name(user, value):
+            raise serializers.ValidationError(_("This name already exists"))
+
+        return value
+
+class TagSerializer(UserNameSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -10,7 +23,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UserNameSerializer):
     """Serializer for tag objects"""
 
     class Meta: 
@@ -23,18 +36,68 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
-        queryset=Ingredient.objects.all()
+        queryset=Ingredient.objects.all(),
+        required=False
     )
 
     tags = serializers.PrimaryKeyRelatedField(
         many=True,
-        queryset=Tag.objects.all()
+        queryset=Tag.objects.all(),
+        required=False
+    )
+
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
+    )
+
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        write_only=True,
+        required=False
     )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'link')
+        fields = (
+            'id', 'title', 'ingredients', 'tags', 'time_minutes', 'price', 'link',
+            'ingredient_names', 'tag_names'
+        )
         read_only_fields = ('id',)
+
+    def _resolve_names(self, validated_data, user, instance=None):
+        """Merge objects given by name into the primary key lists, creating
+        the missing ones in bulk. A partial update giving names alone adds
+        them to the recipe's current objects rather than replacing them"""
+        for field, names_field, model in (
+            ('tags', 'tag_names', Tag),
+            ('ingredients', 'ingredient_names', Ingredient),
+        ):
+            names = validated_data.pop(names_field, None)
+            if names is None:
+                continue
+
+            if field in validated_data:
+                current = list(validated_data[field])
+            elif instance is not None and self.partial:
+                current = list(getattr(instance, field).values_list('pk', flat=True))
+            else:
+                current = []
+
+            validated_data[field] = current + model.objects.ids_for_names(user, names)
+
+    def create(self, validated_data):
+        """Create a recipe, upserting tags and ingredients given by name"""
+        with transaction.atomic(using=router.db_for_write(Recipe)):
+            self._resolve_names(validated_data, validated_data['user'])
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        """Update a recipe, upserting tags and ingredients given by name"""
+        with transaction.atomic(using=router.db_for_write(Recipe, instance=instance)):
+            self._resolve_names(validated_data, instance.user, instance)
+            return super().update(instance, validated_data)
     
 
 class RecipeDetailSerializer(RecipeSerializer):
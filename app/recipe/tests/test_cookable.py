@@ -0,0 +1,85 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import cookable, routers
+from core.models import Ingredient, Recipe
+
+COOKABLE_URL = reverse('recipe:recipe-cookable')
+
+
+class CookableApiTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.leek = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Rice', 'Egg', 'Leek')
+        )
+        self.fried_rice = self._recipe('Fried rice', self.rice, self.egg)
+        self.soup = self._recipe('Leek soup', self.leek)
+
+    def tearDown(self):
+        cookable.forget()
+        cache.clear()
+
+    def _recipe(self, title, *ingredients):
+        recipe = Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=1)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def _titles(self, have, **params):
+        res = self.client.get(
+            COOKABLE_URL, {'have': ','.join(str(i.id) for i in have), **params}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(recipe['title'], recipe['missing']) for recipe in res.data]
+
+    def test_cookable_recipes(self):
+        """Test only recipes made of the given ingredients are returned"""
+        self.assertEqual(self._titles([self.rice, self.egg]), [('Fried rice', 0)])
+        self.assertEqual(
+            self._titles([self.rice], max_missing=1), [('Fried rice', 1), ('Leek soup', 1)]
+        )
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_index_built_from_primary(self):
+        """Test requests reading from replicas still build the index from
+        the primary, which has every change the stamp counts"""
+        with routers.read_from_replica():
+            index = cookable.build(self.user.pk)
+
+        self.assertEqual(index.cookable({self.leek.id}), [(self.soup.id, 0)])
+
+    def test_changes_update_the_index_in_place(self):
+        """Test link changes after the index is built need no rebuild"""
+        self._titles([self.leek])
+        self.soup.ingredients.add(self.egg)
+        self.leek.recipe_set.remove(self.soup)
+        self._recipe('Omelette', self.egg)
+
+        with mock.patch('core.cookable.build', wraps=cookable.build) as build:
+            titles = self._titles([self.egg])
+
+        self.assertEqual(titles, [('Leek soup', 0), ('Omelette', 0)])
+        build.assert_not_called()
+
+    def test_deleted_ingredient_is_not_needed(self):
+        """Test ingredients marked deleted no longer count as missing"""
+        self._titles([self.rice])
+        self.client.delete(reverse('recipe:ingredient-detail', args=[self.egg.id]))
+
+        self.assertEqual(self._titles([self.rice]), [('Fried rice', 0)])
+
+    def test_invalid_params(self):
+        """Test bad ingredient ids and missing counts are rejected"""
+        for params in ({'have': 'rice'}, {'have': '1', 'max_missing': '99'}):
+            res = self.client.get(COOKABLE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+class RecipeExportTests(TestCase):
+    """Test streaming exports of a user's recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        garlic = Ingredient.objects.create(user=self.user, name="Garlic")
+        ginger = Ingredient.objects.create(user=self.user, name="Ginger")
+
+        self.recipe = Recipe.objects.create(**{
+            "user": self.user,
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": 7.50
+        })
+        self.recipe.tags.add(vegan)
+        self.recipe.ingredients.add(garlic, ginger)
+
+        Recipe.objects.create(**{
+            "user": self.user,
+            "title": "Toast",
+            "time_minutes": 2,
+            "price": 1.00
+        })
+
+        other = get_user_model().objects.create_user(**{
+            "email": "other@test.com",
+            "password": "password"
+        })
+        Recipe.objects.create(user=other, title="Other", time_minutes=1, price=1)
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as newline delimited JSON"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._content(res).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['Curry', 'Toast'])
+        self.assertEqual(rows[0]['tags'], ['Vegan'])
+        self.assertEqual(rows[0]['ingredients'], ['Garlic', 'Ginger'])
+        self.assertEqual(rows[0]['price'], '7.50')
+        self.assertEqual(rows[1]['tags'], [])
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(self._content(res))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['ingredients'], 'Garlic|Ginger')
+
+    def test_export_invalid_output(self):
+        """Test an unknown output format is rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_small_chunks(self):
+        """Test related names stay attached when chunks are tiny"""
+        out = io.StringIO()
+        call_command('export_recipes', 'test@test.com', '--chunk-size', '1', stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['ingredients'], ['Garlic', 'Ginger'])
+
+    def test_export_email_any_case(self):
+        """Test the command finds the user whatever the email's case"""
+        out = io.StringIO()
+        call_command('export_recipes', 'TEST@test.com', stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
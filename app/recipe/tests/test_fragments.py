@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class RecipeFragmentCacheTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=10, price=5
+        )
+        self.recipe.tags.add(self.tag)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _list(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+        return res.data, len(queries)
+
+    def test_cached_list_skips_link_queries(self):
+        """Test a repeated list is built from cached recipes"""
+        first, first_queries = self._list()
+        second, second_queries = self._list()
+
+        self.assertEqual(first, second)
+        self.assertEqual(second[0]['tags'], [self.tag.id])
+        self.assertLess(second_queries, first_queries)
+
+    def test_recipe_update_is_visible(self):
+        """Test saving a recipe replaces its cached fragment"""
+        self._list()
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+
+        self.assertEqual(self._list()[0][0]['title'], 'Stew')
+
+    def test_link_changes_are_visible(self):
+        """Test linking a tag from either side gives the recipe a new version"""
+        self._list()
+        other = Tag.objects.create(user=self.user, name='Quick')
+        other.recipe_set.add(self.recipe)
+
+        self.assertEqual(sorted(self._list()[0][0]['tags']), sorted([self.tag.id, other.id]))
+
+        self.recipe.tags.clear()
+        self.assertEqual(self._list()[0][0]['tags'], [])
+
+    def test_tag_rename_and_delete_are_visible(self):
+        """Test renamed and deleted tags drop the user's cached details"""
+        self.client.get(detail_url(self.recipe.id))
+        self.tag.name = 'Vegetarian'
+        self.tag.save()
+
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+        self.client.delete(reverse('recipe:tag-detail', args=[self.tag.id]))
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertEqual(res.data['tags'], [])
@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.importer import RecipeImporter
+
+RECORDS = [
+    {"title": "Curry", "time_minutes": 30, "price": "7.50",
+     "tags": ["Vegan"], "ingredients": ["Garlic", "Ginger"]},
+    {"title": "Stir fry", "time_minutes": 15, "price": "6.00",
+     "tags": ["vegan", "Quick"], "ingredients": ["Ginger"]},
+    {"title": "Toast", "time_minutes": 2, "price": "1.00",
+     "tags": [], "ingredients": []},
+]
+
+class ImportRecipesTests(TestCase):
+    """Test the bulk recipe import command"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w') as out:
+            out.write(content)
+        return path
+
+    def _ndjson(self):
+        return self._write(
+            'recipes.ndjson', ''.join(json.dumps(record) + '\n' for record in RECORDS)
+        )
+
+    def _call(self, *args):
+        call_command('import_recipes', 'test@test.com', *args, stdout=io.StringIO())
+
+    def test_import_ndjson(self):
+        """Test importing recipes creates missing tags and ingredients once"""
+        existing = Tag.objects.create(user=self.user, name="Vegan")
+
+        self._call(self._ndjson(), '--batch-size', '2')
+
+        recipes = Recipe.objects.filter(user=self.user).order_by('id')
+        self.assertEqual([r.title for r in recipes], ['Curry', 'Stir fry', 'Toast'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(list(recipes[0].tags.all()), [existing])
+        self.assertEqual(
+            sorted(tag.name for tag in recipes[1].tags.all()), ['Quick', 'Vegan']
+        )
+        self.assertEqual(recipes[2].ingredients.count(), 0)
+
+    def test_import_email_any_case(self):
+        """Test the command finds the user whatever the email's case"""
+        call_command(
+            'import_recipes', 'Test@Test.com', self._ndjson(), stdout=io.StringIO()
+        )
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+
+    def test_import_csv(self):
+        """Test importing the CSV export format"""
+        path = self._write('recipes.csv', (
+            'id,title,time_minutes,price,link,image,tags,ingredients\n'
+            '9,Curry,30,7.50,,,Vegan,Garlic|Ginger\n'
+        ))
+
+        self._call(path)
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.title, 'Curry')
+        self.assertEqual(
+            sorted(i.name for i in recipe.ingredients.all()), ['Garlic', 'Ginger']
+        )
+
+    def test_resume_from_checkpoint(self):
+        """Test a failed import resumes after the last committed batch"""
+        checkpoint = os.path.join(self.tmp.name, 'import.checkpoint')
+        path = self._ndjson()
+        original = RecipeImporter._insert_recipes
+        calls = []
+
+        def failing_insert(importer, recipes):
+            calls.append(recipes)
+            if len(calls) == 2:
+                raise ValueError('disk full')
+            return original(importer, recipes)
+
+        with patch.object(RecipeImporter, '_insert_recipes', failing_insert):
+            with self.assertRaises(CommandError):
+                self._call(path, '--batch-size', '2', '--checkpoint', checkpoint)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+        with open(checkpoint) as saved:
+            self.assertEqual(json.load(saved), {'records': 2})
+
+        self._call(path, '--batch-size', '2', '--checkpoint', checkpoint)
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 3)
+        self.assertFalse(os.path.exists(checkpoint))
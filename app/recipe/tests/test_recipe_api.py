@@ -2,8 +2,11 @@ import tempfile
 import os
 from PIL import Image
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -275,8 +278,73 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
 
+    def test_create_recipe_with_names(self):
+        """Test creating a recipe with tags and ingredients given by name"""
+        existing = sample_tag(user=self.user, name="Vegan")
 
+        payload = {
+            "title": "Curry",
+            "tag_names": ["vegan", "Dinner", "dinner"],
+            "ingredient_names": ["Garlic", "Ginger"],
+            "time_minutes": 30,
+            "price": 7.00
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data.get('id'))
+        tags = recipe.tags.all()
+        self.assertEqual(tags.count(), 2)
+        self.assertIn(existing, tags)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(
+            sorted(i.name for i in recipe.ingredients.all()), ["Garlic", "Ginger"]
+        )
+
+    def test_create_recipe_with_names_constant_queries(self):
+        """Test the number of queries does not grow with the names given"""
+        def create(count, title):
+            payload = {
+                "title": title,
+                "tag_names": [f"{title} tag {i}" for i in range(count)],
+                "ingredient_names": [f"{title} ing {i}" for i in range(count)],
+                "time_minutes": 5,
+                "price": 1.00
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        # The user's first change creates the change log sequence row
+        create(1, "First")
+        self.assertEqual(create(1, "Small"), create(20, "Large"))
+
+    def test_partial_update_recipe_with_names(self):
+        """Test tags given by name with patch are added to the current ones"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name="Main course"))
+
+        res = self.client.patch(detail_url(recipe.id), {"tag_names": ["Curry"]}, format='json')
 
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()), ["Curry", "Main course"]
+        )
+
+    def test_partial_update_recipe_with_ids_and_names(self):
+        """Test tags given by id and name with patch replace the current ones"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tags.add(sample_tag(user=self.user, name="Main course"))
+        vegan = sample_tag(user=self.user, name="Vegan")
+
+        res = self.client.patch(
+            detail_url(recipe.id), {"tags": [vegan.id], "tag_names": ["Curry"]}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag.name for tag in recipe.tags.all()), ["Curry", "Vegan"])
 
     
 class RecipeImageUploadTests(TestCase):
@@ -313,4 +381,34 @@ class RecipeImageUploadTests(TestCase):
         url = image_upload_url(self.recipe.id)
         res = self.client.post(url, {'image': 'notimage'}, format="multipart")
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeImageDeleteTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "123456"
+        })
+
+    def test_deleted_images_checked_together(self):
+        """Test the images of recipes deleted together are checked in one
+        query, and files another recipe uses are kept"""
+        recipes = [sample_recipe(user=self.user, title=f"Recipe {i}") for i in range(3)]
+        for recipe in recipes:
+            recipe.image.save('photo.jpg', ContentFile(b'image'))
+        kept = sample_recipe(user=self.user, title="Kept")
+        kept.image = recipes[0].image.name
+        kept.save()
+        storage = kept.image.storage
+        self.addCleanup(storage.delete, kept.image.name)
+
+        with CaptureQueriesContext(connection) as queries:
+            Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes]).delete()
+
+        checks = [query for query in queries if '"image" IN' in query['sql']]
+        self.assertEqual(len(checks), 1)
+        self.assertTrue(storage.exists(kept.image.name))
+        for recipe in recipes[1:]:
+            self.assertFalse(storage.exists(recipe.image.name))
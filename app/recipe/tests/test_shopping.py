@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+class ShoppingListApiTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.rice, self.egg, self.leek = (
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Rice', 'Egg', 'Leek')
+        )
+        self.fried_rice = self._recipe('Fried rice', self.rice, self.egg)
+        self.soup = self._recipe('Leek soup', self.leek, self.egg)
+
+    def tearDown(self):
+        cache.clear()
+
+    def _recipe(self, title, *ingredients, user=None):
+        recipe = Recipe.objects.create(
+            user=user or self.user, title=title, time_minutes=5, price=1
+        )
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def _shopping_list(self, *recipes):
+        res = self.client.get(
+            SHOPPING_LIST_URL, {'recipes': ','.join(str(r.id) for r in recipes)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['name'], item['count'], item['recipes']) for item in res.data]
+
+    def test_merges_ingredients(self):
+        """Test shared ingredients are listed once with their recipes"""
+        with self.assertNumQueries(2):
+            found = self._shopping_list(self.fried_rice, self.soup, self.soup)
+
+        self.assertEqual(found, [
+            ('Egg', 2, sorted([self.fried_rice.id, self.soup.id])),
+            ('Leek', 1, [self.soup.id]),
+            ('Rice', 1, [self.fried_rice.id]),
+        ])
+
+    def test_cached_until_recipes_change(self):
+        """Test a repeated list skips the grouped query until a recipe or
+        one of its ingredients changes"""
+        self._shopping_list(self.fried_rice, self.soup)
+        with self.assertNumQueries(1):
+            self._shopping_list(self.soup, self.fried_rice)
+
+        self.soup.ingredients.remove(self.egg)
+        self.assertEqual(
+            self._shopping_list(self.fried_rice, self.soup)[0], ('Egg', 1, [self.fried_rice.id])
+        )
+
+        self.rice.name = 'Brown rice'
+        self.rice.save()
+        self.client.delete(reverse('recipe:ingredient-detail', args=[self.leek.id]))
+        self.assertEqual(
+            self._shopping_list(self.fried_rice, self.soup),
+            [('Brown rice', 1, [self.fried_rice.id]), ('Egg', 1, [self.fried_rice.id])]
+        )
+
+    def test_other_users_recipes_ignored(self):
+        """Test recipes of other users add nothing to the list"""
+        other = get_user_model().objects.create_user('other@londonappdev.com', 'testpass')
+        salt = Ingredient.objects.create(user=other, name='Salt')
+        theirs = self._recipe('Chips', salt, user=other)
+
+        self.assertEqual(self._shopping_list(theirs), [])
+
+    def test_invalid_recipes(self):
+        """Test missing, malformed and too many recipe ids are rejected"""
+        for params in ({}, {'recipes': 'soup'}, {'recipes': ','.join(map(str, range(1, 102)))}):
+            res = self.client.get(SHOPPING_LIST_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,131 @@
+import io
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import similarity
+from core.models import Ingredient, Recipe, RecipeBucket, RecipeSignature, Tag
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+class MinHashTests(SimpleTestCase):
+
+    def test_estimate_tracks_jaccard(self):
+        """Test signature agreement approximates the Jaccard similarity"""
+        first, second = set(range(0, 60)), set(range(20, 80))
+        estimate = similarity.estimate(
+            similarity.signature(first), similarity.signature(second)
+        )
+
+        self.assertAlmostEqual(estimate, similarity.jaccard(first, second), delta=0.15)
+
+    def test_identical_sets_share_every_bucket(self):
+        """Test equal sets always become candidates of each other"""
+        hashes = similarity.signature({1, 2, 3})
+
+        self.assertEqual(
+            similarity.buckets(hashes), similarity.buckets(similarity.signature({3, 2, 1}))
+        )
+        self.assertEqual(len(set(similarity.buckets(hashes))), similarity.BANDS)
+
+
+class SimilarRecipesApiTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tags = [Tag.objects.create(user=self.user, name=f'Tag {i}') for i in range(4)]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f'Ingredient {i}') for i in range(8)
+        ]
+
+    def tearDown(self):
+        cache.clear()
+
+    def _recipe(self, title, tags, ingredients):
+        recipe = Recipe.objects.create(user=self.user, title=title, time_minutes=5, price=1)
+        recipe.tags.set([self.tags[i] for i in tags])
+        recipe.ingredients.set([self.ingredients[i] for i in ingredients])
+        return recipe
+
+    def _similar(self, recipe):
+        res = self.client.get(similar_url(recipe.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [(item['title'], item['similarity']) for item in res.data]
+
+    def test_similar_recipes(self):
+        """Test recipes with the same tags and ingredients rank first and
+        unrelated ones are left out"""
+        curry = self._recipe('Curry', [0, 1], [0, 1, 2, 3])
+        self._recipe('Twin curry', [0, 1], [0, 1, 2, 3])
+        self._recipe('Close curry', [0, 1], [0, 1, 2, 4])
+        self._recipe('Cake', [2, 3], [5, 6, 7])
+
+        found = self._similar(curry)
+
+        self.assertEqual(found[0], ('Twin curry', 1.0))
+        self.assertIn('Close curry', [title for title, _ in found])
+        self.assertNotIn('Cake', [title for title, _ in found])
+
+    def test_failed_update_logged(self):
+        """Test a signature update failing after the link change committed
+        is logged rather than failing the request"""
+        recipe = self._recipe('Curry', [0], [0])
+
+        with mock.patch('core.similarity.update', side_effect=IntegrityError), \
+                self.assertLogs('core.similarity', 'ERROR'):
+            res = self.client.patch(
+                reverse('recipe:recipe-detail', args=[recipe.id]), {'tags': [self.tags[1].id]}
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.tags.all()), [self.tags[1]])
+
+    def test_link_changes_update_signatures(self):
+        """Test changing a recipe's links moves it between buckets"""
+        curry = self._recipe('Curry', [0, 1], [0, 1, 2, 3])
+        cake = self._recipe('Cake', [2, 3], [5, 6, 7])
+        self.assertEqual(self._similar(curry), [])
+
+        cake.tags.set([self.tags[0], self.tags[1]])
+        cake.ingredients.set(self.ingredients[:4])
+        self.assertEqual(self._similar(curry), [('Cake', 1.0)])
+
+        cake.delete()
+        self.assertEqual(self._similar(curry), [])
+
+    def test_links_updated_once_per_transaction(self):
+        """Test a recipe whose tags and ingredients both change in one
+        transaction has its signature updated once"""
+        recipe = self._recipe('Curry', [0], [0])
+
+        with mock.patch('core.similarity.update', wraps=similarity.update) as update:
+            with transaction.atomic():
+                recipe.tags.set([self.tags[1], self.tags[2]])
+                recipe.ingredients.set(self.ingredients[1:3])
+                recipe.ingredients.clear()
+
+        update.assert_called_once_with([recipe.id], 'default')
+
+    def test_rebuild_command(self):
+        """Test the rebuild command recreates missing signatures"""
+        curry = self._recipe('Curry', [0], [0, 1])
+        self._recipe('Twin curry', [0], [0, 1])
+        RecipeBucket.objects.all().delete()
+        RecipeSignature.objects.all().delete()
+
+        call_command('rebuild_similarity', stdout=io.StringIO())
+
+        self.assertEqual(RecipeSignature.objects.count(), 2)
+        self.assertEqual(self._similar(curry), [('Twin curry', 1.0)])
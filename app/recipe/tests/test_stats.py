@@ -0,0 +1,156 @@
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import purge, stats
+from core.models import Ingredient, Recipe, Tag, UserStats
+from recipe.importer import RecipeImporter
+
+STATS_URL = reverse('recipe:stats')
+
+
+class StatsApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@londonappdev.com', 'testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.vegan, self.quick = (
+            Tag.objects.create(user=self.user, name=name) for name in ('Vegan', 'Quick')
+        )
+        self.rice, self.leek = (
+            Ingredient.objects.create(user=self.user, name=name) for name in ('Rice', 'Leek')
+        )
+
+    def _recipe(self, title, time_minutes, price, tags=(), ingredients=()):
+        recipe = Recipe.objects.create(
+            user=self.user, title=title, time_minutes=time_minutes, price=price
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def _stats(self):
+        res = self.client.get(STATS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def assertCountersExact(self):
+        counters = UserStats.objects.get(user=self.user)
+        found = stats.compute(self.user.pk, 'default')
+        self.assertEqual({name: getattr(counters, name) for name in found}, found)
+
+    def test_first_read_computes_counters(self):
+        """Test users with recipes made before their counters get them on
+        the first read, which later reads serve in one query"""
+        self._recipe('Fried rice', 20, Decimal('4.00'), [self.quick], [self.rice])
+        self._recipe('Leek soup', 40, Decimal('6.50'), [self.vegan, self.quick], [self.leek])
+
+        data = self._stats()
+        with self.assertNumQueries(1):
+            self._stats()
+
+        self.assertEqual(data, {
+            'recipes': 2,
+            'time_minutes': {'min': 20, 'max': 40, 'average': 30.0},
+            'price': {'min': '4.00', 'max': '6.50', 'average': '5.25'},
+            'tags': {'used': 2, 'links': 3},
+            'ingredients': {'used': 2, 'links': 2},
+        })
+
+    def test_recipe_changes_update_counters(self):
+        """Test creating, editing and deleting recipes keep the counters,
+        minimums and maximums exact"""
+        self._stats()
+        fried_rice = self._recipe('Fried rice', 20, Decimal('4.00'))
+        soup = self._recipe('Leek soup', 40, Decimal('6.50'))
+
+        soup.time_minutes = 10
+        soup.save()
+        fried_rice.delete()
+        self.assertCountersExact()
+
+        data = self._stats()
+        self.assertEqual(data['recipes'], 1)
+        self.assertEqual(data['time_minutes'], {'min': 10, 'max': 10, 'average': 10.0})
+        self.assertEqual(data['price']['min'], '6.50')
+
+        soup.delete()
+        self.assertEqual(self._stats()['price'], {'min': None, 'max': None, 'average': None})
+
+    def test_link_changes_update_counters(self):
+        """Test links added, removed and cleared from either side, and
+        recipes deleted with their links, are counted"""
+        self._stats()
+        soup = self._recipe('Leek soup', 40, 5, [self.vegan], [self.leek, self.rice])
+        fried_rice = self._recipe('Fried rice', 20, 4, [self.quick], [self.rice])
+
+        soup.tags.add(self.quick)
+        self.rice.recipe_set.remove(soup)
+        self.quick.recipe_set.clear()
+        self.assertCountersExact()
+        self.assertEqual(self._stats()['tags'], {'used': 1, 'links': 1})
+
+        fried_rice.delete()
+        soup.ingredients.clear()
+        self.assertCountersExact()
+        self.assertEqual(self._stats()['ingredients'], {'used': 0, 'links': 0})
+
+    def test_deleted_attributes_not_counted(self):
+        """Test links of ingredients marked deleted stop counting at once
+        and are not taken out again when purged"""
+        self._stats()
+        self._recipe('Leek soup', 40, 5, ingredients=[self.leek, self.rice])
+
+        self.client.delete(reverse('recipe:ingredient-detail', args=[self.leek.id]))
+        self.assertEqual(self._stats()['ingredients'], {'used': 1, 'links': 1})
+
+        purge.purge()
+        self.rice.delete()
+        self.assertCountersExact()
+
+    def test_purged_user_not_counted_per_recipe(self):
+        """Test purging a user deletes the counters row once instead of
+        counting each recipe and link down"""
+        self._recipe('Leek soup', 40, 5, [self.vegan], [self.leek])
+        self._recipe('Fried rice', 20, 4, [self.quick], [self.rice])
+        self._stats()
+        purge.mark_deleted(self.user)
+
+        with mock.patch('core.stats._update') as update:
+            purge.purge()
+
+        update.assert_not_called()
+        self.assertFalse(UserStats.objects.filter(user_id=self.user.pk).exists())
+
+    def test_import_updates_counters(self):
+        """Test bulk imported recipes and links are counted"""
+        self._stats()
+        RecipeImporter(self.user).import_batch([
+            {'title': 'Curry', 'time_minutes': 30, 'price': '7.00',
+             'tags': ['Vegan'], 'ingredients': ['Rice', 'Lentils']},
+            {'title': 'Dal', 'time_minutes': 25, 'price': '3.00',
+             'tags': ['vegan'], 'ingredients': ['Lentils']},
+        ])
+
+        self.assertCountersExact()
+        self.assertEqual(self._stats()['ingredients'], {'used': 2, 'links': 3})
+
+    def test_reconcile_command_repairs_drift(self):
+        """Test the command rewrites counters changed behind the signals"""
+        self._recipe('Leek soup', 40, 5, [self.vegan], [self.leek])
+        self._stats()
+        UserStats.objects.filter(user=self.user).update(recipes=9, tag_links=0)
+
+        out = io.StringIO()
+        call_command('reconcile_stats', stdout=out)
+
+        self.assertIn('repaired 1 users', out.getvalue())
+        self.assertCountersExact()
@@ -0,0 +1,159 @@
+import io
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import changelog
+from core.models import ChangeLogEntry, Recipe, Tag, Ingredient
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def sync(client, since=0, limit=None):
+    params = {'since': since}
+    if limit:
+        params['limit'] = limit
+    return client.get(SYNC_URL, params)
+
+
+class SyncApiTests(TestCase):
+    """Test delta sync from the change log"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(**{
+            "email": "test@test.com",
+            "password": "password"
+        })
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_login_required(self):
+        """Test that sync requires authentication"""
+        res = APIClient().get(SYNC_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changes_after_cursor(self):
+        """Test that only changes after the cursor are returned"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        cursor = sync(self.client).data['cursor']
+
+        recipe = Recipe.objects.create(**{
+            "user": self.user,
+            "title": "Curry",
+            "time_minutes": 30,
+            "price": 7.50
+        })
+        recipe.tags.add(tag)
+
+        res = sync(self.client, cursor)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['changes']), 1)
+        change = res.data['changes'][0]
+        self.assertEqual(change['model'], 'recipe')
+        self.assertEqual(change['id'], recipe.id)
+        self.assertEqual(change['data']['tags'], [tag.id])
+        self.assertFalse(res.data['has_more'])
+
+    def test_tombstone_for_delete(self):
+        """Test that deleted objects come back as tombstones"""
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        ingredient_id = ingredient.id
+        ingredient.delete()
+
+        res = sync(self.client)
+
+        self.assertEqual(res.data['changes'], [{
+            'cursor': res.data['cursor'],
+            'model': 'ingredient',
+            'id': ingredient_id,
+            'action': ChangeLogEntry.DELETE,
+            'data': None,
+        }])
+
+    def test_other_users_excluded(self):
+        """Test that changes of other users are not returned"""
+        other = get_user_model().objects.create_user(**{
+            "email": "other@test.com",
+            "password": "password"
+        })
+        Tag.objects.create(user=other, name="Keto")
+
+        res = sync(self.client)
+
+        self.assertEqual(res.data['changes'], [])
+
+    def test_paginated(self):
+        """Test that changes are paged with has_more"""
+        for name in ("A", "B", "C"):
+            Tag.objects.create(user=self.user, name=name)
+
+        first = sync(self.client, limit=2)
+        second = sync(self.client, first.data['cursor'], limit=2)
+
+        self.assertTrue(first.data['has_more'])
+        self.assertEqual(len(first.data['changes']), 2)
+        self.assertFalse(second.data['has_more'])
+        self.assertEqual([c['data']['name'] for c in second.data['changes']], ["C"])
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        res = self.client.get(SYNC_URL, {'since': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_cursor(self):
+        """Test that a cursor past the user's last change must resync"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        cursor = sync(self.client).data['cursor']
+
+        self.assertEqual(cursor, 1)
+        self.assertEqual(sync(self.client, cursor).status_code, status.HTTP_200_OK)
+        self.assertEqual(sync(self.client, cursor + 1).status_code, status.HTTP_410_GONE)
+
+    def test_compaction_of_shard_ids(self):
+        """Test compaction walks the entries rather than every id range
+        below them, shard ids start far above 0"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        for name in ("Vegetarian", "Plant based"):
+            tag.name = name
+            tag.save()
+        for entry in ChangeLogEntry.objects.all():
+            ChangeLogEntry.objects.filter(pk=entry.pk).update(
+                id=1000 + entry.pk
+            )
+
+        with self.assertNumQueries(9):
+            deleted = changelog.compact(30, batch_size=2)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(ChangeLogEntry.objects.get().action, ChangeLogEntry.UPDATE)
+
+    def test_compaction(self):
+        """Test that compaction keeps the latest entry per object and that
+        cursors older than expired tombstones must resync"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        tag.name = "Vegetarian"
+        tag.save()
+        old = Ingredient.objects.create(user=self.user, name="Salt")
+        old.delete()
+        ChangeLogEntry.objects.filter(action=ChangeLogEntry.DELETE).update(
+            created=timezone.now() - timedelta(days=60)
+        )
+
+        call_command('compact_changelog', '--tombstone-days', '30', stdout=io.StringIO())
+
+        self.assertEqual(
+            list(ChangeLogEntry.objects.values_list('model', 'action')),
+            [('tag', ChangeLogEntry.UPDATE)]
+        )
+        self.assertEqual(sync(self.client, 1).status_code, status.HTTP_410_GONE)
+        self.assertEqual(len(sync(self.client).data['changes']), 1)
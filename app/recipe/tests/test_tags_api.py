@@ -88,6 +88,15 @@ class PrivateTagsApiTests(TestCase):
         ).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_duplicate_name(self):
+        """Test creating a tag whose name exists in another case fails"""
+        Tag.objects.create(user=self.user, name="Vegan")
+
+        res = self.client.post(TAGS_URL, {"name": "VEGAN"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+
     def test_create_tag_invalid(self):
         """Test creating a new tag with invalid payload"""
         payload = {"name": ""}
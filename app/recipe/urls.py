@@ -13,5 +13,8 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('sync/', views.SyncView.as_view(), name='sync'),
+    path('events/', views.EventsView.as_view(), name='events'),
+    path('stats/', views.StatsView.as_view(), name='stats'),
     path('', include(router.urls))
 ]
\ No newline at end of file
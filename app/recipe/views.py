@@ -1,16 +1,122 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
-from core.models import Ingredient, Recipe, Tag
-from recipe import serializers
+from core import (
+    admission, changelog, cookable, events, fragments, purge, routers, sharding, similarity,
+    singleflight, stats
+)
+from core.authentication import CachedTokenAuthentication, SignedTokenAuthentication
+from core.models import ChangeLogEntry, Ingredient, Recipe, Tag
+from recipe import export, serializers, shopping
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class ShardedViewMixin:
+    """Route the request's queries to the authenticated user's shard"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        sharding.activate(request.user.pk)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if getattr(response, 'streaming', False):
+            response.streaming_content = routers.routed(
+                response.streaming_content, routers.capture()
+            )
+        sharding.deactivate()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+class AdmissionControlMixin:
+    """Hold a slot of the admission pool named for the action in
+    ``admission_pools`` while the request runs"""
+    admission_pools = {}
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.admit(request)
+
+    def admit(self, request):
+        """Take a slot of the action's pool, waiting if they are all busy"""
+        name = self.admission_pools.get(getattr(self, 'action', request.method.lower()))
+
+        if name:
+            pool = admission.pool(name)
+            pool.acquire()
+            self.admission_pool = pool
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        pool = self.__dict__.pop('admission_pool', None)
+        if pool and getattr(response, 'streaming', False):
+            # The work happens while the body is sent, hold the slot until then
+            response._closable_objects.append(admission.HeldSlot(pool))
+        elif pool:
+            pool.release()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+class SingleFlightMixin:
+    """Share one computation of the list between identical requests of a
+    user running at the same time. Only requests that could be served
+    from a replica are coalesced, clients that just wrote are not"""
+    coalesced_actions = ('list',)
+
+    def _coalesces(self, request):
+        return self.action in self.coalesced_actions and routers.reading_from_replica()
+
+    def normalized_params(self, request):
+        """Return the query parameters in a canonical order"""
+        return tuple(sorted(
+            (name, tuple(sorted(values))) for name, values in request.query_params.lists()
+        ))
+
+    def admit(self, request):
+        # Requests waiting on another one's computation need no slot
+        if not self._coalesces(request):
+            super().admit(request)
+
+    def list(self, request, *args, **kwargs):
+        if not self._coalesces(request):
+            return super().list(request, *args, **kwargs)
+
+        def compute():
+            super(SingleFlightMixin, self).admit(request)
+            return super(SingleFlightMixin, self).list(request, *args, **kwargs).data
+
+        key = (type(self).__name__, request.user.pk, self.normalized_params(request))
+        return Response(singleflight.do(key, compute))
+
+class FragmentCacheMixin:
+    """Build list and detail responses from per-object fragments cached
+    under each object's version, see core/fragments.py"""
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        data = fragments.render(
+            self.get_serializer_class(),
+            list(queryset if page is None else page),
+            self.get_serializer_context()
+        )
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        data = fragments.render(
+            self.get_serializer_class(), [self.get_object()], self.get_serializer_context()
+        )
+        return Response(data[0])
+
+class BaseRecipeAttrViewSet(ShardedViewMixin, SingleFlightMixin, AdmissionControlMixin, viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin, mixins.DestroyModelMixin):
     """Base viewset for user owned recipe attributes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (IsAuthenticated,)
+    throttle_scope = 'attributes'
+    admission_pools = {'list': 'list'}
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
@@ -30,6 +136,10 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixi
 
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        """Hide the object now and unlink it from recipes in the background"""
+        purge.mark_deleted(instance)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
@@ -43,18 +153,41 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = serializers.IngredientSerializer
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ShardedViewMixin, SingleFlightMixin, AdmissionControlMixin, FragmentCacheMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (IsAuthenticated,)
+    throttle_scope = 'recipes'
+    max_missing = 5
+    admission_pools = {
+        'list': 'list',
+        'cookable_recipes': 'list',
+        'similar_recipes': 'list',
+        'shopping_list': 'list',
+        'upload_image': 'upload',
+        'export_recipes': 'bulk',
+    }
 
     def _params_to_ints(self, qs):
         """Convert a list of string ids to list of strings"""
         return [int(str_id) for str_id in qs.split(",")]
 
+    def normalized_params(self, request):
+        """Treat tag and ingredient id lists as sets. Values that are not
+        ids stay in the key as given, so a request failing on them never
+        shares a computation with a valid one"""
+        params = dict(super().normalized_params(request))
+        for name in ('tags', 'ingredients'):
+            if name in params:
+                params[name] = tuple(sorted({
+                    str(int(value)) if value.strip().isdigit() else value
+                    for values in params[name] for value in values.split(',')
+                }))
+        return tuple(sorted(params.items()))
+
     def get_queryset(self):
         """Retrieve the recipies for the authenticated user"""
         tags = self.request.query_params.get("tags")
@@ -84,7 +217,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
     
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    @action(methods=['POST'], detail=True, url_path='upload-image', throttle_scope='uploads')
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe"""
 
@@ -104,4 +237,207 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
-        )
\ No newline at end of file
+        )
+
+    @action(methods=['GET'], detail=False, url_path='cookable', url_name='cookable')
+    def cookable_recipes(self, request):
+        """List the recipes whose ingredients are all in ``have``, or with
+        ``max_missing`` also those lacking up to that many, fewest first"""
+        try:
+            have = [
+                int(value) for value in request.query_params.get('have', '').split(',')
+                if value.strip()
+            ]
+        except ValueError:
+            raise ValidationError({'have': ['Must be a comma separated list of ids']})
+
+        try:
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            max_missing = -1
+
+        if not 0 <= max_missing <= self.max_missing:
+            raise ValidationError(
+                {'max_missing': [f'Must be between 0 and {self.max_missing}']}
+            )
+
+        found = cookable.cookable(request.user.pk, have, max_missing)
+        recipes = Recipe.objects.filter(user=request.user).in_bulk([pk for pk, _ in found])
+        found = [(recipes[pk], missing) for pk, missing in found if pk in recipes]
+
+        data = fragments.render(
+            serializers.RecipeSerializer,
+            [recipe for recipe, _ in found],
+            self.get_serializer_context()
+        )
+        return Response([
+            dict(recipe, missing=missing) for recipe, (_, missing) in zip(data, found)
+        ])
+
+    @action(methods=['GET'], detail=True, url_path='similar', url_name='similar')
+    def similar_recipes(self, request, pk=None):
+        """List the user's recipes sharing the most tags and ingredients
+        with this one, by MinHash estimate"""
+        found = similarity.similar(self.get_object())
+        recipes = Recipe.objects.filter(user=request.user).in_bulk([pk for pk, _ in found])
+        found = [(recipes[pk], score) for pk, score in found if pk in recipes]
+
+        data = fragments.render(
+            serializers.RecipeSerializer,
+            [recipe for recipe, _ in found],
+            self.get_serializer_context()
+        )
+        return Response([
+            dict(recipe, similarity=score) for recipe, (_, score) in zip(data, found)
+        ])
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list', url_name='shopping-list')
+    def shopping_list(self, request):
+        """Merge the ingredients of the comma separated ``recipes`` into one
+        list, with how many and which of the recipes need each"""
+        try:
+            recipe_ids = self._params_to_ints(request.query_params.get('recipes', ''))
+        except ValueError:
+            raise ValidationError({'recipes': ['Must be a comma separated list of ids']})
+
+        if len(set(recipe_ids)) > settings.SHOPPING_LIST_MAX_RECIPES:
+            raise ValidationError(
+                {'recipes': [f'At most {settings.SHOPPING_LIST_MAX_RECIPES} recipes']}
+            )
+
+        return Response(shopping.shopping_list(request.user, recipe_ids))
+
+    @action(methods=['GET'], detail=False, url_path='export', url_name='export',
+            throttle_scope='bulk')
+    def export_recipes(self, request):
+        """Stream every recipe of the user as NDJSON or CSV"""
+        output = request.query_params.get('output', 'ndjson')
+
+        if output not in export.ENCODERS:
+            return Response(
+                {'output': [f'Must be one of {", ".join(export.ENCODERS)}']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        response = StreamingHttpResponse(
+            export.stream(self.get_queryset(), output),
+            content_type=export.CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="recipes.{output}"'
+        return response
+
+
+class SyncView(ShardedViewMixin, AdmissionControlMixin, APIView):
+    """Return the user's changes after a cursor, one page at a time"""
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = 'sync'
+    admission_pools = {'get': 'list'}
+
+    page_size = 500
+    max_page_size = 1000
+
+    serializer_classes = {
+        'recipe': serializers.RecipeSerializer,
+        'tag': serializers.TagSerializer,
+        'ingredient': serializers.IngredientSerializer,
+    }
+
+    def _int_param(self, name, default):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            value = -1
+
+        if value < 0:
+            raise ValidationError({name: ['Must be a non-negative integer']})
+
+        return value
+
+    def _current(self, name, ids):
+        """Return the live objects of a model by id"""
+        queryset = changelog.TRACKED_MODELS[name].objects.filter(
+            user=self.request.user, id__in=ids
+        )
+        if name == 'recipe':
+            queryset = queryset.prefetch_related('tags', 'ingredients')
+
+        return {obj.pk: obj for obj in queryset}
+
+    def get(self, request):
+        since = self._int_param('since', 0)
+        limit = min(self._int_param('limit', self.page_size), self.max_page_size) or 1
+
+        # Cursors behind the compacted tombstones or never handed out, such
+        # as ids from before cursors were sequences, cannot be continued
+        if since and not (
+            changelog.horizon(request.user) <= since <= changelog.last_cursor(request.user)
+        ):
+            return Response(
+                {'detail': 'Cursor is no longer valid, start a full sync from 0'},
+                status=status.HTTP_410_GONE
+            )
+
+        entries, cursor, has_more = changelog.changes_since(request.user, since, limit)
+
+        wanted = {}
+        for entry in entries:
+            if entry.action != ChangeLogEntry.DELETE:
+                wanted.setdefault(entry.model, []).append(entry.object_id)
+        current = {name: self._current(name, ids) for name, ids in wanted.items()}
+
+        changes = []
+        for entry in entries:
+            obj = current.get(entry.model, {}).get(entry.object_id)
+            if obj is None:
+                # Deleted after this entry was written, the tombstone follows
+                changes.append({
+                    'cursor': entry.sequence,
+                    'model': entry.model,
+                    'id': entry.object_id,
+                    'action': ChangeLogEntry.DELETE,
+                    'data': None,
+                })
+            else:
+                changes.append({
+                    'cursor': entry.sequence,
+                    'model': entry.model,
+                    'id': entry.object_id,
+                    'action': entry.action,
+                    'data': self.serializer_classes[entry.model](obj).data,
+                })
+
+        return Response({
+            'cursor': cursor,
+            'has_more': has_more,
+            'changes': changes,
+        })
+
+
+class StatsView(ShardedViewMixin, APIView):
+    """Return the user's recipe count, tag and ingredient usage and the
+    range and average of recipe times and prices, read from counters"""
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        return Response(stats.summary(request.user.pk))
+
+
+class EventsView(AdmissionControlMixin, APIView):
+    """Stream change events for the user's recipes, tags and ingredients.
+    Each open stream holds a server thread, so their number is capped by
+    the 'events' pool"""
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
+    permission_classes = (IsAuthenticated,)
+    admission_pools = {'get': 'events'}
+
+    def get(self, request):
+        response = StreamingHttpResponse(
+            events.stream(request.user.pk),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
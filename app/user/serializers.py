@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model, authenticate
+from django.db import IntegrityError, transaction
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
+from core import tokens
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the users object"""
 
@@ -12,9 +15,20 @@ class UserSerializer(serializers.ModelSerializer):
             "password": {
                 "write_only": True,
                 "min_length": 5
+            },
+            # Checked case-insensitively by validate_email instead
+            "email": {
+                "validators": []
             }
         }
-    
+
+    def validate_email(self, value):
+        """Reject emails already taken in any case"""
+        if get_user_model().objects.email_exists(value, exclude=self.instance):
+            raise serializers.ValidationError(_("A user with this email already exists"))
+
+        return value
+
     def create(self, validated_data):
         """Create a new user with encrypted password and return it"""
 
@@ -22,13 +36,21 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.get("password")
         name = validated_data.get("name")
 
-        user = get_user_model().objects.create(**{
+        user = get_user_model()(**{
             "email": email,
             "name": name
         })
         user.set_password(password)
         user.is_active = True
-        user.save()
+
+        try:
+            with transaction.atomic():
+                user.save()
+        except IntegrityError:
+            # Signed up concurrently with the same email in another case
+            raise serializers.ValidationError(
+                {"email": [_("A user with this email already exists")]}
+            )
         return user
     
     def update(self, instance, validated_data):
@@ -40,6 +62,7 @@ class UserSerializer(serializers.ModelSerializer):
         if password:
             user.set_password(password)
             user.save()
+            tokens.revoke(user.pk)
 
         return user
 
@@ -68,4 +91,10 @@ class AuthTokenSerializer(serializers.Serializer):
             raise serializers.ValidationError(msg, code='authentication')
 
         attrs['user'] = user
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a refresh token"""
+
+    refresh = serializers.CharField()
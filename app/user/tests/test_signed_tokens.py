@@ -0,0 +1,98 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import tokens
+
+SIGNED_TOKEN_URL = reverse('user:token-signed')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class SignedTokenApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@londonappdev.com', password='testpass', name='Test'
+        )
+        self.client = APIClient()
+        tokens.forget()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _grant(self):
+        res = self.client.post(
+            SIGNED_TOKEN_URL, {'email': 'test@londonappdev.com', 'password': 'testpass'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def _get(self, url, access):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_access_token_authenticates_without_queries(self):
+        """Test only the view's own query runs for a signed token"""
+        access = self._grant()['access']
+        self._get(TAGS_URL, access)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self._get(TAGS_URL, access)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+
+    def test_me_loads_the_user(self):
+        """Test the profile of a signed token's user is complete"""
+        res = self._get(ME_URL, self._grant()['access'])
+
+        self.assertEqual(res.data['email'], 'test@londonappdev.com')
+
+    def test_invalid_tokens_are_rejected(self):
+        """Test forged, refresh and expired tokens fail as access tokens"""
+        grant = self._grant()
+
+        for access in (grant['access'] + 'x', grant['refresh']):
+            self.assertEqual(self._get(ME_URL, access).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+        with override_settings(ACCESS_TOKEN_LIFETIME=-1):
+            self.assertEqual(self._get(ME_URL, grant['access']).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_issues_new_access_token(self):
+        """Test a refresh token is exchanged for a working access token"""
+        res = self.client.post(REFRESH_URL, {'refresh': self._grant()['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._get(ME_URL, res.data['access']).status_code, status.HTTP_200_OK)
+
+    def test_revoke_rejects_access_and_refresh_tokens(self):
+        """Test signing out invalidates every token issued before"""
+        grant = self._grant()
+        res = self.client.post(REVOKE_URL, HTTP_AUTHORIZATION=f'Bearer {grant["access"]}')
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        self.assertEqual(self._get(ME_URL, grant['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        res = self.client.post(REFRESH_URL, {'refresh': grant['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(self._get(ME_URL, self._grant()['access']).status_code,
+                         status.HTTP_200_OK)
+
+    def test_legacy_token_still_works(self):
+        """Test opaque tokens keep authenticating next to signed ones"""
+        res = self.client.post(
+            reverse('user:token'), {'email': 'test@londonappdev.com', 'password': 'testpass'}
+        )
+        res = self.client.get(ME_URL, HTTP_AUTHORIZATION=f'Token {res.data["token"]}')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
@@ -42,6 +42,17 @@ class PublicUserApiTests(TestCase):
 
         res = self.client.post(CREATE_USER_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_user_exists_in_other_case(self):
+        """Test signing up again with the email in another case fails"""
+        create_user(email="Test@test.com", password="12345")
+
+        res = self.client.post(CREATE_USER_URL, {
+            "email": "TEST@test.com",
+            "password": "12345"
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_user_model().objects.count(), 1)
     
     def test_password_too_short(self):
         """Test that the password is having more than 5 characters"""
@@ -69,6 +80,16 @@ class PublicUserApiTests(TestCase):
         res = self.client.post(TOKEN_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn("token", res.data)
+
+    def test_create_token_email_any_case(self):
+        """Test logging in does not depend on the email's case"""
+        create_user(email="Test@test.com", password="test@123")
+
+        res = self.client.post(TOKEN_URL, {
+            "email": "tEST@TEST.com",
+            "password": "test@123"
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
     
     def test_create_token_invalid_credentials(self):
         """Test that token is not created if invalid credential is provided"""
@@ -1,7 +1,13 @@
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
-from user.serializers import UserSerializer, AuthTokenSerializer
+from rest_framework.views import APIView
+
+from core import purge, tokens
+from core.authentication import CachedTokenAuthentication, SignedTokenAuthentication
+from user.serializers import UserSerializer, AuthTokenSerializer, RefreshTokenSerializer
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
@@ -16,14 +22,57 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class CreateSignedTokenView(CreateTokenView):
+    """Create a short-lived signed access token and a refresh token"""
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue_pair(serializer.validated_data['user']))
+
+
+class RefreshTokenView(APIView):
+    """Exchange a refresh token for new signed tokens"""
+
+    authentication_classes = ()
+    permission_classes = ()
+
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            return Response(tokens.refresh(serializer.validated_data['refresh']))
+        except tokens.InvalidToken as error:
+            return Response({'detail': str(error)}, status=status.HTTP_401_UNAUTHORIZED)
+
+
+class RevokeTokensView(APIView):
+    """Sign out everywhere by revoking the user's signed tokens"""
+
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        tokens.revoke(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user"""
 
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication, SignedTokenAuthentication)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
         """Retrieve and return authenticated user"""
+        if isinstance(self.request.auth, tokens.Claims):
+            # Signed tokens authenticate without loading the user
+            return get_user_model().objects.get(pk=self.request.user.pk)
+
+        return self.request.user
 
-        return self.request.user
\ No newline at end of file
+    def perform_destroy(self, instance):
+        """Deactivate the account now and delete its data in the background"""
+        purge.mark_deleted(instance)
\ No newline at end of file